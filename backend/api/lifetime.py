@@ -1,14 +1,23 @@
+import asyncio
 from typing import Awaitable, Callable
 
 from fastapi import FastAPI
 from prometheus_fastapi_instrumentator.instrumentation import (
     PrometheusFastApiInstrumentator,
 )
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 # from backend.api.hooks.database_hooks import run_db_initialize_hooks
+from backend.logging import get_logger
+from backend.services.ml.brands import brand_catalog
+from backend.services.ml.ocr_store import textract_store
+from backend.services.ml.registry import model_registry
+from backend.services.ml.workers import worker_pool
 from backend.settings import settings
 
+logger = get_logger(__name__)
+
 
 # async def _setup_db_hooks() -> None:  # pragma: no cover
 
@@ -42,6 +51,100 @@ def _setup_db(app: FastAPI) -> None:  # pragma: no cover
     app.state.db_session_factory = session_factory
 
 
+async def _setup_models(app: FastAPI) -> None:  # pragma: no cover
+    """
+    Loads ML models once for the whole process.
+
+    Importing the ML services registers their loaders in the
+    model registry. Models are loaded eagerly when
+    ``settings.preload_models`` is set, so the first request
+    does not pay for deserialization. The freshness micro-batcher
+    and the ML worker pool are started here as well, the process
+    workers only when the batcher is disabled, and the OCR
+    cache is warmed from the durable Textract store, and the YOLO
+    tiers listed in ``settings.yolo_startup_report_tiers`` are timed.
+
+    :param app: fastAPI application.
+    """
+    from backend.services.ml.crud import freshness_batcher  # noqa: WPS433
+    from backend.services.ml.frame import benchmark_detectors  # noqa: WPS433
+    from backend.services.ml.ocr import warm_ocr_cache  # noqa: WPS433
+
+    if settings.preload_models:
+        model_registry.preload(settings.startup_models)
+        for entry in model_registry.report():
+            logger.info(f"Model ready: {entry}")
+    app.state.model_registry = model_registry
+
+    if settings.yolo_startup_report_tiers:
+        for row in benchmark_detectors(settings.yolo_startup_report_tiers):
+            logger.info(f"YOLO tier: {row}")
+
+    if settings.textract_store_enabled:
+        warmed = warm_ocr_cache(settings.textract_store_warm_entries)
+        logger.info(f"Warmed OCR cache with {warmed} stored Textract responses")
+
+    if settings.freshness_batcher_enabled:
+        await freshness_batcher.start()
+    app.state.freshness_batcher = freshness_batcher
+
+    worker_pool.start()
+    if not freshness_batcher.running:
+        # Freshness inference goes to the process pool without the batcher
+        await worker_pool.warm_up()
+    app.state.worker_pool = worker_pool
+
+
+async def _refresh_brands(app: FastAPI) -> None:  # pragma: no cover
+    """
+    Applies brand catalog changes to the in-memory indexes.
+
+    :param app: fastAPI application.
+    """
+    while True:
+        await asyncio.sleep(settings.brand_refresh_seconds)
+        try:
+            async with app.state.db_session_factory() as session:
+                changed = await brand_catalog.refresh(session)
+        except (SQLAlchemyError, OSError) as e:
+            logger.warning(f"Brand catalog refresh failed: {e}")
+            continue
+        if changed:
+            logger.info(f"Applied {changed} brand catalog changes")
+
+
+async def _setup_brands(app: FastAPI) -> None:  # pragma: no cover
+    """
+    Loads the brand catalog and keeps it in sync with the database.
+
+    The brands table is seeded with the built-in brands when empty.
+    When the database is unreachable the built-in brands are served
+    and the refresh task keeps retrying.
+
+    :param app: fastAPI application.
+    """
+    try:
+        async with app.state.db_session_factory() as session:
+            await brand_catalog.seed(session)
+            await brand_catalog.refresh(session)
+        logger.info(f"Loaded {len(brand_catalog.brands)} brands")
+    except (SQLAlchemyError, OSError) as e:
+        logger.warning(f"Serving built-in brands, catalog load failed: {e}")
+    app.state.brand_catalog = brand_catalog
+    app.state.brand_refresher = asyncio.create_task(_refresh_brands(app))
+
+
+def _setup_live_feed(app: FastAPI) -> None:  # pragma: no cover
+    """
+    Shares one live feed connection manager across the application.
+
+    :param app: fastAPI application.
+    """
+    from backend.services.base.connections import connection_manager  # noqa: WPS433
+
+    app.state.connection_manager = connection_manager
+
+
 def setup_prometheus(app: FastAPI) -> None:  # pragma: no cover
     """
     Enables prometheus integration.
@@ -71,6 +174,9 @@ def register_startup_event(
         app.middleware_stack = None
         # await _setup_db_hooks()
         _setup_db(app)
+        await _setup_brands(app)
+        await _setup_models(app)
+        _setup_live_feed(app)
         # _start_notification_handler(app)
         setup_prometheus(app)
         app.middleware_stack = app.build_middleware_stack()
@@ -91,7 +197,16 @@ def register_shutdown_event(
 
     @app.on_event("shutdown")
     async def _shutdown() -> None:  # noqa: WPS430
+        from backend.services.ml.frame import shutdown_video_pool  # noqa: WPS433
+
+        app.state.brand_refresher.cancel()
+        await app.state.connection_manager.close_all()
         await app.state.db_engine.dispose()
+        await app.state.freshness_batcher.stop()
+        app.state.worker_pool.shutdown()
+        shutdown_video_pool()
+        textract_store.close()
+        model_registry.clear()
 
         pass  # noqa: WPS420
 
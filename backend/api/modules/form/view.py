@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, WebSocket
+from fastapi import APIRouter, Depends, Request, WebSocket
 from backend.commons.responses import ServiceResponse
 from backend.db.dependencies import get_db_session
 from backend.db.models.users import User, current_active_user
 from backend.logging import get_logger
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi_pagination import Params
+from backend.services.base.brands import BrandService
 from backend.services.base.cam import LiveFeed
 from backend.services.base.crud import FormService
+from backend.services.base.video import VideoService
 
 router = APIRouter()
 
@@ -14,10 +16,14 @@ logger = get_logger(__name__)
 
 
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    manager = LiveFeed()
+async def websocket_endpoint(websocket: WebSocket, stream: bool = False):
+    # ?stream=true pushes recognition results for every saved frame
+    manager = LiveFeed(stream=stream)
     await manager.connect(websocket)
-    result = await manager.send_personal_message("Connected", websocket)
+    try:
+        result = await manager.send_personal_message("Connected", websocket)
+    finally:
+        manager.disconnect()
     return result
 
 
@@ -25,13 +31,25 @@ async def websocket_endpoint(websocket: WebSocket):
 async def list_processes(
     path: list[str],
     count: int,
+    ocr_engine: str | None = None,
     db: AsyncSession = Depends(get_db_session),
 ) -> ServiceResponse:
     manager = LiveFeed()
-    result = await manager.process_somethings(db, path, count)
+    result = await manager.process_somethings(db, path, count, ocr_engine)
     return result
 
 
+@router.post("/video/stream", response_model=None)
+async def stream_video(request: Request) -> ServiceResponse:
+    # The body is read as it arrives, detection starts before the upload ends
+    return await VideoService().detect_upload(request.stream())
+
+
+@router.get("/brands/match", response_model=None)
+async def match_brand(q: str) -> ServiceResponse:
+    return BrandService().match(q)
+
+
 @router.get("/list", response_model=None)
 async def list_processes(
     db: AsyncSession = Depends(get_db_session),
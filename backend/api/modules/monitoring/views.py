@@ -1,5 +1,9 @@
+from typing import Any, Dict, List
+
 from fastapi import APIRouter
 
+from backend.services.ml.registry import model_registry
+
 router = APIRouter()
 
 
@@ -10,3 +14,13 @@ def health_check() -> None:
 
     It returns 200 if the project is healthy.
     """
+
+
+@router.get("/models")
+def loaded_models() -> List[Dict[str, Any]]:
+    """
+    Lists the ML models resident in this process.
+
+    :return: load time and resident memory of every loaded model.
+    """
+    return model_registry.report()
@@ -0,0 +1,67 @@
+"""Add the brands catalog.
+
+Revision ID: 3f2a9c1d7b64
+Revises:
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3f2a9c1d7b64"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Run the upgrade migrations."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_table(
+        "brands",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), server_default=sa.true(), nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(),
+            server_default=sa.text("clock_timestamp()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    op.create_index("ix_brands_updated_at", "brands", ["updated_at"])
+    op.create_index(
+        "ix_brands_name_trgm",
+        "brands",
+        ["name"],
+        postgresql_using="gin",
+        postgresql_ops={"name": "gin_trgm_ops"},
+    )
+    op.execute(
+        "CREATE OR REPLACE FUNCTION brands_touch_updated_at() RETURNS trigger AS $$ "
+        "BEGIN NEW.updated_at = clock_timestamp(); RETURN NEW; END "
+        "$$ LANGUAGE plpgsql"
+    )
+    op.execute(
+        "CREATE TRIGGER brands_touch_updated_at BEFORE UPDATE ON brands "
+        "FOR EACH ROW EXECUTE FUNCTION brands_touch_updated_at()"
+    )
+    op.execute(
+        "CREATE OR REPLACE FUNCTION brands_soft_delete() RETURNS trigger AS $$ "
+        "BEGIN UPDATE brands SET is_active = false WHERE id = OLD.id; RETURN NULL; END "
+        "$$ LANGUAGE plpgsql"
+    )
+    op.execute(
+        "CREATE TRIGGER brands_soft_delete BEFORE DELETE ON brands "
+        "FOR EACH ROW EXECUTE FUNCTION brands_soft_delete()"
+    )
+
+
+def downgrade() -> None:
+    """Run the downgrade migrations."""
+    op.drop_table("brands")
+    op.execute("DROP FUNCTION IF EXISTS brands_touch_updated_at()")
+    op.execute("DROP FUNCTION IF EXISTS brands_soft_delete()")
@@ -0,0 +1 @@
+"""Migration versions."""
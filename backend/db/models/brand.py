@@ -0,0 +1,74 @@
+from sqlalchemy import (
+    DDL,
+    Boolean,
+    Column,
+    DateTime,
+    FetchedValue,
+    Index,
+    Integer,
+    String,
+    event,
+    func,
+    true,
+)
+from backend.db.base import Base
+
+# Kept in sync with the brands migration
+TOUCH_FUNCTION = DDL(
+    "CREATE OR REPLACE FUNCTION brands_touch_updated_at() RETURNS trigger AS $$ "
+    "BEGIN NEW.updated_at = clock_timestamp(); RETURN NEW; END "
+    "$$ LANGUAGE plpgsql"
+)
+TOUCH_TRIGGER = DDL(
+    "CREATE TRIGGER brands_touch_updated_at BEFORE UPDATE ON brands "
+    "FOR EACH ROW EXECUTE FUNCTION brands_touch_updated_at()"
+)
+
+# Deletes become deactivations, so the brand index sees them through updated_at
+SOFT_DELETE_FUNCTION = DDL(
+    "CREATE OR REPLACE FUNCTION brands_soft_delete() RETURNS trigger AS $$ "
+    "BEGIN UPDATE brands SET is_active = false WHERE id = OLD.id; RETURN NULL; END "
+    "$$ LANGUAGE plpgsql"
+)
+SOFT_DELETE_TRIGGER = DDL(
+    "CREATE TRIGGER brands_soft_delete BEFORE DELETE ON brands "
+    "FOR EACH ROW EXECUTE FUNCTION brands_soft_delete()"
+)
+
+
+class Brand(Base):
+    __tablename__ = "brands"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String, nullable=False, unique=True)
+    # Cleared instead of deleting the row, see SOFT_DELETE_TRIGGER
+    is_active = Column(Boolean, nullable=False, default=True, server_default=true())
+    # Polled by the in-memory brand index to pick up catalog changes.
+    # Set by the database, so edits made outside the app are seen too.
+    updated_at = Column(
+        DateTime,
+        nullable=False,
+        server_default=func.clock_timestamp(),
+        server_onupdate=FetchedValue(),
+        index=True,
+    )
+
+    __table_args__ = (
+        Index(
+            "ix_brands_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
+
+
+event.listen(
+    Brand.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"),
+)
+event.listen(Brand.__table__, "after_create", TOUCH_FUNCTION)
+event.listen(Brand.__table__, "after_create", TOUCH_TRIGGER)
+event.listen(Brand.__table__, "after_create", SOFT_DELETE_FUNCTION)
+event.listen(Brand.__table__, "after_create", SOFT_DELETE_TRIGGER)
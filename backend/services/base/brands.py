@@ -0,0 +1,20 @@
+from backend.commons.responses import ServiceResponse, ServiceResponseStatus
+from backend.services.commons.base import BaseService
+from backend.services.ml.brands import brand_catalog
+from backend.settings import settings
+
+
+class BrandService(BaseService):
+    __item_name__ = "Brand"
+
+    def __init__(self):
+        self.catalog = brand_catalog
+
+    def match(self, query: str) -> ServiceResponse:
+        best = self.catalog.match(query, settings.brand_match_threshold)
+        if best is None:
+            return self.response(ServiceResponseStatus.NOTFOUND)
+        return self.response(
+            ServiceResponseStatus.FETCHED,
+            result=[{"brand": best.brand, "score": round(best.score, 4)}],
+        )
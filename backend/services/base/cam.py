@@ -1,41 +1,87 @@
-import base64
-import json
+import asyncio
 import os
-import time
 from backend.schemas.product import (
     FreshProduceSchema,
     PackagedProductSchema as PackagedProductSchema,
 )
 import uuid
-from fastapi import Depends
 from fastapi import WebSocket
 from backend.commons.responses import ServiceResponseStatus
 from backend.logging import get_logger
 from backend.schemas.product import ProductSchema, ProductSchema2
+from backend.services.base.connections import ConnectionManager, connection_manager
 from backend.services.base.crud import FormService
+from backend.services.base.feed_protocol import (
+    BINARY_SUBPROTOCOL,
+    decode_binary_frame,
+    decode_class_table,
+    decode_text_frame,
+)
+from backend.services.base.frame_queue import FrameQueue
 from backend.services.commons.base import BaseService
-from backend.services.ml.frame import ObjectDetectionVideoProcessor
-from keras.api.applications import MobileNetV2
-from backend.services.ml.crud import ImageProcessor
+from backend.services.ml.dedup import NearDuplicateFilter
+from backend.services.ml.frame_store import frame_store, is_frame_ref
+from backend.services.ml.crud import (
+    ImageProcessor,
+    freshness_batcher,
+    run_freshness_pipeline,
+    run_label_frame,
+    run_packaged_pipeline,
+)
+from backend.services.ml.ocr import OCR_ENGINES
+from backend.services.ml.workers import PoolSaturatedError, worker_pool
+from backend.settings import settings
+
+TESSERACT_CMD = settings.tesseract_cmd
+FRUIT_KEYWORDS = ["banana", "apple", "orange", "grape", "mango", "pear"]
 
 logger = get_logger(__name__)
 
 
+def freshness_runner(frame_refs):
+    # Stored frames only live in this process, so they stay off the process pool
+    return worker_pool.run_io if frame_refs else worker_pool.run_cpu
+
+
 class LiveFeed(BaseService):
     __item_name__ = "FormService"
 
-    def __init__(self):
+    def __init__(self, stream: bool = False, manager: ConnectionManager = connection_manager):
         self.id = uuid.uuid4()
-        self.model = MobileNetV2(weights="imagenet")
-        self.active_connections: list[WebSocket] = []
+        # Shared by every live feed of the process
+        self.manager = manager
+        # Streaming mode runs inference on every saved frame and pushes results
+        self.stream = stream
+        self.inflight = asyncio.Semaphore(settings.live_stream_max_inflight)
+        self.result_tasks: set[asyncio.Task] = set()
+        self.subprotocol = None
+        # Class table of binary protocol clients
+        self.class_names: list[str] = []
 
     async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        await websocket.send_text(str(self.id))
-        self.active_connections.append(websocket)
+        self.subprotocol = await self.manager.connect(str(self.id), websocket)
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+    def disconnect(self):
+        self.manager.disconnect(str(self.id))
+
+    async def receive_frames(self, websocket: WebSocket, queue: FrameQueue):
+        # Reads the socket as fast as the client sends, whatever processing does
+        try:
+            while True:
+                data = await websocket.receive()
+                if data["type"] == "websocket.disconnect":
+                    break
+                if data.get("bytes") is None and not data.get("text"):
+                    print("No data received, exiting loop")
+                    break
+                if data.get("bytes") is None and self.subprotocol == BINARY_SUBPROTOCOL:
+                    table = decode_class_table(data["text"])
+                    if table is not None:
+                        self.class_names = table
+                        continue
+                queue.put(data)
+        finally:
+            queue.close()
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         image_list = []
@@ -44,35 +90,60 @@ class LiveFeed(BaseService):
 
         if not os.path.exists(image_dir):
             os.makedirs(image_dir)
+        queue = FrameQueue(
+            settings.live_queue_size,
+            settings.live_drop_policy,
+            nth=settings.live_keep_every_nth,
+        )
+        receiver = asyncio.create_task(self.receive_frames(websocket, queue))
+        # Without dedup, a frame is only new when the client's class changes
+        dedup = None
+        if settings.live_dedup_enabled:
+            dedup = NearDuplicateFilter(
+                settings.live_dedup_window, settings.live_dedup_max_distance
+            )
         try:
             prev = ""
             while True:
                 try:
-                    data = await websocket.receive_text()
-
-                    if not data:
-                        print("No data received, exiting loop")
+                    data = await queue.get()
+                    if data is None:
                         break
 
-                    json_data = json.loads(data)
+                    if data.get("bytes") is not None:
+                        frame = decode_binary_frame(data["bytes"], self.class_names)
+                    else:
+                        frame = decode_text_frame(data["text"])
 
-                    image_base64 = json_data.get("image")
-                    detected_class = json_data.get("class")
-
-                    if image_base64:
-                        image_data = base64.b64decode(image_base64.split(",")[1])
+                    detected_class = frame.detected_class
+                    class_changed = detected_class != prev
 
+                    if frame.image:
                         image_filename = f"backend/services/video/images/{self.id}_image_{detected_class}_{image_count}.jpg"
-                        if detected_class != prev:
+                        is_new = dedup.admit(frame.image) if dedup is not None else class_changed
+                        if is_new:
                             print("Enterned here")
+                            if settings.frame_store_enabled:
+                                # Kept in memory, /form/fill takes the reference
+                                try:
+                                    image_filename = frame_store.put(
+                                        str(self.id), frame.image, detected_class
+                                    )
+                                except ValueError as e:
+                                    logger.warning(f"Live feed {self.id}: skipping frame: {e}")
+                                    continue
+                            else:
+                                with open(image_filename, "wb") as image_file:
+                                    image_file.write(frame.image)
                             image_list.append(image_filename)
-
-                            with open(image_filename, "wb") as image_file:
-                                image_file.write(image_data)
+                            if self.stream:
+                                await self.start_inference(
+                                    websocket, image_filename, detected_class, frame.seq
+                                )
 
                             print(f"Image saved: {image_filename}")
                             image_count += 1
-                    if image_count >= 3 and detected_class != prev:
+                    if image_count >= 3 and (dedup is not None or class_changed):
                         image_count = 0
                         prev = detected_class
                         print(detected_class, prev, ":---------------bigleu was here")
@@ -84,22 +155,102 @@ class LiveFeed(BaseService):
                     break
         except Exception as e:
             print(f"File handling error: {e}")
+        finally:
+            receiver.cancel()
+            (received,) = await asyncio.gather(receiver, return_exceptions=True)
+            if isinstance(received, Exception):
+                logger.warning(f"Live feed {self.id}: receiving frames failed: {received!r}")
+            queue.discard()
+            if queue.dropped:
+                logger.info(
+                    f"Live feed {self.id}: dropped {queue.dropped} of "
+                    f"{queue.received} frames ({queue.policy})"
+                )
+            for task in self.result_tasks:
+                task.cancel()
+            frame_store.drop_session(str(self.id))
+
+    async def start_inference(self, websocket: WebSocket, image_ref, detected_class, seq):
+        # Waits while too many frames are being recognized; the receiving task
+        # keeps reading meanwhile and the frame queue drops by its policy
+        await self.inflight.acquire()
+        task = asyncio.create_task(
+            self.push_result(websocket, image_ref, detected_class, seq)
+        )
+        self.result_tasks.add(task)
+        task.add_done_callback(self.result_tasks.discard)
+
+    async def recognize(self, image_ref, detected_class):
+        if not self.process([detected_class or ""]):
+            return await worker_pool.run_io(run_label_frame, TESSERACT_CMD, image_ref)
+        if freshness_batcher.running:
+            processor = ImageProcessor(TESSERACT_CMD, [image_ref], 1)
+            fresh = await processor.process_batched([image_ref], freshness_batcher, worker_pool)
+        else:
+            fresh = await worker_pool.run_io(
+                run_freshness_pipeline, TESSERACT_CMD, [image_ref], 1
+            )
+        confidence = fresh["Confidence"]
+        if isinstance(confidence, set):
+            confidence = next(iter(confidence))
+        return {
+            "label": fresh["Predicted Class"],
+            "confidence": float(confidence),
+            "shelf_life": fresh["Shelf Life"],
+            "freshness_score": fresh["Freshness Score"],
+        }
+
+    async def push_result(self, websocket: WebSocket, image_ref, detected_class, seq):
+        message = {"type": "result", "frame": image_ref, "seq": seq, "class": detected_class}
+        try:
+            try:
+                message.update(await self.recognize(image_ref, detected_class))
+            except Exception as e:
+                # Every frame gets its result message, failed or not
+                logger.warning(f"Live feed {self.id}: recognizing {image_ref} failed: {e!r}")
+                message["error"] = str(e)
+            try:
+                await websocket.send_json(message)
+            except Exception as e:
+                logger.warning(f"Live feed {self.id}: failed to send result: {e!r}")
+        finally:
+            self.inflight.release()
 
     def process(self, video_paths: list[str]) -> bool:
-        fruit_keywords = ["banana", "apple", "orange", "grape", "mango", "pear"]
         for path in video_paths:
-            if any(fruit.lower() in path.lower() for fruit in fruit_keywords):
+            if is_frame_ref(path):
+                # The class reported by the camera stands in for the file name
+                path = frame_store.get(path).detected_class or ""
+            if any(fruit.lower() in path.lower() for fruit in FRUIT_KEYWORDS):
                 return True
         return False
 
-    async def process_somethings(self, db, video_path: list[str], count: int):
+    async def process_somethings(
+        self,
+        db,
+        video_path: list[str],
+        count: int,
+        ocr_engine: str | None = None,
+    ):
+        if ocr_engine is not None and ocr_engine not in OCR_ENGINES:
+            return self.response(
+                ServiceResponseStatus.BAD_REQUEST,
+                message=f"Unknown OCR engine '{ocr_engine}', expected one of {OCR_ENGINES}",
+            )
+        frame_refs = [ref for ref in video_path if is_frame_ref(ref)]
+        try:
+            for ref in frame_refs:
+                frame_store.get(ref)
+        except KeyError as e:
+            return self.response(ServiceResponseStatus.NOTFOUND, message=str(e))
         try:
             flag = self.process(video_path)
             service = FormService(db)
             if not flag:
-                PackagedProductSchema = ImageProcessor(
-                    r"C:/Program Files/Tesseract-OCR/tesseract.exe", video_path, count
-                ).process_text()
+                # OCR is mostly network bound, so the pipeline runs on a thread
+                PackagedProductSchema = await worker_pool.run_io(
+                    run_packaged_pipeline, TESSERACT_CMD, video_path, count, ocr_engine
+                )
                 if PackagedProductSchema:
                     print("Required fields are present, proceed further.")
                     obj = ProductSchema(
@@ -114,9 +265,15 @@ class LiveFeed(BaseService):
                     result=[obj],
                 )
             else:
-                MLFRESH = ImageProcessor(
-                    r"C:/Program Files/Tesseract-OCR/tesseract.exe", video_path, count
-                ).process(video_path)
+                if freshness_batcher.running:
+                    processor = ImageProcessor(TESSERACT_CMD, video_path, count)
+                    MLFRESH = await processor.process_batched(
+                        video_path, freshness_batcher, worker_pool
+                    )
+                else:
+                    MLFRESH = await freshness_runner(frame_refs)(
+                        run_freshness_pipeline, TESSERACT_CMD, video_path, count
+                    )
                 print(MLFRESH)
                 obj = ProductSchema(
                     freshStatus=MLFRESH["Predicted Class"],
@@ -139,9 +296,11 @@ class LiveFeed(BaseService):
                     ServiceResponseStatus.FETCHED,
                     result=[ProductSchema2.from_sqlalchemy(obj)],
                 )
+        except PoolSaturatedError as e:
+            logger.warning(f"Rejected /fill request: {e}")
+            return self.response(ServiceResponseStatus.ERROR, message=str(e))
         except Exception as e:
             print("the eror", e)
 
     async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+        return await self.manager.broadcast(message)
@@ -0,0 +1,98 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from fastapi import WebSocket
+from prometheus_client import Gauge
+
+from backend.logging import get_logger
+from backend.services.base.feed_protocol import negotiate_subprotocol
+from backend.settings import settings
+
+logger = get_logger(__name__)
+
+LIVE_CONNECTIONS = Gauge(
+    "live_feed_connections",
+    "Open live feed websocket connections.",
+)
+
+
+class ConnectionManager:
+    """
+    Registry of the open live feed websockets of this process.
+
+    A single instance is shared by every connection. ``broadcast`` sends
+    to all sockets concurrently, each send bounded by ``send_timeout``;
+    sockets that fail or time out are unregistered so one slow client
+    cannot hold up the others.
+    """
+
+    def __init__(self, send_timeout: float) -> None:
+        self.send_timeout = send_timeout
+        self.active_connections: Dict[str, WebSocket] = {}
+
+    def __len__(self) -> int:
+        return len(self.active_connections)
+
+    async def connect(self, session_id: str, websocket: WebSocket) -> Optional[str]:
+        """
+        Accept a websocket and register it.
+
+        :param session_id: id of the live feed session, sent to the client.
+        :param websocket: incoming connection.
+        :return: negotiated subprotocol, None for the text protocol.
+        """
+        # Clients offering the binary subprotocol send raw JPEG frames
+        subprotocol = negotiate_subprotocol(websocket.scope.get("subprotocols", []))
+        await websocket.accept(subprotocol=subprotocol)
+        await websocket.send_text(session_id)
+        self.active_connections[session_id] = websocket
+        LIVE_CONNECTIONS.set(len(self.active_connections))
+        return subprotocol
+
+    def disconnect(self, session_id: str) -> None:
+        """
+        Unregister a websocket.
+
+        :param session_id: id of the live feed session.
+        """
+        self.active_connections.pop(session_id, None)
+        LIVE_CONNECTIONS.set(len(self.active_connections))
+
+    async def _send(self, session_id: str, websocket: WebSocket, message: str) -> bool:
+        try:
+            await asyncio.wait_for(websocket.send_text(message), self.send_timeout)
+        except (asyncio.TimeoutError, RuntimeError, OSError) as e:
+            logger.warning(f"Dropping live feed {session_id} after failed send: {e!r}")
+            self.disconnect(session_id)
+            return False
+        return True
+
+    async def broadcast(self, message: str) -> int:
+        """
+        Send a text message to every connection.
+
+        :param message: text to send.
+        :return: number of connections that received it.
+        """
+        targets: List = list(self.active_connections.items())
+        sent = await asyncio.gather(
+            *[self._send(session_id, websocket, message) for session_id, websocket in targets],
+        )
+        return sum(sent)
+
+    async def close_all(self, code: int = 1001) -> None:
+        """
+        Close every connection, on shutdown.
+
+        :param code: websocket close code, "going away" by default.
+        """
+        targets = list(self.active_connections.items())
+        self.active_connections.clear()
+        LIVE_CONNECTIONS.set(0)
+        await asyncio.gather(
+            *[websocket.close(code) for _, websocket in targets],
+            return_exceptions=True,
+        )
+
+
+connection_manager = ConnectionManager(send_timeout=settings.live_send_timeout_seconds)
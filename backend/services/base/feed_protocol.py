@@ -0,0 +1,99 @@
+import base64
+import json
+import struct
+from typing import Iterable, List, NamedTuple, Optional, Sequence
+
+# Offered by clients in Sec-WebSocket-Protocol to send binary frames,
+# connections without it keep the JSON text protocol
+BINARY_SUBPROTOCOL = "flipgrid.frames.v1"
+PROTOCOL_VERSION = 1
+
+# version, flags (reserved), class id, sequence number, capture time in ms
+FRAME_HEADER = struct.Struct("!BBHIQ")
+
+
+class FrameProtocolError(ValueError):
+    """Raised for a camera frame message that cannot be decoded."""
+
+
+class FeedFrame(NamedTuple):
+    """A camera frame sent over the live feed websocket."""
+
+    detected_class: Optional[str]
+    image: Optional[bytes]
+    seq: Optional[int] = None
+    timestamp_ms: Optional[int] = None
+
+
+def negotiate_subprotocol(offered: Iterable[str]) -> Optional[str]:
+    """
+    Subprotocol to accept for a websocket handshake.
+
+    :param offered: subprotocols listed by the client.
+    :return: the binary protocol when offered, None for the text protocol.
+    """
+    return BINARY_SUBPROTOCOL if BINARY_SUBPROTOCOL in offered else None
+
+
+def encode_binary_frame(class_id: int, seq: int, timestamp_ms: int, jpeg: bytes) -> bytes:
+    """
+    Binary message of a frame: a 16 byte header followed by the JPEG.
+
+    :param class_id: index of the detected class in the class table.
+    :param seq: sequence number of the frame.
+    :param timestamp_ms: capture time, milliseconds since the epoch.
+    :param jpeg: encoded image.
+    :return: websocket message payload.
+    """
+    return FRAME_HEADER.pack(PROTOCOL_VERSION, 0, class_id, seq, timestamp_ms) + jpeg
+
+
+def decode_binary_frame(data: bytes, class_names: Sequence[str] = ()) -> FeedFrame:
+    """
+    Decode a binary frame message.
+
+    :param data: websocket message payload.
+    :param class_names: class table sent by the client, ids are used as names without it.
+    :return: the frame, the image being a view of ``data``.
+    :raises FrameProtocolError: for a short message or an unknown version.
+    """
+    if len(data) < FRAME_HEADER.size:
+        raise FrameProtocolError(f"Frame message of {len(data)} bytes is shorter than its header")
+    version, _, class_id, seq, timestamp_ms = FRAME_HEADER.unpack_from(data)
+    if version != PROTOCOL_VERSION:
+        raise FrameProtocolError(f"Unsupported frame protocol version {version}")
+    detected_class = class_names[class_id] if class_id < len(class_names) else str(class_id)
+    image = memoryview(data)[FRAME_HEADER.size :]
+    return FeedFrame(detected_class, image if len(image) else None, seq, timestamp_ms)
+
+
+def decode_text_frame(data: str) -> FeedFrame:
+    """
+    Decode a JSON frame message of the text protocol.
+
+    :param data: ``{"image": <data URL>, "class": <name>}`` document.
+    :return: the frame.
+    :raises FrameProtocolError: for invalid JSON or base64.
+    """
+    try:
+        message = json.loads(data)
+        image_base64 = message.get("image")
+        # Data URLs carry a "data:image/jpeg;base64," prefix
+        image = base64.b64decode(image_base64.rpartition(",")[2]) if image_base64 else None
+    except (ValueError, AttributeError) as e:
+        raise FrameProtocolError(f"Invalid frame message: {e}") from e
+    return FeedFrame(message.get("class"), image)
+
+
+def decode_class_table(data: str) -> Optional[List[str]]:
+    """
+    Class table of a binary protocol client, sent once as text.
+
+    :param data: ``{"classes": [<name>, ...]}`` document.
+    :return: class names indexed by class id, None for other messages.
+    """
+    try:
+        classes = json.loads(data).get("classes")
+    except (ValueError, AttributeError):
+        return None
+    return [str(name) for name in classes] if isinstance(classes, list) else None
@@ -0,0 +1,101 @@
+import asyncio
+from collections import deque
+from typing import Any, Deque, Optional
+
+from prometheus_client import Counter, Gauge
+
+DROP_OLDEST = "drop_oldest"
+LATEST_WINS = "latest_wins"
+EVERY_NTH = "every_nth"
+DROP_POLICIES = (DROP_OLDEST, LATEST_WINS, EVERY_NTH)
+
+LIVE_QUEUE_DEPTH = Gauge(
+    "live_feed_queue_depth",
+    "Frames waiting to be processed, over all live feed connections.",
+)
+LIVE_FRAMES_RECEIVED = Counter(
+    "live_feed_frames_received_total",
+    "Frames received on live feed connections.",
+)
+LIVE_FRAMES_DROPPED = Counter(
+    "live_feed_frames_dropped_total",
+    "Frames dropped before processing because the live feed fell behind.",
+    ["policy"],
+)
+
+
+class FrameQueue:
+    """
+    Bounded queue between the receiving and processing tasks of a socket.
+
+    ``put`` never blocks, so the socket is always read at the pace the
+    client sends. When processing falls behind, frames are dropped by
+    policy: ``drop_oldest`` discards the oldest queued frame,
+    ``latest_wins`` only ever keeps the newest frame and ``every_nth``
+    only admits every ``nth`` received frame, dropping the oldest ones
+    when the queue is still full.
+    """
+
+    def __init__(self, maxsize: int, policy: str = DROP_OLDEST, nth: int = 1) -> None:
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{policy}', expected one of {DROP_POLICIES}")
+        self.maxsize = 1 if policy == LATEST_WINS else max(1, maxsize)
+        self.policy = policy
+        self.nth = max(1, nth)
+        self.received = 0
+        self.dropped = 0
+        self._items: Deque[Any] = deque()
+        self._ready = asyncio.Event()
+        self._closed = False
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, item: Any) -> bool:
+        """
+        Queue a frame, dropping frames as the policy says.
+
+        :param item: received frame message.
+        :return: False if the frame itself was dropped.
+        """
+        self.received += 1
+        LIVE_FRAMES_RECEIVED.inc()
+        if self.policy == EVERY_NTH and (self.received - 1) % self.nth:
+            self._drop(1)
+            return False
+        if len(self._items) >= self.maxsize:
+            self._items.popleft()
+            LIVE_QUEUE_DEPTH.dec()
+            self._drop(1)
+        self._items.append(item)
+        LIVE_QUEUE_DEPTH.inc()
+        self._ready.set()
+        return True
+
+    async def get(self) -> Optional[Any]:
+        """
+        Next frame to process.
+
+        :return: the oldest queued frame, None once closed and drained.
+        """
+        while not self._items:
+            if self._closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        LIVE_QUEUE_DEPTH.dec()
+        return self._items.popleft()
+
+    def close(self) -> None:
+        """Stop accepting frames, ``get`` returns None once drained."""
+        self._closed = True
+        self._ready.set()
+
+    def discard(self) -> None:
+        """Drop the frames still queued, when the connection goes away."""
+        LIVE_QUEUE_DEPTH.dec(len(self._items))
+        self._items.clear()
+
+    def _drop(self, count: int) -> None:
+        self.dropped += count
+        LIVE_FRAMES_DROPPED.labels(self.policy).inc(count)
@@ -0,0 +1,40 @@
+from typing import AsyncIterator
+
+from backend.commons.responses import ServiceResponse, ServiceResponseStatus
+from backend.logging import get_logger
+from backend.services.commons.base import BaseService
+from backend.services.ml.frame import ObjectDetectionVideoProcessor
+from backend.services.ml.video_stream import StreamDecodeError, StreamDecoder, detect_stream
+from backend.services.ml.workers import PoolSaturatedError
+from backend.settings import settings
+
+logger = get_logger(__name__)
+
+
+class VideoService(BaseService):
+    __item_name__ = "Video"
+
+    def __init__(self):
+        self.processor = ObjectDetectionVideoProcessor(str(settings.video_frames_dir))
+        self.decoder = StreamDecoder(
+            settings.video_stream_width,
+            settings.video_stream_height,
+            settings.video_sampling_mode,
+            stride=settings.video_frame_stride,
+            stride_ms=settings.video_time_stride_ms,
+            ffmpeg_cmd=settings.ffmpeg_cmd,
+            max_bytes=settings.video_stream_max_bytes,
+        )
+
+    async def detect_upload(self, chunks: AsyncIterator[bytes]) -> ServiceResponse:
+        try:
+            saved = await detect_stream(self.processor, self.decoder, chunks)
+        except StreamDecodeError as e:
+            return self.response(ServiceResponseStatus.BAD_REQUEST, message=str(e))
+        except PoolSaturatedError as e:
+            logger.warning(f"Rejected video upload: {e}")
+            return self.response(ServiceResponseStatus.ERROR, message=str(e))
+        if not saved:
+            return self.response(ServiceResponseStatus.NOTFOUND)
+        # Saved frames are server-side paths, ready for /form/fill
+        return self.response(ServiceResponseStatus.FETCHED, result=saved)
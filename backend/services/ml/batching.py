@@ -0,0 +1,161 @@
+import asyncio
+import time
+from typing import Callable, List, NamedTuple, Optional
+
+import numpy as np
+from prometheus_client import Histogram
+
+from backend.logging import get_logger
+
+logger = get_logger(__name__)
+
+BATCH_SIZE = Histogram(
+    "ml_inference_batch_size",
+    "Number of images in each flushed inference batch.",
+    ["batcher"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+QUEUE_WAIT = Histogram(
+    "ml_inference_queue_wait_seconds",
+    "Time a request spent queued before its batch was flushed.",
+    ["batcher"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+class _PendingRequest(NamedTuple):
+    tensors: np.ndarray
+    future: asyncio.Future
+    enqueued_at: float
+
+
+class InferenceBatcher:
+    """
+    Dynamic micro-batching in front of a model.
+
+    Concurrent callers submit image tensors with ``predict``. A single
+    background task drains the queue and flushes a batch as soon as it
+    holds ``max_batch_size`` rows or the oldest request has waited
+    ``max_wait_ms``. The batch runs in the default executor, so the event
+    loop stays free, and every caller gets back only its own rows.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        max_batch_size: int,
+        max_wait_ms: float,
+    ) -> None:
+        self.name = name
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._carry: Optional[_PendingRequest] = None
+        # Requests taken off the queue and not answered yet, kept here so
+        # ``stop`` can fail them while a batch is collected or running
+        self._batch: List[_PendingRequest] = []
+
+    @property
+    def running(self) -> bool:
+        """
+        Whether the flush loop is active.
+
+        :return: True once ``start`` was awaited and until ``stop``.
+        """
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """Start the background flush loop on the running event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and fail requests that are queued or in flight."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        pending = self._batch + ([self._carry] if self._carry else [])
+        self._batch = []
+        self._carry = None
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for request in pending:
+            if not request.future.done():
+                request.future.set_exception(RuntimeError("Batcher stopped"))
+
+    async def predict(self, tensors: np.ndarray) -> np.ndarray:
+        """
+        Queue tensors for the next batch and wait for their predictions.
+
+        :param tensors: array of shape (N, ...) for one caller.
+        :return: model output rows for these tensors, in order.
+        :raises RuntimeError: if the batcher is not running.
+        """
+        if not self.running or self._queue is None:
+            raise RuntimeError(f"Batcher {self.name} is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingRequest(tensors, future, time.perf_counter()))
+        return await future
+
+    async def _next_request(self, timeout: Optional[float]) -> _PendingRequest:
+        if self._carry is not None:
+            request, self._carry = self._carry, None
+            return request
+        if timeout is None:
+            return await self._queue.get()  # type: ignore
+        return await asyncio.wait_for(self._queue.get(), timeout)  # type: ignore
+
+    async def _collect(self) -> List[_PendingRequest]:
+        batch = self._batch = [await self._next_request(None)]
+        rows = len(batch[0].tensors)
+        deadline = batch[0].enqueued_at + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = await self._next_request(remaining)
+            except asyncio.TimeoutError:
+                break
+            if rows + len(request.tensors) > self.max_batch_size:
+                self._carry = request
+                break
+            batch.append(request)
+            rows += len(request.tensors)
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            flushed_at = time.perf_counter()
+            for request in batch:
+                QUEUE_WAIT.labels(self.name).observe(flushed_at - request.enqueued_at)
+            tensors = np.concatenate([request.tensors for request in batch])
+            BATCH_SIZE.labels(self.name).observe(len(tensors))
+            try:
+                outputs = await loop.run_in_executor(None, self.predict_fn, tensors)
+            except Exception as e:
+                logger.error(f"Batch inference failed in {self.name}: {e}")
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                self._batch = []
+                continue
+            offset = 0
+            for request in batch:
+                size = len(request.tensors)
+                if not request.future.done():
+                    request.future.set_result(outputs[offset : offset + size])
+                offset += size
+            self._batch = []
@@ -0,0 +1,254 @@
+"""
+Offline benchmarks of the ML pipelines.
+
+Compare OCR engines on the packaged-product pipeline (OCR, then label
+parsing) over a folder of scans::
+
+    python -m backend.services.ml.benchmark ocr --images data/scans \\
+        --engines replay tesseract --concurrency 8
+
+The ``replay`` engine serves recorded Textract responses, see
+``BACKEND_OCR_RECORD_DIR`` for recording them and
+``BACKEND_OCR_REPLAY_LATENCY_MS`` / ``BACKEND_OCR_REPLAY_JITTER_MS`` for
+the injected latency.
+
+Compare the label parser with the former regex helpers on the OCR texts
+kept in the Textract store, or on a folder of ``.txt`` files::
+
+    python -m backend.services.ml.benchmark labels --texts data/ocr_texts
+"""
+
+import argparse
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from backend.services.ml.cache import content_hash
+from backend.services.ml.crud import ImageProcessor
+from backend.services.ml.export import list_images
+from backend.services.ml.label_parser import key_term_positions, parse_label, scan_label
+from backend.services.ml.ocr import OCR_ENGINES, REPLAY, TEXTRACT_FEATURES, textract_text
+from backend.services.ml.ocr_store import textract_store
+from backend.settings import settings
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        f"p{pct}_ms": round(float(np.percentile(latencies_ms, pct)), 2)
+        for pct in (50, 95, 99)
+    }
+
+
+def run_packaged(processor: ImageProcessor, document_bytes: bytes) -> float:
+    """
+    Run the packaged-product pipeline on one scan, bypassing the OCR cache.
+
+    :param processor: processor holding the OCR engine under test.
+    :param document_bytes: encoded scan.
+    :return: latency in seconds.
+    """
+    started = time.perf_counter()
+    text = processor.ocr_engine.extract_text(document_bytes, content_hash(document_bytes))
+    processor.extract_details(text)
+    processor.extract_brand(text)
+    return time.perf_counter() - started
+
+
+def ocr(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """
+    Run the ``ocr`` command and print the report.
+
+    :param args: parsed command line.
+    :return: one report row per engine.
+    """
+    images = list_images(args.images, args.limit)
+    if not images:
+        raise SystemExit(f"No images found in {args.images}")
+    documents = [Path(image_path).read_bytes() for image_path in images]
+    documents = documents * args.repeats
+
+    report = []
+    for engine in args.engines:
+        processor = ImageProcessor(settings.tesseract_cmd, [], 0, ocr_engine=engine)
+        run_packaged(processor, documents[0])  # warm-up
+        with ThreadPoolExecutor(args.concurrency) as executor:
+            started = time.perf_counter()
+            latencies = list(
+                executor.map(lambda data: run_packaged(processor, data), documents),
+            )
+            elapsed = time.perf_counter() - started
+        row: Dict[str, Any] = {"engine": engine}
+        row.update(_percentiles(latencies))
+        row["throughput_ips"] = round(len(documents) / elapsed, 1)
+        report.append(row)
+
+    print(f"{len(documents)} scans, concurrency {args.concurrency}")
+    print(f"{'engine':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'scans/s':>8}")
+    for row in report:
+        print(
+            f"{row['engine']:<10} {row['p50_ms']:>8} {row['p95_ms']:>8} "
+            f"{row['p99_ms']:>8} {row['throughput_ips']:>8}",
+        )
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+    return report
+
+
+def _legacy_compare_dates(date1: str, date2: str) -> tuple:
+    d1 = datetime.strptime(date1, "%d.%m.%y")
+    d2 = datetime.strptime(date2, "%d.%m.%y")
+    return (date1, date2) if d1 < d2 else (date2, date1)
+
+
+def legacy_extract_details(text: str) -> tuple:
+    """
+    ``ImageProcessor.extract_details`` before the label parser.
+
+    :param text: OCR text.
+    :return: MRP, manufacturing dates and expiry dates.
+    """
+    mrp_match = re.search(
+        r"(?:Rs|MRP|₹)[\s.:₹]*([\d]+(?:\.\d+)?)(?:[/-])?", text, re.IGNORECASE
+    )
+    mrp = mrp_match.group(1) if mrp_match else None
+    unique_dates = sorted(
+        set(
+            re.findall(r"(\d{2}\.\d{2}\.\d{2})", text)
+            + re.findall(r"(\b\d{2}/\d{2}\b)", text)
+            + re.findall(r"(\b\d{2}/\d{4}\b)", text)
+        )
+    )[:2]
+    updated_dates = []
+    for date_str in unique_dates:
+        if len(date_str) == 7 and "/" in date_str:
+            month, year = date_str.split("/")
+            date_str = f"01.{month}.{year[-2:]}"
+        elif len(date_str) == 5 and "/" in date_str:
+            month, year = date_str.split("/")
+            date_str = f"01.{month}.{year}"
+        updated_dates.append(date_str)
+    if len(unique_dates) == 2:
+        date1, date2 = _legacy_compare_dates(updated_dates[0], updated_dates[1])
+        return mrp, [date1], [date2]
+    if len(unique_dates) == 1:
+        return mrp, [updated_dates[0]], [None]
+    return mrp, [None], [None]
+
+
+def legacy_key_term_positions(text: str) -> list:
+    """
+    Key term lookup of ``ImageProcessor.extract_brand`` before the parser.
+
+    :param text: OCR text.
+    :return: first position of each key term found.
+    """
+    positions = []
+    for term in ["MRP", "Mfd", "Exp.", "Manufactured", "Marketed By"]:
+        term_match = re.search(term, text, re.IGNORECASE)
+        if term_match:
+            positions.append(term_match.start())
+    return positions
+
+
+def _label_corpus(args: argparse.Namespace) -> List[str]:
+    if args.texts:
+        return [path.read_text() for path in sorted(Path(args.texts).rglob("*.txt"))]
+    features = textract_store.feature_key(TEXTRACT_FEATURES)
+    return [
+        textract_text(stored.response)
+        for stored in textract_store.recent(args.limit)
+        if stored.feature_types == features
+    ]
+
+
+def _time_per_text(parse: Any, texts: List[str], repeats: int) -> List[float]:
+    latencies = []
+    for _ in range(repeats):
+        for text in texts:
+            started = time.perf_counter()
+            parse(text)
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def labels(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """
+    Run the ``labels`` command and print the report.
+
+    :param args: parsed command line.
+    :return: one report row per parser.
+    """
+    texts = _label_corpus(args)
+    if not texts:
+        raise SystemExit("No OCR texts found")
+
+    def _legacy(text: str) -> Any:
+        try:
+            details = legacy_extract_details(text)
+        except ValueError:
+            details = None  # impossible date, the old parser raised
+        return details, legacy_key_term_positions(text)
+
+    def _current(text: str) -> Any:
+        scan_label.cache_clear()  # time the scan, not the memo
+        label = parse_label(text)
+        fields = (label.mrp, [label.manufacturing_date], [label.expiry_date])
+        return fields, key_term_positions(scan_label(text))
+
+    agree = sum(_legacy(text) == _current(text) for text in texts)
+    report = []
+    for name, parse in (("legacy", _legacy), ("label_parser", _current)):
+        latencies = _time_per_text(parse, texts, args.repeats)
+        latencies_us = np.asarray(latencies) * 1e6
+        row: Dict[str, Any] = {"parser": name}
+        for pct in (50, 95, 99):
+            row[f"p{pct}_us"] = round(float(np.percentile(latencies_us, pct)), 1)
+        row["texts_per_s"] = round(len(latencies) / sum(latencies), 1)
+        report.append(row)
+
+    print(f"{len(texts)} texts, {agree} parsed identically")
+    print(f"{'parser':<14} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9} {'texts/s':>10}")
+    for row in report:
+        print(
+            f"{row['parser']:<14} {row['p50_us']:>9} {row['p95_us']:>9} "
+            f"{row['p99_us']:>9} {row['texts_per_s']:>10}",
+        )
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+    return report
+
+
+def main() -> None:
+    """Entrypoint of the benchmark tool."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ocr_cmd = commands.add_parser("ocr", help="compare OCR engines")
+    ocr_cmd.add_argument("--images", required=True)
+    ocr_cmd.add_argument("--engines", nargs="+", choices=OCR_ENGINES, default=[REPLAY])
+    ocr_cmd.add_argument("--limit", type=int, default=0)
+    ocr_cmd.add_argument("--repeats", type=int, default=1)
+    ocr_cmd.add_argument("--concurrency", type=int, default=settings.textract_max_concurrency)
+    ocr_cmd.add_argument("--json", default="")
+    ocr_cmd.set_defaults(handler=ocr)
+
+    labels_cmd = commands.add_parser("labels", help="benchmark the label parser")
+    labels_cmd.add_argument("--texts", default="")
+    labels_cmd.add_argument("--limit", type=int, default=1000)
+    labels_cmd.add_argument("--repeats", type=int, default=20)
+    labels_cmd.add_argument("--json", default="")
+    labels_cmd.set_defaults(handler=labels)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
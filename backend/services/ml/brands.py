@@ -0,0 +1,473 @@
+import datetime
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import (
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.db.models.brand import Brand
+from backend.logging import get_logger
+from backend.settings import settings
+
+logger = get_logger(__name__)
+
+# Seed of the brands table, used until the catalog is loaded from the database
+DEFAULT_BRANDS = (
+    "WH Protective Oil",
+    "Colgate",
+    "LetsShave",
+    "Nivea",
+    "Garnier",
+    "Dettol",
+    "Vaseline",
+    "Himalaya",
+    "Dabur",
+    "Gillette",
+    "Johnson & Johnson",
+    "L'Oréal",
+    "Parachute",
+    "Pepsodent",
+    "Sunsilk",
+    "Lifebuoy",
+    "Ponds",
+    "Clinic Plus",
+    "Head & Shoulders",
+    "Oral-B",
+    "Sensodyne",
+    "Fair & Lovely",
+    "Rexona",
+    "Cinthol",
+    "Patanjali",
+    "Godrej",
+    "HUL (Hindustan Unilever)",
+    "Emami",
+    "Boroplus",
+    "Santoor",
+    "ITC",
+    "Park Avenue",
+    "Fiama",
+    "Old Spice",
+    "Lux",
+    "Wild Stone",
+    "Axe",
+    "Yardley",
+    "Nirma",
+    "Surf Excel",
+    "Ariel",
+    "Tide",
+    "Vim",
+    "Medimix",
+    "Nutralite sampriti ghee",
+    "Pramix Food Jaggery Cube",
+    "SURYA NAMKEEN",
+    "Goodknight",
+    "Shudh Ghee",
+)
+
+# Fewest trigrams a text window must share with a brand to match it
+MIN_SHARED_TRIGRAMS = 3
+
+# Anchors a zero-width word boundary check at an arbitrary offset
+_BOUNDARY = re.compile(r"\b")
+_NON_WORD = re.compile(r"[^\w]+|_+")
+
+
+class BrandHit(NamedTuple):
+    """A brand name found in an OCR text."""
+
+    brand: str
+    start: int
+    end: int
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """
+    Regex alternation of the terms, factored as a character trie.
+
+    At any position the pattern matches the longest term, so the scan
+    never backtracks over alternatives sharing a prefix.
+
+    :param terms: lowercase terms.
+    :return: regex source.
+    """
+    trie: Dict[str, dict] = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def _build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + _build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return _build(trie)
+
+
+class _TermScanner:
+    """
+    Finds every occurrence of a set of terms in one pass over the text.
+
+    Occurrences may overlap, and terms that are prefixes of a longer
+    term found at the same offset are reported as well.
+    """
+
+    def __init__(self, terms: Iterable[str], whole_words: bool) -> None:
+        keys = {term.lower() for term in terms if term}
+        self.whole_words = whole_words
+        # Every term that is a prefix of a given term, longest first
+        self.prefixes: Dict[str, Tuple[str, ...]] = {
+            key: tuple(sorted((other for other in keys if key.startswith(other)), key=len, reverse=True))
+            for key in keys
+        }
+        body = _trie_pattern(keys) if keys else "(?!)"
+        if whole_words:
+            body = rf"\b{body}\b"
+        self.pattern = re.compile(f"(?=({body}))", re.IGNORECASE)
+
+    def scan(self, text: str) -> List[Tuple[str, int, int]]:
+        """
+        Term occurrences in order of position.
+
+        :param text: text to scan.
+        :return: ``(term, start, end)`` tuples, terms in lowercase.
+        """
+        found = []
+        for match in self.pattern.finditer(text):
+            start = match.start()
+            for key in self.prefixes.get(match.group(1).lower(), ()):
+                end = start + len(key)
+                if self.whole_words and not _BOUNDARY.match(text, end):
+                    continue
+                found.append((key, start, end))
+        return found
+
+
+class BrandMatcher:
+    """
+    Precompiled matcher of a brand catalog against OCR text.
+
+    Brand names and the words of brand names are each compiled into a
+    single case-insensitive regex, so a text is scanned once whatever
+    the size of the catalog. Results keep the semantics of the former
+    per-brand ``re`` scans: catalog order decides ties, and the hits of a
+    brand never overlap each other.
+    """
+
+    def __init__(self, brands: Sequence[str]) -> None:
+        self.brands = tuple(brands)
+        self._names: Dict[str, List[int]] = {}
+        self._words: Dict[str, List[int]] = {}
+        for rank, brand in enumerate(self.brands):
+            self._names.setdefault(brand.lower(), []).append(rank)
+            for word in brand.split():
+                self._words.setdefault(word.lower(), []).append(rank)
+        self._name_scanner = _TermScanner(self._names, whole_words=False)
+        self._word_scanner = _TermScanner(self._words, whole_words=True)
+
+    def find_all(self, text: str) -> List[BrandHit]:
+        """
+        Every brand occurrence, grouped by brand in catalog order.
+
+        :param text: OCR text.
+        :return: brand hits, by catalog order then offset.
+        """
+        per_brand: Dict[int, List[BrandHit]] = {}
+        for key, start, end in self._name_scanner.scan(text):
+            for rank in self._names[key]:
+                hits = per_brand.setdefault(rank, [])
+                if not hits or start >= hits[-1].end:
+                    hits.append(BrandHit(self.brands[rank], start, end))
+        return [hit for rank in sorted(per_brand) for hit in per_brand[rank]]
+
+    def first_word_match(self, text: str) -> Optional[str]:
+        """
+        First brand, in catalog order, with any of its words in the text.
+
+        :param text: OCR text.
+        :return: the brand or None.
+        """
+        ranks = [
+            rank
+            for key, _, _ in self._word_scanner.scan(text)
+            for rank in self._words[key]
+        ]
+        return self.brands[min(ranks)] if ranks else None
+
+
+@lru_cache(maxsize=8)
+def get_brand_matcher(brands: Tuple[str, ...]) -> BrandMatcher:
+    """
+    Compiled matcher of a catalog, built once per distinct catalog.
+
+    :param brands: brand names in priority order.
+    :return: the matcher.
+    """
+    return BrandMatcher(brands)
+
+
+class FuzzyMatch(NamedTuple):
+    """Best catalog entry for a noisy brand name."""
+
+    brand: str
+    score: float
+
+
+def _words(text: str) -> List[str]:
+    return [word for word in _NON_WORD.split(text.lower()) if word]
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """
+    Trigrams of a text, computed the way PostgreSQL pg_trgm does.
+
+    The text is lowercased and split on non-alphanumeric characters,
+    each word is padded with two spaces in front and one behind.
+
+    :param text: text to split.
+    :return: set of trigrams.
+    """
+    grams: Set[str] = set()
+    for word in _words(text):
+        padded = f"  {word} "
+        grams.update(padded[idx : idx + 3] for idx in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class TrigramIndex:
+    """
+    In-memory inverted index from trigrams to brand names.
+
+    A lookup only touches the postings of the trigrams of the query, so
+    its cost depends on the query and not on the size of the catalog.
+    ``similarity`` matches pg_trgm's ``similarity``; ``word_similarity``
+    scores a brand against runs of consecutive words of a longer text,
+    like pg_trgm's ``word_similarity``, so trigrams picked up from
+    unrelated words never add up to a match.
+    """
+
+    def __init__(self) -> None:
+        self._grams: Dict[str, FrozenSet[str]] = {}
+        self._word_counts: Dict[str, int] = {}
+        self._postings: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._grams)
+
+    def add(self, name: str) -> None:
+        """
+        Index a brand name.
+
+        :param name: brand name.
+        """
+        self.remove(name)
+        grams = trigrams(name)
+        self._grams[name] = grams
+        self._word_counts[name] = max(1, len(_words(name)))
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(name)
+
+    def remove(self, name: str) -> None:
+        """
+        Drop a brand name from the index.
+
+        :param name: brand name.
+        """
+        self._word_counts.pop(name, None)
+        for gram in self._grams.pop(name, ()):
+            names = self._postings[gram]
+            names.discard(name)
+            if not names:
+                del self._postings[gram]
+
+    def _shared(self, grams: FrozenSet[str]) -> Counter:
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        return shared
+
+    def similarity(self, query: str) -> List[FuzzyMatch]:
+        """
+        Brands scored by trigram similarity with the query.
+
+        :param query: noisy brand name.
+        :return: matches sharing a trigram with the query.
+        """
+        grams = trigrams(query)
+        return [
+            FuzzyMatch(name, count / (len(grams) + len(self._grams[name]) - count))
+            for name, count in self._shared(grams).items()
+        ]
+
+    def word_similarity(
+        self,
+        text: str,
+        min_shared: int = MIN_SHARED_TRIGRAMS,
+    ) -> List[FuzzyMatch]:
+        """
+        Brands scored by their best match on a window of the text.
+
+        Windows span as many words as the brand, or one more to allow
+        for words split by OCR. The score is the share of the brand's
+        trigrams found in the window, and windows sharing fewer than
+        ``min_shared`` trigrams with the brand are ignored.
+
+        :param text: OCR text.
+        :param min_shared: minimal number of shared trigrams.
+        :return: matches with at least one qualifying window.
+        """
+        word_grams = [trigrams(word) for word in _words(text)]
+        windows: Dict[int, List[FrozenSet[str]]] = {}
+        matches = []
+        for name, total in self._shared(frozenset().union(*word_grams)).items():
+            if total < min_shared:
+                continue  # not even the whole text shares enough trigrams
+            grams = self._grams[name]
+            best = 0
+            for span in (self._word_counts[name], self._word_counts[name] + 1):
+                if span not in windows:
+                    windows[span] = [
+                        frozenset().union(*word_grams[start : start + span])
+                        for start in range(max(1, len(word_grams) - span + 1))
+                    ]
+                for window in windows[span]:
+                    best = max(best, len(grams & window))
+            if best >= min_shared:
+                matches.append(FuzzyMatch(name, best / len(grams)))
+        return matches
+
+
+class BrandCatalog:
+    """
+    Active brands, mirrored from the ``brands`` table.
+
+    Serves exact matching through ``brands`` and fuzzy matching through
+    a trigram index. ``refresh`` only reads the rows changed since the
+    previous call and patches the index in place, so catalog edits are
+    picked up without a redeploy. ``updated_at`` is stamped when a row is
+    written, not when it commits, so each refresh reads ``overlap``
+    seconds back to catch rows committed after a later stamped one.
+    Deleted brands are deactivated rows, as the table turns deletes into
+    updates of ``is_active``.
+    """
+
+    def __init__(self, brands: Sequence[str], overlap: float = 0.0) -> None:
+        self._lock = threading.Lock()
+        self._ids: Dict[str, int] = {}
+        self._names: Dict[int, str] = {}
+        self._index = TrigramIndex()
+        self.brands: Tuple[str, ...] = ()
+        self.last_updated: Optional[datetime.datetime] = None
+        self.overlap = datetime.timedelta(seconds=overlap)
+        self._apply([(rank, name, True) for rank, name in enumerate(brands)])
+
+    def _apply(self, rows: Iterable[Tuple[int, str, bool]]) -> None:
+        with self._lock:
+            for brand_id, name, is_active in rows:
+                previous = self._names.pop(brand_id, None)
+                if previous is not None:
+                    del self._ids[previous]
+                    self._index.remove(previous)
+                if is_active:
+                    self._ids[name] = brand_id
+                    self._names[brand_id] = name
+                    self._index.add(name)
+            # Catalog order, as used to break ties, follows the row ids
+            self.brands = tuple(sorted(self._ids, key=self._ids.get))
+
+    def _best(self, matches: List[FuzzyMatch], threshold: float) -> Optional[FuzzyMatch]:
+        # Highest score, ties go to the brand listed first
+        best = max(
+            matches,
+            key=lambda match: (match.score, -self._ids[match.brand]),
+            default=None,
+        )
+        if best is None or best.score < threshold:
+            return None
+        return best
+
+    def match(self, query: str, threshold: float) -> Optional[FuzzyMatch]:
+        """
+        Closest brand to a noisy brand name.
+
+        :param query: brand name as read by OCR.
+        :param threshold: minimal similarity.
+        :return: best match or None.
+        """
+        with self._lock:
+            return self._best(self._index.similarity(query), threshold)
+
+    def search(self, text: str, threshold: float) -> Optional[FuzzyMatch]:
+        """
+        Brand best matching a run of words of an OCR text.
+
+        :param text: OCR text.
+        :param threshold: minimal share of the brand's trigrams.
+        :return: best match or None.
+        """
+        with self._lock:
+            return self._best(self._index.word_similarity(text), threshold)
+
+    async def seed(self, session: AsyncSession) -> None:
+        """
+        Fill an empty ``brands`` table with the current brands.
+
+        :param session: database session.
+        """
+        count = await session.scalar(select(func.count()).select_from(Brand))
+        if count:
+            return
+        session.add_all(Brand(name=name) for name in self.brands)
+        await session.commit()
+        logger.info(f"Seeded brands table with {len(self.brands)} brands")
+
+    async def refresh(self, session: AsyncSession) -> int:
+        """
+        Apply the catalog rows changed since the previous refresh.
+
+        The first call replaces the seed brands with the table content.
+        Rows read again within the overlap window are only applied when
+        they differ from the catalog.
+
+        :param session: database session.
+        :return: number of changed rows.
+        """
+        query = select(Brand.id, Brand.name, Brand.is_active, Brand.updated_at)
+        if self.last_updated is not None:
+            query = query.where(Brand.updated_at > self.last_updated - self.overlap)
+        rows = (await session.execute(query.order_by(Brand.updated_at))).all()
+        if not rows:
+            return 0
+        if self.last_updated is None:
+            with self._lock:
+                self._ids.clear()
+                self._names.clear()
+                self._index = TrigramIndex()
+        with self._lock:
+            changed = [
+                (row.id, row.name, row.is_active)
+                for row in rows
+                if self._names.get(row.id) != (row.name if row.is_active else None)
+            ]
+        self._apply(changed)
+        self.last_updated = max(self.last_updated or rows[-1].updated_at, rows[-1].updated_at)
+        return len(changed)
+
+
+brand_catalog = BrandCatalog(DEFAULT_BRANDS, overlap=settings.brand_refresh_overlap_seconds)
@@ -0,0 +1,105 @@
+import hashlib
+import threading
+from typing import Any, Hashable, Optional, Tuple
+
+from cachetools import TTLCache
+from prometheus_client import Counter
+
+from backend.settings import settings
+
+CLASSIFIER = "classifier"
+OCR = "ocr"
+
+CACHE_HITS = Counter(
+    "ml_result_cache_hits_total",
+    "Results served from the content-hash cache.",
+    ["kind"],
+)
+CACHE_MISSES = Counter(
+    "ml_result_cache_misses_total",
+    "Lookups in the content-hash cache that had to be computed.",
+    ["kind"],
+)
+
+
+def content_hash(data: bytes) -> str:
+    """
+    Digest identifying an image by its bytes.
+
+    :param data: encoded image.
+    :return: hex SHA-256 of the bytes.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResultCache:
+    """
+    Classifier and OCR results keyed by image content.
+
+    Entries are keyed by the kind of result, the SHA-256 of the image
+    bytes and the version of the model or OCR engine that produced
+    them, so upgrading a model never serves stale results. Eviction is
+    LRU with a TTL, as provided by the underlying ``TTLCache``.
+    """
+
+    def __init__(self, store: TTLCache) -> None:
+        self._store = store
+        self._lock = threading.Lock()
+
+    @property
+    def maxsize(self) -> int:
+        """
+        Number of results the cache holds.
+
+        :return: capacity of the underlying store.
+        """
+        return int(self._store.maxsize)
+
+    @staticmethod
+    def key(kind: str, digest: str, version: str) -> Tuple[Hashable, ...]:
+        """
+        Build the cache key of a result.
+
+        :param kind: ``classifier`` or ``ocr``.
+        :param digest: content hash of the image.
+        :param version: model or engine version.
+        :return: cache key.
+        """
+        return (kind, version, digest)
+
+    def get(self, kind: str, digest: str, version: str) -> Optional[Any]:
+        """
+        Look up a result and count the hit or miss.
+
+        :param kind: ``classifier`` or ``ocr``.
+        :param digest: content hash of the image.
+        :param version: model or engine version.
+        :return: cached result or None.
+        """
+        with self._lock:
+            value = self._store.get(self.key(kind, digest, version))
+        if value is None:
+            CACHE_MISSES.labels(kind).inc()
+        else:
+            CACHE_HITS.labels(kind).inc()
+        return value
+
+    def set(self, kind: str, digest: str, version: str, value: Any) -> None:
+        """
+        Store a result.
+
+        :param kind: ``classifier`` or ``ocr``.
+        :param digest: content hash of the image.
+        :param version: model or engine version.
+        :param value: result to cache.
+        """
+        with self._lock:
+            self._store[self.key(kind, digest, version)] = value
+
+
+result_cache = ResultCache(settings.cache)
+# OCR results get their own store, warming it from the Textract store on
+# startup must not evict the classifier results
+ocr_result_cache = ResultCache(
+    TTLCache(settings.ocr_cache_maxsize, ttl=settings.ocr_cache_ttl_seconds),
+)
@@ -1,22 +1,125 @@
+import os
 import uuid
 from backend.schemas.product import PackagedProductSchema
 from backend.services.commons.base import BaseService
 import pytesseract
 import cv2
 import numpy as np
-import re
 from datetime import datetime
+from functools import lru_cache, partial
 from keras.api.preprocessing import image
-from keras.api.models import load_model
-import boto3
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from backend.services.ml.batching import InferenceBatcher
+from backend.services.ml.brands import brand_catalog, get_brand_matcher
+from backend.services.ml.cache import CLASSIFIER, content_hash, result_cache
+from backend.services.ml.frame_store import frame_store, is_frame_ref
+from backend.services.ml.label_parser import (
+    key_term_positions,
+    parse_date,
+    parse_label,
+    scan_label,
+)
+from backend.services.ml.ocr import get_ocr_engine
+from backend.services.ml.registry import model_registry
+from backend.services.ml.runtime import BACKENDS, KERAS, ONNX, TFLITE, load_backend
 from backend.settings import settings
 
+FRESHNESS_MODEL = "freshness"
+# Input resolution of the freshness classifier
+IMAGE_SIZE = (224, 224)
+
+
+def _freshness_model_path(backend):
+    paths = {
+        KERAS: settings.freshness_model_path,
+        ONNX: settings.freshness_onnx_path,
+        TFLITE: settings.freshness_tflite_path,
+    }
+    return paths[backend]
+
+
+def _load_freshness_model(backend):
+    return load_backend(
+        backend, _freshness_model_path(backend), settings.freshness_num_threads
+    )
+
+
+# Cache version of the classifier, from the model file as it was when first
+# asked: models are loaded once per process, so a replaced file only takes
+# effect, and gets a new version, after a restart
+@lru_cache(maxsize=None)
+def freshness_model_version(backend):
+    path = _freshness_model_path(backend)
+    try:
+        modified = int(os.path.getmtime(path))
+    except OSError:
+        modified = 0
+    return f"{backend}:{os.path.basename(path)}:{modified}"
+
+
+# Registry key of the freshness classifier served by the given runtime
+def freshness_model_name(backend=None):
+    if backend is None or backend == settings.freshness_backend:
+        return FRESHNESS_MODEL
+    return f"{FRESHNESS_MODEL}:{backend}"
+
+
+# Bounds the number of in-flight OCR calls of this process
+ocr_executor = ThreadPoolExecutor(
+    max_workers=settings.textract_max_concurrency,
+    thread_name_prefix="ocr",
+)
+
+
+# The batcher always serves the configured runtime
+def _predict_freshness(batch):
+    model = model_registry.get(freshness_model_name(settings.freshness_backend))
+    return np.asarray(model.predict_on_batch(batch))
+
+
+for runtime_name in BACKENDS:
+    model_registry.register(
+        freshness_model_name(runtime_name),
+        partial(_load_freshness_model, runtime_name),
+    )
+
+# Shared by all concurrent /fill requests, started from the app lifespan
+freshness_batcher = InferenceBatcher(
+    FRESHNESS_MODEL,
+    _predict_freshness,
+    max_batch_size=settings.freshness_max_batch_size,
+    max_wait_ms=settings.freshness_max_wait_ms,
+)
+
+
+# Images are file paths or references into the live frame store
+def read_image_bytes(image_ref):
+    if is_frame_ref(image_ref):
+        return frame_store.get(image_ref).jpeg
+    with open(image_ref, "rb") as image_file:
+        return image_file.read()
+
+
+def read_image_array(image_ref):
+    if is_frame_ref(image_ref):
+        return frame_store.get(image_ref).image
+    return cv2.imread(image_ref)
+
+
+# RGB float32 input of the freshness classifier, resized like keras' load_img
+def load_classifier_image(image_ref):
+    if is_frame_ref(image_ref):
+        rgb = cv2.cvtColor(frame_store.get(image_ref).image, cv2.COLOR_BGR2RGB)
+        resized = cv2.resize(rgb, IMAGE_SIZE[::-1], interpolation=cv2.INTER_NEAREST)
+        return resized.astype(np.float32)
+    img = image.load_img(image_ref, target_size=IMAGE_SIZE)
+    return image.img_to_array(img, dtype="float32")
+
 
 class ImageProcessor(BaseService):
     __item_name__ = "ML_OCR"
 
-    def __init__(self, tesseract_cmd, image_path, count):
+    def __init__(self, tesseract_cmd, image_path, count, backend=None, ocr_engine=None):
         pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
         self.image_paths = image_path
         self.count = count
@@ -74,64 +177,14 @@ class ImageProcessor(BaseService):
             "rottenpomegranate": 9,
             "rottenorange": 10,
         }
-        self.textract = boto3.client(
-            "textract",
-            aws_access_key_id=settings.ACCESS_KEY,
-            aws_secret_access_key=settings.SECRET_KEY,
-            region_name=settings.REGION,
-        )
-        self.brands = [
-            "WH Protective Oil",
-            "Colgate",
-            "LetsShave",
-            "Nivea",
-            "Garnier",
-            "Dettol",
-            "Vaseline",
-            "Himalaya",
-            "Dabur",
-            "Gillette",
-            "Johnson & Johnson",
-            "L'Oréal",
-            "Parachute",
-            "Pepsodent",
-            "Sunsilk",
-            "Lifebuoy",
-            "Ponds",
-            "Clinic Plus",
-            "Head & Shoulders",
-            "Oral-B",
-            "Sensodyne",
-            "Fair & Lovely",
-            "Rexona",
-            "Cinthol",
-            "Patanjali",
-            "Godrej",
-            "HUL (Hindustan Unilever)",
-            "Emami",
-            "Boroplus",
-            "Santoor",
-            "ITC",
-            "Park Avenue",
-            "Fiama",
-            "Old Spice",
-            "Lux",
-            "Wild Stone",
-            "Axe",
-            "Yardley",
-            "Nirma",
-            "Surf Excel",
-            "Ariel",
-            "Tide",
-            "Vim",
-            "Medimix",
-            "Nutralite sampriti ghee",
-            "Pramix Food Jaggery Cube",
-            "SURYA NAMKEEN",
-            "Goodknight",
-            "Shudh Ghee"
-        ]
-        self.model = load_model("backend/services/ml/finalpilotmodel.h5")
+        self.ocr_engine = get_ocr_engine(ocr_engine)
+        self.brands = brand_catalog.brands
+        self.backend = backend or settings.freshness_backend
+
+    # Loaded on first use, the packaged-product path never needs it
+    @property
+    def model(self):
+        return model_registry.get(freshness_model_name(self.backend))
 
     def predict_image(self, image_path):
         print(image_path)
@@ -176,7 +229,7 @@ class ImageProcessor(BaseService):
         return response
 
     def load_images(self):
-        self.images = [cv2.imread(image_path) for image_path in self.image_paths]
+        self.images = [read_image_array(image_path) for image_path in self.image_paths]
         for idx, image in enumerate(self.images):
             if image is None:
                 raise FileNotFoundError(
@@ -205,98 +258,17 @@ class ImageProcessor(BaseService):
 
         return morph
 
-    def extract_text(self, preprocessed_image):
-        # Use multiple page segmentation modes and OCR engine modes
-        configs = [
-            "--psm 6",  # Assume a single uniform block of text
-            "--psm 3",  # Fully automatic page segmentation, but no OSD
-            "--psm 4",  # Assume a single column of text of variable sizes
-        ]
-
-        texts = []
-        for config in configs:
-            text = pytesseract.image_to_string(preprocessed_image, config=config)
-            texts.append(text)
-
-        # Choose the text with the most content
-        self.text = max(texts, key=len)
-        return self.text
-
-    @staticmethod
-    def extract_price(text):
-        # Split text into lines
-        lines = text.split("\n")
-
-        for line in lines:
-            if "MRP" in line or "M.R.P" in line:
-                match = re.search(r"([\d,]+(?:\.\d{1,2})?)", line)
-                if match:
-                    return match.group(1).replace(",", "")  # Return the matched price
-        return None  # Return None if no price found
-
-    @staticmethod
-    def extract_dates(text):
-        patterns = [
-            r"\b((?:JAN|FEB|MAR|APR|MAY|JUN|JUL|AUG|SEP|OCT|NOV|DEC)-\d{4})\b",
-            r"\b(\d{2}/\d{2}/\d{4})\b",
-            r"\b(\d{2}-\d{2}-\d{4})\b",
-        ]
-        dates = []
-        for pattern in patterns:
-            dates.extend(re.findall(pattern, text, re.IGNORECASE))
-        return dates
-
-    @staticmethod
-    def compare_dates(dates):
-        # Check if any dates are provided
-        if not dates:
-            return None, None
-
-        date_objects = []
-        for date in dates:
-            # Try parsing the date with multiple formats
-            for fmt in ("%b-%Y", "%b.%Y", "%d/%m/%Y", "%d-%m-%Y"):
-                try:
-                    date_obj = datetime.strptime(date, fmt)
-                    date_objects.append(date_obj)
-                    break  # Break if successfully parsed
-                except ValueError:
-                    continue  # Try the next format
-
-        # If no valid dates were parsed
-        if not date_objects:
-            return None, None
-
-        # Determine manufacturing and expiration dates
-        mfg_date = min(date_objects).strftime("%b-%Y")
-        exp_date = max(date_objects).strftime("%b-%Y")
-
-        # Return dates based on equality
-        if mfg_date == exp_date:
-            return mfg_date, None
-        else:
-            return mfg_date, exp_date
-
     @staticmethod
     def find_brand_in_text(text, brand_list):
-        # Loop through each brand name in the list
-        for brand in brand_list:
-            # Split the brand name into words
-            brand_words = brand.split()
-            # Check if any word from the brand is present in the text
-            for word in brand_words:
-                # Use regex to find the word in the text (case insensitive)
-                if re.search(r"\b" + re.escape(word) + r"\b", text, re.IGNORECASE):
-                    return brand  # Return the matched brand if any word is found
-        return "Brand not found"
+        # First brand in list order with any of its words in the text
+        brand = get_brand_matcher(tuple(brand_list)).first_word_match(text)
+        return brand or "Brand not found"
 
     def process_multiple_images(self):
-        self.load_images()
         extracted_texts = []
 
-        for image in self.images:
-            # preprocessed_image = self.preprocess_image_for_ocr(image)
-            text = self.extract_text(image)
+        for image_path in self.image_paths:
+            text = self.extract_text(image_path)
             extracted_texts.append(text)
 
         # Combine the text from all images
@@ -309,9 +281,7 @@ class ImageProcessor(BaseService):
         # print("Combined Text from All Images:")
         # print(combined_text)
 
-        mrp = self.extract_price(combined_text)
-        dates = self.extract_dates(combined_text)
-        mfg_date, exp_date = self.compare_dates(dates)
+        label = parse_label(combined_text)
 
         brands = self.brands
 
@@ -319,9 +289,9 @@ class ImageProcessor(BaseService):
 
         response = {
             "name": brand,
-            "expiry_date": exp_date,
-            "manufacturing_date": mfg_date,
-            "mrp": mrp,
+            "expiry_date": label.expiry_date,
+            "manufacturing_date": label.manufacturing_date,
+            "mrp": label.mrp,
             "description": (
                 combined_text[:500] if len(combined_text) > 500 else combined_text
             ),
@@ -330,109 +300,36 @@ class ImageProcessor(BaseService):
         return response
 
     def extract_text(self, image_path):
-        with open(image_path, "rb") as document:
-            document_bytes = document.read()
-
-        response = self.textract.analyze_document(
-            Document={"Bytes": document_bytes}, FeatureTypes=["LAYOUT"]
-        )
-
-        text_output = [block["Text"] for block in response["Blocks"] if "Text" in block]
-        return " ".join(text_output)
+        self.text = self.ocr_engine.read_text(read_image_bytes(image_path))
+        return self.text
 
     def extract_details(self, text):
         """
-        Extract MRP, Manufacturing Date, and Expiration Date from the text using regex.
+        Extract MRP, Manufacturing Date, and Expiration Date from the text.
         """
-        # Extract MRP
-        mrp_match = re.search(
-            r"(?:Rs|MRP|₹)[\s.:₹]*([\d]+(?:\.\d+)?)(?:[/-])?", text, re.IGNORECASE
-        )
-        mrp = mrp_match.group(1) if mrp_match else None
-
-        # Extract all dates from the text
-        # unique_dates = sorted(set(re.findall(r"(\d{2}\.\d{2}\.\d{2})", text) + re.findall(r"(\b\d{2}/\d{4}\b)", text)))
-        unique_dates = sorted(
-            set(
-                re.findall(r"(\d{2}\.\d{2}\.\d{2})", text)  # dd.mm.yy format
-                + re.findall(r"(\b\d{2}/\d{2}\b)", text)  # mm/yy format
-                + re.findall(r"(\b\d{2}/\d{4}\b)", text)  # mm/yyyy format
-            )
-        )
-        if len(unique_dates) > 2:
-            unique_dates = unique_dates[:2]  # Keep only the first two dates
-
-        print(
-            "Unique Dates Found (raw):", unique_dates
-        )  # First print for raw extracted dates
-
-        updated_dates = []
-        # for date_str in unique_dates:
-        #     if len(date_str) == 7 and '/' in date_str:  # mm/yyyy format
-        #         # Convert mm/yyyy to 00.mm.yyyy
-        #         month, year = date_str.split('/')
-        #         date_str = f"01.{month}.{year}"
-        #     elif len(date_str.split('/')) == 3:  # dd/mm/yyyy format
-        #         # Convert dd/mm/yyyy to dd.mm.yyyy
-        #         date_str = date_str.replace('/', '.')
-        #     # Add the date directly without parsing
-        #     updated_dates.append(date_str)
-        for date_str in unique_dates:
-            if len(date_str) == 7 and "/" in date_str:  # mm/yyyy format
-                month, year = date_str.split("/")
-                date_str = f"01.{month}.{year[-2:]}"  # Convert to dd.mm.yy
-            elif len(date_str) == 5 and "/" in date_str:  # mm/yy format
-                month, year = date_str.split("/")
-                date_str = f"01.{month}.{year}"  # Convert to dd.mm.yy
-            elif len(date_str.split("/")) == 3:  # dd/mm/yyyy format
-                day, month, year = date_str.split("/")
-                date_str = f"{day}.{month}.{year[-2:]}"  # Convert to dd.mm.yy
-            updated_dates.append(date_str)
-
-        print("Processed Updated Dates:", updated_dates)
-
-        manufacturing_dates = []
-        expiration_dates = []
-
-        if len(unique_dates) == 2:
-            # Compare the two dates
-            date1, date2 = self.compare_dates(updated_dates[0], updated_dates[1])
-            manufacturing_dates.append(date1)
-            expiration_dates.append(date2)
-        elif len(unique_dates) == 1:
-            # If there's only one date, consider it as the manufacturing and expiration date
-            manufacturing_dates.append(updated_dates[0])
-            expiration_dates.append(None)
-        else:
-            # For any unexpected number of dates, fallback
-            manufacturing_dates.append(None)
-            expiration_dates.append(None)
-
-        return mrp, manufacturing_dates, expiration_dates
+        label = parse_label(text)
+        print("Label fields found:", label.candidates)
+        return label.mrp, [label.manufacturing_date], [label.expiry_date]
 
     def extract_brand(self, text):
         """
         Extract brand from the given text based on key terms.
         """
-        key_terms = ["MRP", "Mfd", "Exp.", "Manufactured", "Marketed By"]
         brand_count = {}
         closest_brand = None
         min_distance = float("inf")  # Initialize with a large number
 
-        for brand in self.brands:
-            matches = list(re.finditer(re.escape(brand), text, re.IGNORECASE))
-            if matches:
-                brand_count[brand] = len(matches)
-                for match in matches:
-                    brand_position = match.start()
-                    for term in key_terms:
-                        term_match = re.search(term, text, re.IGNORECASE)
-                        if term_match:
-                            term_position = term_match.start()
-                            distance = abs(brand_position - term_position)
-                            if distance < min_distance:
-                                min_distance = distance
-                                closest_brand = brand
+        # First position of each key term, found by the label scan
+        term_positions = key_term_positions(scan_label(text))
+
+        # One scan of the text for every brand, grouped in brand-list order
+        for hit in get_brand_matcher(tuple(self.brands)).find_all(text):
+            brand_count[hit.brand] = brand_count.get(hit.brand, 0) + 1
+            for term_position in term_positions:
+                distance = abs(hit.start - term_position)
+                if distance < min_distance:
+                    min_distance = distance
+                    closest_brand = hit.brand
 
         if brand_count:
             most_frequent_brand = max(brand_count, key=brand_count.get)
@@ -442,46 +339,33 @@ class ImageProcessor(BaseService):
                 else closest_brand
             )
 
-        return "BRAND NOT FOUND"
-
-    def compare_dates(self, date1, date2):
-        """
-        Compare two dates and return the earlier or later date.
-
-        Args:
-        - date1: First date string in the format 'dd.mm.yy'
-        - date2: Second date string in the format 'dd.mm.yy'
-
-        Returns:
-        - A tuple of (earlier_date, later_date)
-        """
-        d1 = datetime.strptime(date1, "%d.%m.%y")
-        d2 = datetime.strptime(date2, "%d.%m.%y")
+        # No exact hit, OCR noise such as "Co1gate" is caught by trigrams
+        fuzzy = brand_catalog.search(text, settings.brand_search_threshold)
+        if fuzzy is not None:
+            return fuzzy.brand
 
-        if d1 < d2:
-            return (date1, date2)
-        else:
-            return (date2, date1)
+        return "BRAND NOT FOUND"
 
     def check_expiration(self,expiration_date_list):
         if expiration_date_list:
             # Filter out any None values and check expiration
-            expiration_dates = [datetime.strptime(date, "%d.%m.%y") for date in expiration_date_list if date]
+            expiration_dates = [parse_date(date) for date in expiration_date_list if date]
             return any(date < datetime.now() for date in expiration_dates)
         return False
 
     def calculate_expected_life_span(self,expiration_date_list):
         if expiration_date_list:
             # Filter out any None values and parse dates
-            expiration_dates = [datetime.strptime(date, "%d.%m.%y") for date in expiration_date_list if date]
+            expiration_dates = [parse_date(date) for date in expiration_date_list if date]
             # Calculate remaining days for future dates only
             remaining_days = [(date - datetime.now()).days for date in expiration_dates if date > datetime.now()]
             return min(remaining_days) if remaining_days else 0  # Return the smallest positive remaining days
         return 0
 
     def process_text(self):
+        # One OCR call per image, issued concurrently on the shared engine
         combined_text = " ".join(
-            [self.extract_text(image_path) for image_path in self.image_paths]
+            ocr_executor.map(self.extract_text, self.image_paths)
         )
 
         print("Combined Text Extracted from All Images:")
@@ -498,7 +382,7 @@ class ImageProcessor(BaseService):
         expiry_date = None
         if exp_date and len(exp_date) > 0:
             try:
-                expiry_date = datetime.strptime(str(exp_date[0]), "%d.%m.%y")
+                expiry_date = parse_date(str(exp_date[0]))
             except ValueError as e:
                 print("Error parsing expiry date:", e)
         print("Extracted Brand:", brand)
@@ -546,20 +430,70 @@ class ImageProcessor(BaseService):
 
         return predicted_label, confidence
 
-    # Function to predict the best image from multiple images
-    def predict_best_image(self, model, image_paths):
+    # Decode and resize every image of a request into one preallocated batch
+    @staticmethod
+    def load_batch(image_paths):
+        batch = np.empty((len(image_paths), *IMAGE_SIZE, 3), dtype=np.float32)
+        for idx, image_path in enumerate(image_paths):
+            batch[idx] = load_classifier_image(image_path)
+        batch /= 255.0
+        return batch
+
+    # Reduce model output rows to class indices and confidences
+    @staticmethod
+    def reduce_prediction(prediction):
+        class_indices = np.argmax(prediction, axis=1)
+        confidences = np.max(prediction, axis=1) * 100
+        return class_indices, confidences
+
+    # Hash every image and fetch the class probabilities cached for it by
+    # the given runtime, the processor's own by default
+    def cached_rows(self, image_paths, backend=None):
+        digests = [content_hash(read_image_bytes(image_path)) for image_path in image_paths]
+        version = freshness_model_version(backend or self.backend)
+        rows = [result_cache.get(CLASSIFIER, digest, version) for digest in digests]
+        return digests, rows
+
+    def cache_rows(self, digests, rows, missing, prediction, backend=None):
+        version = freshness_model_version(backend or self.backend)
+        for idx, row in zip(missing, np.asarray(prediction)):
+            rows[idx] = row
+            result_cache.set(CLASSIFIER, digests[idx], version, row)
+        return np.stack(rows)
+
+    # Class probabilities for every image, only uncached images hit the model
+    def predict_rows(self, model, image_paths):
+        digests, rows = self.cached_rows(image_paths)
+        missing = [idx for idx, row in enumerate(rows) if row is None]
+        paths = [image_paths[idx] for idx in missing]
+        if not paths:
+            prediction = []
+        elif settings.freshness_batch_inference:
+            prediction = model.predict_on_batch(self.load_batch(paths))
+        else:
+            prediction = np.concatenate(
+                [model.predict_on_batch(self.load_batch([path])) for path in paths]
+            )
+        return self.cache_rows(digests, rows, missing, prediction)
+
+    # Function to build the response for the most confident prediction
+    def best_prediction(self, image_paths, class_indices, confidences):
         best_label = None
         highest_confidence = 0
+        shelf_life = None
+        freshness_score = None
 
-        for image_path in image_paths:
-            predicted_label, confidence = self.predict_image(model, image_path)
+        for image_path, class_index, confidence in zip(
+            image_paths, class_indices, confidences
+        ):
             print(
-                f"Image: {image_path}, Predicted Class: {predicted_label}, Confidence: {confidence:.2f}%"
+                f"Image: {image_path}, Predicted Class: {self.class_mapping.get(int(class_index))}, Confidence: {confidence:.2f}%"
             )
 
-            if confidence > highest_confidence:
-                highest_confidence = confidence
-                best_label = predicted_label
+        if len(confidences):
+            best = int(np.argmax(confidences))
+            best_label = self.class_mapping.get(int(class_indices[best]), None)
+            highest_confidence = float(confidences[best])
 
         if best_label:
             shelf_life = self.calculate_shelf_life(best_label)
@@ -578,5 +512,55 @@ class ImageProcessor(BaseService):
         }
         return response
 
+    # Function to predict the best image from multiple images
+    def predict_best_image(self, model, image_paths):
+        if not image_paths:
+            return self.best_prediction([], [], [])
+        prediction = self.predict_rows(model, image_paths)
+        class_indices, confidences = self.reduce_prediction(prediction)
+        return self.best_prediction(image_paths, class_indices, confidences)
+
     def process(self, image_paths):
         return self.predict_best_image(self.model, image_paths)
+
+    # Same as process, but inference goes through the shared micro-batcher
+    # while decoding runs on the worker pool
+    async def process_batched(self, image_paths, batcher, pool):
+        if not image_paths:
+            return self.best_prediction([], [], [])
+        # Cached under the version of the runtime the batcher serves
+        backend = settings.freshness_backend
+        digests, rows = await pool.run_io(self.cached_rows, image_paths, backend)
+        missing = [idx for idx, row in enumerate(rows) if row is None]
+        prediction = []
+        if missing:
+            paths = [image_paths[idx] for idx in missing]
+            batch = await pool.run_io(self.load_batch, paths)
+            prediction = await batcher.predict(batch)
+        prediction = self.cache_rows(digests, rows, missing, prediction, backend)
+        class_indices, confidences = self.reduce_prediction(prediction)
+        return self.best_prediction(image_paths, class_indices, confidences)
+
+
+# Entry points for the worker pool, kept at module level so they can be pickled
+def run_packaged_pipeline(tesseract_cmd, image_paths, count, ocr_engine=None):
+    return ImageProcessor(
+        tesseract_cmd, image_paths, count, ocr_engine=ocr_engine
+    ).process_text()
+
+
+def run_freshness_pipeline(tesseract_cmd, image_paths, count):
+    return ImageProcessor(tesseract_cmd, image_paths, count).process(image_paths)
+
+
+# Label fields of a single frame, pushed to live feed clients as they come
+def run_label_frame(tesseract_cmd, image_ref, ocr_engine=None):
+    processor = ImageProcessor(tesseract_cmd, [image_ref], 1, ocr_engine=ocr_engine)
+    text = processor.extract_text(image_ref)
+    mrp, mfg_date, exp_date = processor.extract_details(text)
+    return {
+        "brand": processor.extract_brand(text),
+        "mrp": mrp,
+        "manufacturing_date": mfg_date[0],
+        "expiry_date": exp_date[0],
+    }
@@ -0,0 +1,68 @@
+from collections import deque
+from typing import Deque, Optional
+
+import cv2
+import numpy as np
+from prometheus_client import Counter
+
+LIVE_DUPLICATE_FRAMES = Counter(
+    "live_feed_duplicate_frames_total",
+    "Live feed frames skipped as near-duplicates of a recent frame.",
+)
+
+# dHash compares neighbouring pixels of a 9x8 thumbnail: 64 bits
+HASH_SIZE = 8
+
+
+def dhash(gray: np.ndarray) -> int:
+    """
+    Difference hash of a grayscale image.
+
+    :param gray: 2D image.
+    :return: 64 bit hash, one bit per horizontal gradient sign.
+    """
+    thumb = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = (thumb[:, 1:] > thumb[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def dhash_jpeg(jpeg: bytes) -> Optional[int]:
+    """
+    Difference hash of an encoded image, decoded at reduced size.
+
+    :param jpeg: encoded image.
+    :return: the hash, None if the bytes cannot be decoded.
+    """
+    gray = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    return None if gray is None else dhash(gray)
+
+
+class NearDuplicateFilter:
+    """
+    Keeps the perceptual hashes of the last frames of a session.
+
+    A frame is new when its dHash is more than ``max_distance`` bits
+    away from each of the last ``window`` admitted frames, so a product
+    held still in front of the camera is processed once, while a new
+    product of the same class still gets through.
+    """
+
+    def __init__(self, window: int, max_distance: int) -> None:
+        self.max_distance = max_distance
+        self._recent: Deque[int] = deque(maxlen=max(1, window))
+
+    def admit(self, jpeg: bytes) -> bool:
+        """
+        Whether a frame differs from the recent ones, remembering it if so.
+
+        :param jpeg: encoded frame.
+        :return: True for a visually new frame.
+        """
+        frame_hash = dhash_jpeg(bytes(jpeg))
+        if frame_hash is None:
+            return True  # left to the pipeline to reject
+        if any(bin(frame_hash ^ seen).count("1") <= self.max_distance for seen in self._recent):
+            LIVE_DUPLICATE_FRAMES.inc()
+            return False
+        self._recent.append(frame_hash)
+        return True
@@ -0,0 +1,284 @@
+"""
+Export and benchmark the freshness classifier for the lighter runtimes.
+
+Convert the Keras model to ONNX and TFLite, fp32 and int8; ONNX needs the
+``export`` extra (``poetry install -E export``)::
+
+    python -m backend.services.ml.export export --calibration-dir data/calib
+
+Compare every exported variant against the Keras model, which must exist::
+
+    python -m backend.services.ml.export compare --images data/holdout
+
+Select the runtime used by the service with ``BACKEND_FRESHNESS_BACKEND``
+and the matching ``BACKEND_FRESHNESS_ONNX_PATH`` /
+``BACKEND_FRESHNESS_TFLITE_PATH``.
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+
+from backend.services.ml.crud import IMAGE_SIZE, ImageProcessor
+from backend.services.ml.runtime import KERAS, ONNX, TFLITE, load_backend
+from backend.settings import settings
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def list_images(folder: str, limit: int = 0) -> List[str]:
+    """
+    Image files of a folder, sorted by name.
+
+    :param folder: directory to scan recursively.
+    :param limit: keep at most this many images, 0 keeps all.
+    :return: image paths.
+    """
+    paths = sorted(
+        str(path)
+        for path in Path(folder).rglob("*")
+        if path.suffix.lower() in IMAGE_SUFFIXES
+    )
+    return paths[:limit] if limit else paths
+
+
+def artifact_paths(model_path: str, out_dir: str = "") -> Dict[str, Path]:
+    """
+    Files written by the export for a given Keras model.
+
+    :param model_path: source ``.h5`` model.
+    :param out_dir: output directory, next to the model by default.
+    :return: variant name to file path.
+    """
+    source = Path(model_path)
+    target = Path(out_dir) if out_dir else source.parent
+    return {
+        "onnx": target / f"{source.stem}.onnx",
+        "onnx_int8": target / f"{source.stem}_int8.onnx",
+        "tflite": target / f"{source.stem}.tflite",
+        "tflite_int8": target / f"{source.stem}_int8.tflite",
+    }
+
+
+def _calibration_batches(images: List[str]) -> Iterator[np.ndarray]:
+    for image_path in images:
+        yield ImageProcessor.load_batch([image_path])
+
+
+def export_onnx(model: Any, fp32_path: Path, int8_path: Path, images: List[str]) -> None:
+    """
+    Write the ONNX model and its statically quantized int8 variant.
+
+    :param model: loaded Keras model.
+    :param fp32_path: output of the float model.
+    :param int8_path: output of the quantized model.
+    :param images: calibration images, int8 is skipped without them.
+    """
+    import tensorflow as tf  # noqa: WPS433
+
+    try:
+        import tf2onnx  # noqa: WPS433
+        from onnxruntime import quantization  # noqa: WPS433
+    except ImportError as e:
+        raise SystemExit(
+            f"ONNX export needs tf2onnx and onnxruntime, install the `export` extra "
+            f"(poetry install -E export): {e}",
+        ) from e
+
+    signature = [tf.TensorSpec((None, *IMAGE_SIZE, 3), tf.float32, name="input")]
+    tf2onnx.convert.from_keras(
+        model,
+        input_signature=signature,
+        opset=13,
+        output_path=str(fp32_path),
+    )
+    print(f"Wrote {fp32_path}")
+    if not images:
+        print("No calibration images, skipping ONNX int8")
+        return
+
+    class _Reader(quantization.CalibrationDataReader):
+        def __init__(self) -> None:
+            self.batches = _calibration_batches(images)
+
+        def get_next(self) -> Any:
+            batch = next(self.batches, None)
+            return None if batch is None else {"input": batch}
+
+    quantization.quantize_static(
+        str(fp32_path),
+        str(int8_path),
+        _Reader(),
+        quant_format=quantization.QuantFormat.QDQ,
+        activation_type=quantization.QuantType.QInt8,
+        weight_type=quantization.QuantType.QInt8,
+    )
+    print(f"Wrote {int8_path}")
+
+
+def export_tflite(
+    model: Any,
+    fp32_path: Path,
+    int8_path: Path,
+    images: List[str],
+) -> None:
+    """
+    Write the TFLite model and its post-training int8 variant.
+
+    The int8 model keeps float input and output tensors, so it is a
+    drop-in replacement for the float one.
+
+    :param model: loaded Keras model.
+    :param fp32_path: output of the float model.
+    :param int8_path: output of the quantized model.
+    :param images: calibration images, int8 is skipped without them.
+    """
+    import tensorflow as tf  # noqa: WPS433
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    fp32_path.write_bytes(converter.convert())
+    print(f"Wrote {fp32_path}")
+    if not images:
+        print("No calibration images, skipping TFLite int8")
+        return
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = lambda: (
+        [batch] for batch in _calibration_batches(images)
+    )
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    int8_path.write_bytes(converter.convert())
+    print(f"Wrote {int8_path}")
+
+
+def export(args: argparse.Namespace) -> None:
+    """
+    Run the ``export`` command.
+
+    :param args: parsed command line.
+    """
+    from keras.api.models import load_model  # noqa: WPS433
+
+    model = load_model(args.model)
+    targets = artifact_paths(args.model, args.out_dir)
+    targets["onnx"].parent.mkdir(parents=True, exist_ok=True)
+    images = (
+        list_images(args.calibration_dir, args.calibration_size)
+        if args.calibration_dir
+        else []
+    )
+    if "onnx" in args.formats:
+        export_onnx(model, targets["onnx"], targets["onnx_int8"], images)
+    if "tflite" in args.formats:
+        export_tflite(model, targets["tflite"], targets["tflite_int8"], images)
+
+
+def _measure(backend: Any, batch: np.ndarray, batch_size: int, repeats: int) -> Dict[str, Any]:
+    latencies = []
+    for _ in range(repeats):
+        for idx in range(len(batch)):
+            started = time.perf_counter()
+            backend.predict_on_batch(batch[idx : idx + 1])
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    outputs = [
+        backend.predict_on_batch(batch[idx : idx + batch_size])
+        for idx in range(0, len(batch), batch_size)
+    ]
+    elapsed = time.perf_counter() - started
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 2),
+        "throughput_ips": round(len(batch) / elapsed, 1),
+        "top1": np.argmax(np.concatenate(outputs), axis=1),
+    }
+
+
+def compare(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """
+    Run the ``compare`` command and print the report.
+
+    Top-1 agreement is always measured against the Keras model.
+
+    :param args: parsed command line.
+    :return: one report row per model variant.
+    """
+    if not Path(args.model).exists():
+        raise SystemExit(f"Keras reference model {args.model} not found")
+    images = list_images(args.images, args.limit)
+    if not images:
+        raise SystemExit(f"No images found in {args.images}")
+    batch = ImageProcessor.load_batch(images)
+
+    variants = {KERAS: (KERAS, Path(args.model))}
+    for variant, path in artifact_paths(args.model, args.out_dir).items():
+        variants[variant] = (ONNX if variant.startswith(ONNX) else TFLITE, path)
+
+    report = []
+    reference = None
+    for variant, (runtime, path) in variants.items():
+        if not path.exists():
+            print(f"Skipping {variant}: {path} not found")
+            continue
+        backend = load_backend(runtime, str(path), args.threads)
+        backend.predict_on_batch(batch[:1])  # warm-up
+        row = _measure(backend, batch, args.batch_size, args.repeats)
+        top1 = row.pop("top1")
+        if runtime == KERAS:
+            reference = top1
+        row["top1_agreement"] = round(float(np.mean(top1 == reference)), 4)
+        row["variant"] = variant
+        row["size_mb"] = round(path.stat().st_size / (1024 * 1024), 2)
+        report.append(row)
+
+    print(f"{len(images)} images, batch size {args.batch_size}")
+    print(
+        f"{'variant':<12} {'size MB':>8} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'img/s':>8} {'top-1 agree':>12}",
+    )
+    for row in report:
+        print(
+            f"{row['variant']:<12} {row['size_mb']:>8} {row['p50_ms']:>8} "
+            f"{row['p95_ms']:>8} {row['throughput_ips']:>8} "
+            f"{row['top1_agreement']:>12.2%}",
+        )
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+    return report
+
+
+def main() -> None:
+    """Entrypoint of the export tool."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default=settings.freshness_model_path)
+    parser.add_argument("--out-dir", default="")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = commands.add_parser("export", help="convert the Keras model")
+    export_cmd.add_argument("--formats", nargs="+", default=["onnx", "tflite"])
+    export_cmd.add_argument("--calibration-dir", default="")
+    export_cmd.add_argument("--calibration-size", type=int, default=200)
+    export_cmd.set_defaults(handler=export)
+
+    compare_cmd = commands.add_parser("compare", help="benchmark all variants")
+    compare_cmd.add_argument("--images", required=True)
+    compare_cmd.add_argument("--limit", type=int, default=0)
+    compare_cmd.add_argument("--batch-size", type=int, default=8)
+    compare_cmd.add_argument("--repeats", type=int, default=3)
+    compare_cmd.add_argument("--threads", type=int, default=settings.freshness_num_threads)
+    compare_cmd.add_argument("--json", default="")
+    compare_cmd.set_defaults(handler=compare)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
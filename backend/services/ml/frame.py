@@ -1,69 +1,449 @@
+import argparse
+import multiprocessing
 import cv2
+import numpy as np
 import torch
 import os
+import time
+import urllib.request
 import uuid  # Import uuid for generating unique identifiers
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property, partial
+from typing import NamedTuple
+from backend.logging import get_logger
+from backend.services.ml.registry import model_registry
+from backend.settings import settings
 
+logger = get_logger(__name__)
 
-class ObjectDetectionVideoProcessor:
-    def __init__(self, output_dir, model_name="yolov5s"):
-        self.model = torch.hub.load("ultralytics/yolov5", model_name)
-        self.output_dir = output_dir
-        os.makedirs(self.output_dir, exist_ok=True)
+YOLO_REPO = "ultralytics/yolov5"
+YOLO_RELEASE = "https://github.com/ultralytics/yolov5/releases/download/v7.0"
+# Nano, small and medium YOLOv5 models, from fastest to most accurate
+YOLO_TIERS = ("n", "s", "m")
 
-    def process_videos(self, video_paths):
-        saved_frame_paths = []  # List to hold paths of saved frames
-        for video_path in video_paths:
-            saved_frames = self.process_video(video_path)
-            saved_frame_paths.extend(
-                saved_frames
-            )  # Extend the list with saved frames from this video
-        return saved_frame_paths
+ALL = "all"
+EVERY_NTH = "every_nth"
+TIME = "time"
+KEYFRAMES = "keyframes"
+SAMPLING_MODES = (ALL, EVERY_NTH, TIME, KEYFRAMES)
 
-    def process_video(self, video_path):
-        saved_frames = []  # List to hold saved frames for the current video
+
+class FrameSampler:
+    """
+    Decodes the frames of a video that are worth sending to the detector.
+
+    ``every_nth`` grabs the skipped frames without converting them,
+    ``time`` seeks with ``CAP_PROP_POS_MSEC`` and ``keyframes`` only
+    decodes I-frames, which needs PyAV; without it one frame per second
+    is sampled instead. Frames are yielded with their index in the video.
+    """
+
+    def __init__(self, mode=EVERY_NTH, stride=10, stride_ms=500.0):
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode '{mode}', expected one of {SAMPLING_MODES}")
+        self.mode = mode
+        self.stride = max(1, stride)
+        self.stride_ms = stride_ms
+
+    def frames(self, video_path):
+        if self.mode == KEYFRAMES:
+            try:
+                import av  # noqa: WPS433
+            except ImportError:
+                logger.warning(
+                    "PyAV is not installed (the `video` extra), sampling one frame per second"
+                )
+            else:
+                yield from self._keyframes(av, video_path)
+                return
         cap = cv2.VideoCapture(video_path)
-        frame_count = 0  # Track frame number
+        try:
+            if self.mode == TIME:
+                yield from self._by_time(cap)
+            elif self.mode == KEYFRAMES:
+                yield from self._every_nth(cap, round(cap.get(cv2.CAP_PROP_FPS)) or 1)
+            else:
+                yield from self._every_nth(cap, 1 if self.mode == ALL else self.stride)
+        finally:
+            cap.release()
 
+    @staticmethod
+    def _every_nth(cap, stride):
+        index = 0
         while cap.isOpened():
+            if not cap.grab():
+                return
+            if index % stride == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    return
+                yield index, frame
+            index += 1
+
+    def _by_time(self, cap):
+        position_ms = 0.0
+        while cap.isOpened():
+            cap.set(cv2.CAP_PROP_POS_MSEC, position_ms)
+            index = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
             ret, frame = cap.read()
             if not ret:
-                print(f"Finished processing video: {video_path}")
-                break
+                return
+            yield index, frame
+            position_ms += self.stride_ms
+
+    @staticmethod
+    def _keyframes(av, video_path):
+        with av.open(video_path) as container:
+            stream = container.streams.video[0]
+            stream.codec_context.skip_frame = "NONKEY"
+            rate = float(stream.average_rate or 0)
+            for frame in container.decode(stream):
+                seconds = float(frame.pts * stream.time_base) if frame.pts is not None else 0.0
+                yield int(round(seconds * rate)), frame.to_ndarray(format="bgr24")
+
+
+class FrameDifferenceGate:
+    """
+    Lets a frame through only when it differs enough from the last frame
+    it let through.
+
+    Frames are compared as small grayscale thumbnails by mean absolute
+    difference on the 0-255 scale; a threshold of 0 lets every frame
+    through. Rejected frames do not move the reference, so a slow pan
+    still reaches the detector once it has drifted far enough.
+    """
+
+    def __init__(self, threshold=2.0, size=(64, 36)):
+        self.threshold = threshold
+        self.size = size
+        self._previous = None
+
+    def reset(self):
+        self._previous = None
+
+    def changed(self, frame):
+        if self.threshold <= 0:
+            return True
+        thumbnail = cv2.cvtColor(
+            cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA),
+            cv2.COLOR_BGR2GRAY,
+        )
+        if self._previous is not None and (
+            float(np.mean(cv2.absdiff(thumbnail, self._previous))) <= self.threshold
+        ):
+            return False
+        self._previous = thumbnail
+        return True
+
+
+class Detections(NamedTuple):
+    """Detector output for one frame, as plain arrays."""
+
+    boxes: np.ndarray  # (N, 4) float32 x1, y1, x2, y2
+    scores: np.ndarray  # (N,) float32
+    class_ids: np.ndarray  # (N,) int64
+
+    @classmethod
+    def from_xyxy(cls, xyxy):
+        # YOLOv5 rows are x1, y1, x2, y2, confidence, class
+        rows = xyxy.cpu().numpy() if hasattr(xyxy, "cpu") else np.asarray(xyxy)
+        rows = rows.reshape(-1, 6)
+        return cls(
+            rows[:, :4].astype(np.float32),
+            rows[:, 4].astype(np.float32),
+            rows[:, 5].astype(np.int64),
+        )
+
+    def __len__(self):
+        return len(self.scores)
+
+    def filter(self, min_score=0.0, class_ids=None):
+        keep = self.scores >= min_score
+        if class_ids is not None:
+            keep &= np.isin(self.class_ids, list(class_ids))
+        return Detections(self.boxes[keep], self.scores[keep], self.class_ids[keep])
+
+    def names(self, class_names):
+        # Distinct class names in order of first appearance
+        _, first = np.unique(self.class_ids, return_index=True)
+        return [str(class_names[class_id]) for class_id in self.class_ids[np.sort(first)]]
+
+
+def detector_name(tier=None):
+    return f"yolo:{tier or settings.yolo_tier}"
+
+
+def yolo_weights_path(tier):
+    return os.path.join(settings.yolo_weights_dir, f"yolov5{tier}.pt")
+
+
+def _load_detector(tier):
+    weights = yolo_weights_path(tier)
+    if not os.path.exists(weights):
+        raise RuntimeError(
+            f"YOLO weights not found at {weights}, "
+            "run `python -m backend.services.ml.frame fetch` on a connected machine"
+        )
+    if settings.yolo_repo_dir:
+        # Bundled checkout of the YOLOv5 code, no network at all
+        return torch.hub.load(
+            str(settings.yolo_repo_dir), "custom", path=weights, source="local"
+        )
+    # Code from the torch hub cache populated by `fetch`
+    torch.hub.set_dir(str(settings.torch_hub_dir))
+    return torch.hub.load(
+        YOLO_REPO, "custom", path=weights, skip_validation=True, trust_repo=True
+    )
+
+
+for yolo_tier in YOLO_TIERS:
+    model_registry.register(detector_name(yolo_tier), partial(_load_detector, yolo_tier))
+
+
+def fetch_detectors(tiers):
+    """Download the weights and cache the YOLOv5 code for offline use."""
+    os.makedirs(settings.yolo_weights_dir, exist_ok=True)
+    for tier in tiers:
+        weights = yolo_weights_path(tier)
+        if not os.path.exists(weights):
+            urllib.request.urlretrieve(f"{YOLO_RELEASE}/yolov5{tier}.pt", weights)
+            print(f"Wrote {weights}")
+    torch.hub.set_dir(str(settings.torch_hub_dir))
+    torch.hub.load(YOLO_REPO, "custom", path=yolo_weights_path(tiers[0]), trust_repo=True)
+    print(f"Cached {YOLO_REPO} in {settings.torch_hub_dir}")
 
-            frame_count += 1
 
-            # Perform object detection on the frame
-            results = self.model(frame)
-            detected_objects = results.pandas().xyxy[
-                0
-            ]  # Bounding boxes and labels in a Pandas DataFrame
+def benchmark_detectors(tiers, frames=10, size=(640, 480)):
+    """
+    Load each tier and time the detector on synthetic frames.
 
-            # Check if any object was detected
+    Returns one row per tier with the load time, resident memory and
+    the median per-frame latency.
+    """
+    rng = np.random.default_rng(0)
+    images = [
+        rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8) for _ in range(frames)
+    ]
+    names = [detector_name(tier) for tier in tiers]
+    loaded = {handle.name: handle for handle in model_registry.preload(names)}
+    rows = []
+    for tier in tiers:
+        handle = loaded[detector_name(tier)]
+        handle.model(images[0])  # warm-up
+        latencies = []
+        for image in images:
+            started = time.perf_counter()
+            handle.model(image)
+            latencies.append(time.perf_counter() - started)
+        rows.append(
+            {
+                "tier": tier,
+                "load_seconds": round(handle.load_seconds, 2),
+                "rss_mb": round(handle.rss_bytes / (1024 * 1024), 1),
+                "frame_ms": round(float(np.median(latencies)) * 1000, 1),
+            }
+        )
+    return rows
+
+
+# Process pool of process_videos, kept across calls so that each worker
+# loads its detector once; replaced when the worker count or tier changes
+_video_pool = None
+_video_pool_key = None
+
+
+def _init_video_worker(tier):
+    model_registry.get(detector_name(tier))  # load the detector before the first video
+
+
+def _process_in_worker(output_dir, tier, sampler, gate, video_path):
+    processor = ObjectDetectionVideoProcessor(output_dir, tier, sampler, gate)
+    return processor.process_video(video_path)
+
+
+def video_pool(workers, tier=None):
+    """
+    Process pool for detecting videos in parallel.
+
+    :param workers: number of worker processes.
+    :param tier: YOLO tier the workers load.
+    :return: the shared executor.
+    """
+    global _video_pool, _video_pool_key
+    key = (workers, tier)
+    if _video_pool_key != key:
+        shutdown_video_pool()
+        _video_pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context(settings.ml_process_start_method),
+            initializer=_init_video_worker,
+            initargs=(tier,),
+        )
+        _video_pool_key = key
+    return _video_pool
+
+
+def shutdown_video_pool():
+    """Stop the video worker processes, if they were started."""
+    global _video_pool, _video_pool_key
+    if _video_pool is not None:
+        _video_pool.shutdown(wait=False, cancel_futures=True)
+    _video_pool = None
+    _video_pool_key = None
+
+
+class ObjectDetectionVideoProcessor:
+    def __init__(self, output_dir, tier=None, sampler=None, gate=None):
+        self.tier = tier
+        self.output_dir = output_dir
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.sampler = sampler or FrameSampler(
+            settings.video_sampling_mode,
+            stride=settings.video_frame_stride,
+            stride_ms=settings.video_time_stride_ms,
+        )
+        self.gate = gate or FrameDifferenceGate(settings.video_diff_threshold)
+        self.batch_size = max(1, settings.video_detect_batch_size)
+
+    @property
+    def model(self):
+        # Loaded once per process and shared by every processor
+        return model_registry.get(detector_name(self.tier))
+
+    @cached_property
+    def class_names(self):
+        # id -> name table, YOLOv5 exposes it as a dict or a list
+        names = self.model.names
+        return np.asarray(
+            [names[idx] for idx in range(len(names))] if isinstance(names, dict) else names,
+            dtype=object,
+        )
+
+    def process_videos(self, video_paths, workers=None):
+        """
+        Detect objects in several videos.
+
+        With more than one worker the videos are spread over the shared
+        ``video_pool``, whose workers load the detector once and are kept
+        for the next calls. Saved frames are returned in the order of
+        ``video_paths`` either way.
+
+        :param video_paths: videos to process.
+        :param workers: worker processes, ``settings.video_workers`` by default.
+        :return: paths of the saved frames.
+        """
+        if workers is None:
+            workers = settings.video_workers
+        started = time.perf_counter()
+        if workers > 1:
+            # The pool keeps its configured size, a call only submits one job per video
+            job = partial(_process_in_worker, self.output_dir, self.tier, self.sampler, self.gate)
+            per_video = list(video_pool(workers, self.tier).map(job, video_paths))
+        else:
+            per_video = [self.process_video(video_path) for video_path in video_paths]
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Processed {len(video_paths)} videos in {elapsed:.2f}s "
+            f"with {max(min(workers, len(video_paths)), 1)} workers"
+        )
+        # Flatten the saved frames of every video, in input order
+        return [saved for saved_frames in per_video for saved in saved_frames]
+
+    def detect_batch(self, frames):
+        # One forward pass for the whole batch, one result per frame
+        results = self.model(frames)
+        return [Detections.from_xyxy(xyxy) for xyxy in results.xyxy]
+
+    def save_frame(self, video_path, frame_count, frame, detected_objects):
+        # Get the names of detected objects
+        object_names = detected_objects.names(self.class_names)
+        object_names_str = "_".join(
+            object_names
+        )  # Join them into a string for filename
+
+        # Generate a unique filename using uuid
+        unique_id = uuid.uuid4()  # Create a unique identifier
+        output_frame_path = os.path.join(
+            self.output_dir,
+            f"frame_with_objects_{frame_count}_{object_names_str}_{unique_id}.jpg",
+        )
+        cv2.imwrite(output_frame_path, frame)
+
+        print(
+            f"Frame {frame_count} saved from {video_path} with {len(detected_objects)} detected objects: {object_names_str}"
+        )
+        return output_frame_path
+
+    def first_detection(self, video_path, batch):
+        # Earliest frame of the batch with at least one detection
+        for (frame_count, frame), detected_objects in zip(
+            batch, self.detect_batch([frame for _, frame in batch])
+        ):
+            detected_objects = detected_objects.filter(settings.video_min_score)
             if len(detected_objects) > 0:
-                # Get the names of detected objects
-                object_names = detected_objects[
-                    "name"
-                ].unique()  # Unique object names detected
-                object_names_str = "_".join(
-                    object_names
-                )  # Join them into a string for filename
-
-                # Generate a unique filename using uuid
-                unique_id = uuid.uuid4()  # Create a unique identifier
-                output_frame_path = os.path.join(
-                    self.output_dir,
-                    f"frame_with_objects_{frame_count}_{object_names_str}_{unique_id}.jpg",
-                )
-                cv2.imwrite(output_frame_path, frame)
-                saved_frames.append(
-                    output_frame_path
-                )  # Append the saved frame path to the list
+                return self.save_frame(video_path, frame_count, frame, detected_objects)
+        return None
 
-                print(
-                    f"Frame {frame_count} saved from {video_path} with {len(detected_objects)} detected objects: {object_names_str}"
-                )
+    def process_video(self, video_path):
+        saved_frames = []  # List to hold saved frames for the current video
+        started = time.perf_counter()
+        self.gate.reset()
+        sampled = 0
+        detector_calls = 0
+        batch = []
+
+        for frame_count, frame in self.sampler.frames(video_path):
+            sampled += 1
+            # Skip frames that barely changed since the last one checked
+            if not self.gate.changed(frame):
+                continue
+            batch.append((frame_count, frame))
+            if len(batch) < self.batch_size:
+                continue
+
+            detector_calls += 1
+            saved = self.first_detection(video_path, batch)
+            batch = []
+            # Stop at the first batch that contains a detection
+            if saved is not None:
+                saved_frames.append(saved)
                 break
+        else:
+            if batch:
+                detector_calls += 1
+                saved = self.first_detection(video_path, batch)
+                if saved is not None:
+                    saved_frames.append(saved)
+            print(f"Finished processing video: {video_path}")
 
-        cap.release()
-        cv2.destroyAllWindows()
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"{video_path}: {sampled} frames sampled, "
+            f"{detector_calls} detector batches of up to {self.batch_size}, "
+            f"{elapsed:.2f}s ({sampled / max(elapsed, 1e-9):.1f} frames/s)"
+        )
         return saved_frames  # Return the list of saved frame paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YOLO detectors of the video pipeline")
+    commands = parser.add_subparsers(dest="command", required=True)
+    fetch_cmd = commands.add_parser("fetch", help="download weights for offline use")
+    fetch_cmd.add_argument("--tiers", nargs="+", choices=YOLO_TIERS, default=list(YOLO_TIERS))
+    bench_cmd = commands.add_parser("benchmark", help="load time and latency per tier")
+    bench_cmd.add_argument("--tiers", nargs="+", choices=YOLO_TIERS, default=list(YOLO_TIERS))
+    bench_cmd.add_argument("--frames", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "fetch":
+        fetch_detectors(args.tiers)
+        return
+    print(f"{'tier':<6} {'load s':>8} {'RSS MB':>8} {'frame ms':>9}")
+    for row in benchmark_detectors(args.tiers, args.frames):
+        print(
+            f"{row['tier']:<6} {row['load_seconds']:>8} {row['rss_mb']:>8} {row['frame_ms']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+
+import cv2
+import numpy as np
+from cachetools import TTLCache
+
+from backend.settings import settings
+
+# Frame references handed to clients look like "frame:<session>/<seq>"
+FRAME_REF_PREFIX = "frame:"
+
+
+class StoredFrame(NamedTuple):
+    """A live camera frame kept in memory for the ML pipelines."""
+
+    ref: str
+    image: np.ndarray
+    jpeg: bytes
+    detected_class: Optional[str]
+    created: float
+
+
+def is_frame_ref(ref: str) -> bool:
+    """
+    Whether an image reference points into the frame store.
+
+    :param ref: frame reference or file path.
+    :return: True for frame references.
+    """
+    return ref.startswith(FRAME_REF_PREFIX)
+
+
+class FrameStore:
+    """
+    Live camera frames of each websocket session, held in memory.
+
+    Frames are decoded once when captured and kept both as BGR arrays
+    and as the JPEG bytes the client sent, which the OCR engines and the
+    content-hash caches work on. Each session keeps its latest
+    ``max_frames`` frames; sessions are dropped when their websocket
+    closes, or ``ttl`` seconds after their last frame, and at most
+    ``max_sessions`` are held. References are only valid in the process
+    that stored the frame.
+    """
+
+    def __init__(self, max_sessions: int, max_frames: int, ttl: float) -> None:
+        self.max_frames = max_frames
+        self._sessions: TTLCache = TTLCache(max_sessions, ttl=ttl)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def put(self, session_id: str, jpeg: bytes, detected_class: Optional[str] = None) -> str:
+        """
+        Decode and keep a frame.
+
+        :param session_id: websocket session the frame belongs to.
+        :param jpeg: encoded frame.
+        :param detected_class: class reported by the client.
+        :return: reference of the frame.
+        :raises ValueError: if the bytes are not a decodable image.
+        """
+        jpeg = bytes(jpeg)
+        image = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Frame is not a decodable image")
+        ref = f"{FRAME_REF_PREFIX}{session_id}/{next(self._seq)}"
+        with self._lock:
+            frames: Dict[str, StoredFrame] = self._sessions.pop(session_id, None) or OrderedDict()
+            frames[ref] = StoredFrame(ref, image, jpeg, detected_class, time.time())
+            while len(frames) > self.max_frames:
+                frames.popitem(last=False)
+            # Re-inserted so the TTL counts from the latest frame
+            self._sessions[session_id] = frames
+        return ref
+
+    def get(self, ref: str) -> StoredFrame:
+        """
+        Look up a frame.
+
+        :param ref: reference returned by ``put``.
+        :return: the frame.
+        :raises KeyError: if the frame was evicted or never stored.
+        """
+        session_id = ref[len(FRAME_REF_PREFIX) :].rpartition("/")[0]
+        with self._lock:
+            frames = self._sessions.get(session_id)
+            frame = frames.get(ref) if frames is not None else None
+        if frame is None:
+            raise KeyError(f"Frame {ref} is no longer available")
+        return frame
+
+    def drop_session(self, session_id: str) -> None:
+        """
+        Forget every frame of a session.
+
+        :param session_id: websocket session.
+        """
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+frame_store = FrameStore(
+    max_sessions=settings.frame_store_max_sessions,
+    max_frames=settings.frame_store_max_frames,
+    ttl=settings.frame_store_ttl_seconds,
+)
@@ -0,0 +1,177 @@
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+MRP = "mrp"
+DATE = "date"
+TERM = "term"
+
+# Formats of the printed dates, all resolved to dd.mm.yy
+DOTTED = "dd.mm.yy"
+MONTH_YEAR = "mm/yy"
+MONTH_FULL_YEAR = "mm/yyyy"
+
+# Terms printed next to the brand on a label ("Exp." is a regex)
+KEY_TERMS = ("MRP", "Mfd", "Exp.", "Manufactured", "Marketed By")
+# Named group of each key term but "MRP", which the MRP prefix reports
+_TERM_GROUPS = (
+    ("mfd", "Mfd"),
+    ("exp", "Exp."),
+    ("manufactured", "Manufactured"),
+    ("marketed_by", "Marketed By"),
+)
+
+# One scan for every field. The leading character class lets the
+# engine skip most positions cheaply. Only letters are consumed: prices
+# and dates sit in lookaheads, so overlapping candidates such as the
+# digits of "MRP 12.05.24" are all reported. The MRP price is optional
+# so that a bare "MRP" still counts as a key term.
+_LABEL_PATTERN = re.compile(
+    r"(?=[\dRME₹])(?:"
+    r"(?P<mrp>Rs|MRP|₹)(?:(?=[\s.:₹]*(?P<price>\d+(?:\.\d+)?)))?"
+    r"|M(?:(?P<mfd>fd)|(?P<manufactured>anufactured)|(?P<marketed_by>arketed By))"
+    r"|(?P<exp>Exp)(?=.)"
+    r"|(?=(?P<dotted>\d{2}\.\d{2}\.\d{2}))"
+    r"|\b(?=(?P<month_year>\d{2}/\d{2}\b)|(?P<month_full_year>\d{2}/\d{4}\b))"
+    r")",
+    re.IGNORECASE,
+)
+_DATE_GROUPS = (
+    ("dotted", DOTTED),
+    ("month_year", MONTH_YEAR),
+    ("month_full_year", MONTH_FULL_YEAR),
+)
+
+
+class Candidate(NamedTuple):
+    """A field found on a label, with its position in the OCR text."""
+
+    kind: str
+    text: str
+    value: str
+    start: int
+    end: int
+
+
+class LabelFields(NamedTuple):
+    """Fields of a packaged product label."""
+
+    mrp: Optional[str]
+    manufacturing_date: Optional[str]
+    expiry_date: Optional[str]
+    candidates: Tuple[Candidate, ...]
+
+
+@lru_cache(maxsize=4096)
+def parse_date(normalized: str) -> datetime:
+    """
+    Parse a ``dd.mm.yy`` date, memoized.
+
+    :param normalized: date as returned in ``LabelFields``.
+    :return: parsed date.
+    :raises ValueError: for impossible dates.
+    """
+    return datetime.strptime(normalized, "%d.%m.%y")
+
+
+@lru_cache(maxsize=4096)
+def resolve_date(raw: str, date_format: str) -> Optional[str]:
+    """
+    Normalize a printed date, month-only dates resolve to the 1st.
+
+    :param raw: date as printed.
+    :param date_format: one of ``DOTTED``, ``MONTH_YEAR``, ``MONTH_FULL_YEAR``.
+    :return: ``dd.mm.yy`` date, None for impossible dates.
+    """
+    if date_format == DOTTED:
+        normalized = raw
+    else:
+        month, year = raw.split("/")
+        normalized = f"01.{month}.{year[-2:]}"
+    try:
+        parse_date(normalized)
+    except ValueError:
+        return None
+    return normalized
+
+
+# The MRP/date parsing and the brand lookup scan the same combined text
+@lru_cache(maxsize=64)
+def scan_label(text: str) -> Tuple[Candidate, ...]:
+    """
+    Walk the OCR text once and collect every label field.
+
+    Candidates of one kind and format never overlap each other, as with
+    ``re.findall``; MRP and key term candidates overlap dates freely.
+
+    :param text: OCR text.
+    :return: candidates in order of position.
+    """
+    candidates = []
+    last_end = {}
+    for match in _LABEL_PATTERN.finditer(text):
+        start = match.start()
+        prefix = match.group("mrp")
+        if prefix:
+            if prefix.upper() == "MRP":
+                candidates.append(Candidate(TERM, prefix, "MRP", start, start + len(prefix)))
+            price = match.group("price")
+            if price:
+                candidates.append(Candidate(MRP, price, price, *match.span("price")))
+            continue
+        for group, term in _TERM_GROUPS:
+            if match.group(group):
+                end = start + len(term)
+                candidates.append(Candidate(TERM, text[start:end], term, start, end))
+                break
+        else:
+            for group, date_format in _DATE_GROUPS:
+                raw = match.group(group)
+                if raw and start >= last_end.get(group, 0):
+                    last_end[group] = start + len(raw)
+                    normalized = resolve_date(raw, date_format)
+                    if normalized is not None:
+                        candidates.append(Candidate(DATE, raw, normalized, start, start + len(raw)))
+    return tuple(candidates)
+
+
+def parse_label(text: str) -> LabelFields:
+    """
+    Extract MRP, manufacturing and expiry dates from an OCR text.
+
+    The MRP is the first price after "Rs", "MRP" or "₹". Distinct dates
+    are ordered as printed strings and the first two are kept, the
+    earlier one being the manufacturing date; a single date is taken as
+    the manufacturing date. Impossible dates such as "45/99" are skipped.
+
+    :param text: OCR text.
+    :return: label fields and all candidates.
+    """
+    candidates = scan_label(text)
+    mrp = next((found.value for found in candidates if found.kind == MRP), None)
+    dates = {}
+    for found in candidates:
+        if found.kind == DATE:
+            dates.setdefault(found.text, found.value)
+    chosen = [dates[raw] for raw in sorted(dates)[:2]]
+    chosen.sort(key=parse_date)
+    if len(chosen) == 2:
+        return LabelFields(mrp, chosen[0], chosen[1], candidates)
+    if chosen:
+        return LabelFields(mrp, chosen[0], None, candidates)
+    return LabelFields(mrp, None, None, candidates)
+
+
+def key_term_positions(candidates: Iterable[Candidate]) -> List[int]:
+    """
+    First position of each key term, in ``KEY_TERMS`` order.
+
+    :param candidates: result of ``scan_label``.
+    :return: positions of the key terms present in the text.
+    """
+    first = {}
+    for found in candidates:
+        if found.kind == TERM:
+            first.setdefault(found.value, found.start)
+    return [first[term] for term in KEY_TERMS if term in first]
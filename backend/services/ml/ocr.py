@@ -0,0 +1,336 @@
+import abc
+import hashlib
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import boto3
+import cv2
+import numpy as np
+import pytesseract
+from botocore.config import Config
+from prometheus_client import Counter, Histogram
+
+from backend.logging import get_logger
+from backend.services.ml.cache import OCR, content_hash, ocr_result_cache
+from backend.services.ml.label_parser import parse_label
+from backend.services.ml.ocr_store import textract_store
+from backend.services.ml.registry import model_registry
+from backend.settings import settings
+
+logger = get_logger(__name__)
+
+TEXTRACT = "textract"
+TESSERACT = "tesseract"
+REPLAY = "replay"
+OCR_ENGINES = (TEXTRACT, TESSERACT, REPLAY)
+
+TEXTRACT_CLIENT = "textract"
+TEXTRACT_FEATURES = ["LAYOUT"]
+# Bump when the Textract request or the text assembly changes
+TEXTRACT_VERSION = "textract:LAYOUT:1"
+
+TESSERACT_PASS_SECONDS = Histogram(
+    "ocr_tesseract_pass_seconds",
+    "Duration of a single Tesseract page segmentation pass.",
+    ["psm"],
+)
+TESSERACT_PASS_WINS = Counter(
+    "ocr_tesseract_pass_wins_total",
+    "Tesseract passes whose text was kept.",
+    ["psm", "early_exit"],
+)
+
+
+def textract_text(response: Dict[str, Any]) -> str:
+    """
+    Join the text of all Textract blocks.
+
+    :param response: ``analyze_document`` response.
+    :return: extracted text.
+    """
+    text_output = [block["Text"] for block in response["Blocks"] if "Text" in block]
+    return " ".join(text_output)
+
+
+def has_label_fields(text: str) -> bool:
+    """
+    Whether an OCR text already holds an MRP and a date.
+
+    :param text: OCR output.
+    :return: True when both can be parsed.
+    """
+    label = parse_label(text)
+    return label.mrp is not None and label.manufacturing_date is not None
+
+
+def _build_textract_client() -> Any:
+    return boto3.client(
+        "textract",
+        aws_access_key_id=settings.ACCESS_KEY,
+        aws_secret_access_key=settings.SECRET_KEY,
+        region_name=settings.REGION,
+        config=Config(
+            max_pool_connections=settings.textract_max_pool_connections,
+            connect_timeout=settings.textract_connect_timeout,
+            read_timeout=settings.textract_read_timeout,
+            # botocore's "max_attempts" counts retries only
+            retries={
+                "mode": "adaptive",
+                "total_max_attempts": settings.textract_max_attempts,
+            },
+        ),
+    )
+
+
+class OcrEngine(abc.ABC):
+    """
+    Turns an encoded image into text.
+
+    ``read_text`` wraps ``extract_text`` with the content-hash result
+    cache; engines that must always do the work (such as the replay
+    engine used for benchmarks) set ``cacheable`` to False.
+    """
+
+    name = ""
+    version = ""
+    cacheable = True
+
+    @abc.abstractmethod
+    def extract_text(self, document_bytes: bytes, digest: str) -> str:
+        """
+        Run OCR on one image.
+
+        :param document_bytes: encoded image.
+        :param digest: content hash of the image.
+        :return: extracted text.
+        """
+
+    def read_text(self, document_bytes: bytes) -> str:
+        """
+        Run OCR on one image, serving repeats from the result cache.
+
+        :param document_bytes: encoded image.
+        :return: extracted text.
+        """
+        digest = content_hash(document_bytes)
+        if not self.cacheable:
+            return self.extract_text(document_bytes, digest)
+        cached = ocr_result_cache.get(OCR, digest, self.version)
+        if cached is not None:
+            return cached
+        text = self.extract_text(document_bytes, digest)
+        ocr_result_cache.set(OCR, digest, self.version, text)
+        return text
+
+
+class TextractEngine(OcrEngine):
+    """
+    AWS Textract ``analyze_document`` with the LAYOUT feature.
+
+    Raw responses are kept in the durable Textract store and, when
+    ``settings.ocr_record_dir`` is set, also written as
+    ``<sha256>.json`` recordings for the replay engine.
+    """
+
+    name = TEXTRACT
+    version = TEXTRACT_VERSION
+
+    def __init__(self, record_dir: Optional[Path] = None) -> None:
+        self.record_dir = record_dir
+        if record_dir is not None:
+            Path(record_dir).mkdir(parents=True, exist_ok=True)
+
+    def analyze(self, document_bytes: bytes, digest: str) -> Dict[str, Any]:
+        """
+        Fetch the Textract response, from the store when possible.
+
+        :param document_bytes: encoded image.
+        :param digest: content hash of the image.
+        :return: ``analyze_document`` response.
+        """
+        response = None
+        if settings.textract_store_enabled:
+            response = textract_store.get(digest, TEXTRACT_FEATURES)
+        if response is None:
+            response = model_registry.get(TEXTRACT_CLIENT).analyze_document(
+                Document={"Bytes": document_bytes},
+                FeatureTypes=TEXTRACT_FEATURES,
+            )
+            if settings.textract_store_enabled:
+                textract_store.put(digest, TEXTRACT_FEATURES, response)
+        if self.record_dir is not None:
+            payload = {k: v for k, v in response.items() if k != "ResponseMetadata"}
+            (Path(self.record_dir) / f"{digest}.json").write_text(json.dumps(payload))
+        return response
+
+    def extract_text(self, document_bytes: bytes, digest: str) -> str:
+        return textract_text(self.analyze(document_bytes, digest))
+
+
+class TesseractEngine(OcrEngine):
+    """
+    Local Tesseract OCR over several page segmentation modes.
+
+    The passes run in parallel on a shared thread pool, Tesseract itself
+    being a subprocess. With ``early_exit`` the first pass whose text
+    has a parseable MRP and date wins and the passes still queued are
+    cancelled; otherwise, or when no pass qualifies, the longest text is
+    kept as before. Pass durations and winners are exported to
+    Prometheus per PSM.
+    """
+
+    name = TESSERACT
+    configs = (
+        "--psm 6",  # Assume a single uniform block of text
+        "--psm 3",  # Fully automatic page segmentation, but no OSD
+        "--psm 4",  # Assume a single column of text of variable sizes
+    )
+
+    def __init__(self, tesseract_cmd: str, max_workers: int, early_exit: bool) -> None:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+        self.early_exit = early_exit
+        self.version = f"tesseract:psm6,3,4:{'early' if early_exit else 'longest'}:1"
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="tesseract")
+
+    @staticmethod
+    def run_pass(image: np.ndarray, config: str) -> str:
+        """
+        Run one Tesseract pass and record its duration.
+
+        :param image: decoded image.
+        :param config: Tesseract command line options.
+        :return: extracted text.
+        """
+        started = time.perf_counter()
+        text = pytesseract.image_to_string(image, config=config)
+        TESSERACT_PASS_SECONDS.labels(config).observe(time.perf_counter() - started)
+        return text
+
+    def extract_text(self, document_bytes: bytes, digest: str) -> str:
+        image = cv2.imdecode(np.frombuffer(document_bytes, np.uint8), cv2.IMREAD_COLOR)
+        pending = {
+            self._executor.submit(self.run_pass, image, config): config
+            for config in self.configs
+        }
+        texts = {}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                config = pending.pop(future)
+                texts[config] = future.result()
+                if self.early_exit and has_label_fields(texts[config]):
+                    # Passes already running cannot be interrupted
+                    for other in pending:
+                        other.cancel()
+                    TESSERACT_PASS_WINS.labels(config, "true").inc()
+                    return texts[config]
+
+        # Choose the text with the most content
+        config = max(self.configs, key=lambda option: len(texts[option]))
+        TESSERACT_PASS_WINS.labels(config, "false").inc()
+        return texts[config]
+
+
+class ReplayEngine(OcrEngine):
+    """
+    Offline stand-in for Textract.
+
+    Replays recorded responses looked up by image hash, first from
+    ``<sha256>.json`` files in the recordings directory and then from the
+    durable Textract store. A latency of ``latency_ms`` plus up to
+    ``jitter_ms`` is injected per call; the jitter is derived from the
+    image hash, so repeated runs are deterministic.
+    """
+
+    name = REPLAY
+    version = "replay:1"
+    cacheable = False
+
+    def __init__(self, recordings_dir: Path, latency_ms: float, jitter_ms: float) -> None:
+        self.recordings_dir = Path(recordings_dir)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+
+    def delay(self, digest: str) -> float:
+        """
+        Injected latency for an image.
+
+        :param digest: content hash of the image.
+        :return: delay in seconds.
+        """
+        fraction = int(hashlib.sha256(digest.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF
+        return (self.latency_ms + self.jitter_ms * fraction) / 1000
+
+    def extract_text(self, document_bytes: bytes, digest: str) -> str:
+        time.sleep(self.delay(digest))
+        recording = self.recordings_dir / f"{digest}.json"
+        if recording.exists():
+            return textract_text(json.loads(recording.read_text()))
+        response = textract_store.get(digest, TEXTRACT_FEATURES)
+        if response is not None:
+            return textract_text(response)
+        logger.warning(f"No recorded Textract response for image {digest}")
+        return ""
+
+
+def _registry_name(engine: str) -> str:
+    return f"ocr:{engine}"
+
+
+def get_ocr_engine(name: Optional[str] = None) -> OcrEngine:
+    """
+    Shared OCR engine of this process.
+
+    :param name: engine name, ``settings.ocr_engine`` by default.
+    :return: the engine.
+    :raises ValueError: for an unknown engine name.
+    """
+    name = name or settings.ocr_engine
+    if name not in OCR_ENGINES:
+        raise ValueError(f"Unknown OCR engine '{name}', expected one of {OCR_ENGINES}")
+    return model_registry.get(_registry_name(name))
+
+
+# Fill the in-memory OCR cache from the durable Textract store
+def warm_ocr_cache(limit: int) -> int:
+    """
+    Load recently used Textract results into the OCR cache.
+
+    :param limit: maximum number of stored responses to read, capped at
+        the size of the OCR cache.
+    :return: number of cache entries written.
+    """
+    features = textract_store.feature_key(TEXTRACT_FEATURES)
+    warmed = 0
+    for stored in textract_store.recent(min(limit, ocr_result_cache.maxsize)):
+        if stored.feature_types == features:
+            text = textract_text(stored.response)
+            ocr_result_cache.set(OCR, stored.digest, TEXTRACT_VERSION, text)
+            warmed += 1
+    return warmed
+
+
+model_registry.register(TEXTRACT_CLIENT, _build_textract_client)
+model_registry.register(
+    _registry_name(TEXTRACT),
+    lambda: TextractEngine(settings.ocr_record_dir),
+)
+model_registry.register(
+    _registry_name(TESSERACT),
+    lambda: TesseractEngine(
+        settings.tesseract_cmd,
+        max_workers=settings.tesseract_pass_workers,
+        early_exit=settings.tesseract_early_exit,
+    ),
+)
+model_registry.register(
+    _registry_name(REPLAY),
+    lambda: ReplayEngine(
+        settings.ocr_replay_dir,
+        settings.ocr_replay_latency_ms,
+        settings.ocr_replay_jitter_ms,
+    ),
+)
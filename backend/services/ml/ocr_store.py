@@ -0,0 +1,179 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from backend.logging import get_logger
+from backend.settings import settings
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS textract_responses (
+    key TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    feature_types TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_textract_responses_last_access
+    ON textract_responses (last_access);
+"""
+
+
+class StoredResponse(NamedTuple):
+    """A Textract response read back from the store."""
+
+    digest: str
+    feature_types: str
+    response: Dict[str, Any]
+
+
+class TextractResponseStore:
+    """
+    Durable SQLite store of raw Textract responses.
+
+    Responses are keyed by the image content hash and the requested
+    FeatureTypes, compressed, and evicted least-recently-used first
+    once the stored bytes exceed ``max_bytes``. The database runs in WAL
+    mode so several worker processes can share one file; the stored size
+    is summed inside each write transaction, so every process sees the
+    writes of the others.
+    """
+
+    def __init__(self, path: Path, max_bytes: int) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def feature_key(feature_types: Iterable[str]) -> str:
+        """
+        Canonical form of a FeatureTypes list.
+
+        :param feature_types: Textract feature types.
+        :return: sorted, comma separated feature types.
+        """
+        return ",".join(sorted(feature_types))
+
+    def get(self, digest: str, feature_types: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """
+        Read a stored response and mark it as recently used.
+
+        :param digest: content hash of the image.
+        :param feature_types: Textract feature types of the request.
+        :return: the response or None.
+        """
+        features = self.feature_key(feature_types)
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT body FROM textract_responses WHERE key = ?",
+                (f"{digest}:{features}",),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE textract_responses SET last_access = ? WHERE key = ?",
+                (time.time(), f"{digest}:{features}"),
+            )
+            conn.commit()
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(
+        self,
+        digest: str,
+        feature_types: Iterable[str],
+        response: Dict[str, Any],
+    ) -> None:
+        """
+        Store a response, evicting old entries beyond the size bound.
+
+        :param digest: content hash of the image.
+        :param feature_types: Textract feature types of the request.
+        :param response: raw ``analyze_document`` response.
+        """
+        features = self.feature_key(feature_types)
+        payload = {k: v for k, v in response.items() if k != "ResponseMetadata"}
+        body = zlib.compress(json.dumps(payload).encode("utf-8"))
+        key = f"{digest}:{features}"
+        with self._lock:
+            conn = self._connect()
+            # Write lock up front, other processes wait until the eviction is done
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO textract_responses "
+                    "(key, digest, feature_types, body, size, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, digest, features, body, len(body), time.time()),
+                )
+                self._evict(conn)
+            except BaseException:
+                # Releases the write lock, the connection is shared
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def recent(self, limit: int) -> List[StoredResponse]:
+        """
+        Most recently used responses, for warming in-memory caches.
+
+        :param limit: maximum number of responses.
+        :return: stored responses, most recent first.
+        """
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute(
+                    "SELECT digest, feature_types, body FROM textract_responses "
+                    "ORDER BY last_access DESC LIMIT ?",
+                    (limit,),
+                )
+                .fetchall()
+            )
+        return [
+            StoredResponse(digest, features, json.loads(zlib.decompress(body)))
+            for digest, features, body in rows
+        ]
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        size = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM textract_responses",
+        ).fetchone()[0]
+        while size > self.max_bytes:
+            oldest = conn.execute(
+                "SELECT key, size FROM textract_responses "
+                "ORDER BY last_access LIMIT 1",
+            ).fetchone()
+            if oldest is None:
+                return
+            conn.execute("DELETE FROM textract_responses WHERE key = ?", (oldest[0],))
+            size -= oldest[1]
+
+
+textract_store = TextractResponseStore(
+    settings.textract_store_path,
+    max_bytes=settings.textract_store_max_mb * 1024 * 1024,
+)
@@ -0,0 +1,139 @@
+import resource
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from backend.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class ModelHandle(NamedTuple):
+    """A loaded model together with the cost of loading it."""
+
+    name: str
+    model: Any
+    load_seconds: float
+    rss_bytes: int
+
+
+def current_rss_bytes() -> int:
+    """
+    Resident set size of the current process.
+
+    Reads ``/proc/self/statm`` where available and falls back to the
+    peak RSS reported by ``getrusage`` on other platforms.
+
+    :return: resident memory in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ModelRegistry:
+    """
+    Process-wide store of heavy models.
+
+    Loaders are registered by name and executed at most once per process,
+    either eagerly from the application startup or lazily on first ``get``.
+    Every caller receives the same shared instance, so handles must be
+    treated as read-only.
+    """
+
+    def __init__(self) -> None:
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._handles: Dict[str, ModelHandle] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any]) -> None:
+        """
+        Register a loader for a model.
+
+        :param name: key the model is looked up by.
+        :param loader: callable that builds the model.
+        """
+        self._loaders[name] = loader
+
+    def get(self, name: str) -> Any:
+        """
+        Return the shared model, loading it on first use.
+
+        :param name: registered model name.
+        :return: the loaded model.
+        :raises KeyError: if nothing is registered under ``name``.
+        """
+        handle = self._handles.get(name)
+        if handle is None:
+            handle = self._load(name)
+        return handle.model
+
+    def is_loaded(self, name: str) -> bool:
+        """
+        Check whether a model was already loaded in this process.
+
+        :param name: registered model name.
+        :return: True if the model is resident.
+        """
+        return name in self._handles
+
+    def preload(self, names: Optional[List[str]] = None) -> List[ModelHandle]:
+        """
+        Load models eagerly.
+
+        :param names: models to load, all registered models by default.
+        :return: handles of the loaded models.
+        """
+        if names is None:
+            names = list(self._loaders)
+        handles = []
+        for name in names:
+            handle = self._handles.get(name) or self._load(name)
+            handles.append(handle)
+        return handles
+
+    def report(self) -> List[Dict[str, Any]]:
+        """
+        Describe every resident model.
+
+        :return: load time and resident memory per model.
+        """
+        return [
+            {
+                "name": handle.name,
+                "load_seconds": round(handle.load_seconds, 3),
+                "rss_mb": round(handle.rss_bytes / (1024 * 1024), 1),
+            }
+            for handle in self._handles.values()
+        ]
+
+    def clear(self) -> None:
+        """Drop all loaded models, keeping the registered loaders."""
+        with self._lock:
+            self._handles.clear()
+
+    def _load(self, name: str) -> ModelHandle:
+        if name not in self._loaders:
+            raise KeyError(f"No model registered under '{name}'")
+        with self._lock:
+            handle = self._handles.get(name)
+            if handle is not None:
+                return handle
+            rss_before = current_rss_bytes()
+            started = time.perf_counter()
+            model = self._loaders[name]()
+            load_seconds = time.perf_counter() - started
+            rss_bytes = max(current_rss_bytes() - rss_before, 0)
+            handle = ModelHandle(name, model, load_seconds, rss_bytes)
+            self._handles[name] = handle
+        logger.info(
+            f"Loaded model {name} in {load_seconds:.2f}s "
+            f"(+{rss_bytes / (1024 * 1024):.1f} MB RSS)"
+        )
+        return handle
+
+
+model_registry = ModelRegistry()
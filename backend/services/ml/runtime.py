@@ -0,0 +1,160 @@
+import abc
+import threading
+from typing import Any, Optional
+
+import numpy as np
+
+KERAS = "keras"
+ONNX = "onnx"
+TFLITE = "tflite"
+BACKENDS = (KERAS, ONNX, TFLITE)
+
+
+class InferenceBackend(abc.ABC):
+    """
+    Common interface of the freshness classifier runtimes.
+
+    Every backend takes a float32 batch of shape (N, H, W, 3) scaled to
+    [0, 1] and returns class probabilities of shape (N, classes), so the
+    services do not care which runtime serves the model.
+    """
+
+    name = ""
+
+    @abc.abstractmethod
+    def predict_on_batch(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Run one forward pass.
+
+        :param batch: preprocessed images.
+        :return: class probabilities per image.
+        """
+
+    def predict(self, batch: np.ndarray, **kwargs: Any) -> np.ndarray:
+        """
+        Keras compatible alias of ``predict_on_batch``.
+
+        :param batch: preprocessed images.
+        :param kwargs: ignored Keras options such as ``verbose``.
+        :return: class probabilities per image.
+        """
+        return self.predict_on_batch(batch)
+
+
+class KerasBackend(InferenceBackend):
+    """Serves the original ``.h5`` model through TensorFlow."""
+
+    name = KERAS
+
+    def __init__(self, path: str) -> None:
+        from keras.api.models import load_model  # noqa: WPS433
+
+        self.model = load_model(path)
+
+    def predict_on_batch(self, batch: np.ndarray) -> np.ndarray:
+        return np.asarray(self.model.predict_on_batch(batch))
+
+
+class OnnxBackend(InferenceBackend):
+    """Serves an exported ONNX model through ONNX Runtime."""
+
+    name = ONNX
+
+    def __init__(self, path: str, num_threads: int = 0) -> None:
+        try:
+            import onnxruntime as ort  # noqa: WPS433
+        except ImportError as e:
+            raise RuntimeError(
+                "The onnx backend needs onnxruntime, install the `onnx` extra "
+                "(poetry install -E onnx)",
+            ) from e
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict_on_batch(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class TFLiteBackend(InferenceBackend):
+    """
+    Serves an exported TFLite model.
+
+    Works for float and fully int8 models; int8 inputs and outputs are
+    (de)quantized with the scale stored in the model. The interpreter is
+    not thread safe, so calls are serialized.
+    """
+
+    name = TFLITE
+
+    def __init__(self, path: str, num_threads: int = 0) -> None:
+        import tensorflow as tf  # noqa: WPS433
+
+        self.interpreter = tf.lite.Interpreter(
+            model_path=path,
+            num_threads=num_threads or None,
+        )
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self._batch_size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def predict_on_batch(self, batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if self._batch_size != len(batch):
+                self.interpreter.resize_tensor_input(
+                    self.input["index"],
+                    [len(batch), *batch.shape[1:]],
+                )
+                self.interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+            self.interpreter.set_tensor(
+                self.input["index"],
+                self._quantize(batch, self.input),
+            )
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self.output["index"])
+        return self._dequantize(output, self.output)
+
+    @staticmethod
+    def _quantize(batch: np.ndarray, details: dict) -> np.ndarray:
+        if details["dtype"] == np.float32:
+            return batch
+        scale, zero_point = details["quantization"]
+        info = np.iinfo(details["dtype"])
+        quantized = np.round(batch / scale + zero_point)
+        return np.clip(quantized, info.min, info.max).astype(details["dtype"])
+
+    @staticmethod
+    def _dequantize(output: np.ndarray, details: dict) -> np.ndarray:
+        if details["dtype"] == np.float32:
+            return output
+        scale, zero_point = details["quantization"]
+        return (output.astype(np.float32) - zero_point) * scale
+
+
+def load_backend(name: str, path: str, num_threads: int = 0) -> InferenceBackend:
+    """
+    Build an inference backend.
+
+    :param name: one of ``keras``, ``onnx`` or ``tflite``.
+    :param path: model file for that runtime.
+    :param num_threads: intra-op threads, 0 lets the runtime decide.
+    :return: ready to use backend.
+    :raises ValueError: for an unknown backend name.
+    """
+    if name == KERAS:
+        return KerasBackend(path)
+    if name == ONNX:
+        return OnnxBackend(path, num_threads)
+    if name == TFLITE:
+        return TFLiteBackend(path, num_threads)
+    raise ValueError(f"Unknown inference backend '{name}', expected one of {BACKENDS}")
@@ -0,0 +1,185 @@
+import asyncio
+from typing import AsyncIterator, List, Tuple
+
+import numpy as np
+
+from backend.logging import get_logger
+from backend.services.ml.frame import (
+    EVERY_NTH,
+    KEYFRAMES,
+    SAMPLING_MODES,
+    TIME,
+    ObjectDetectionVideoProcessor,
+)
+from backend.services.ml.workers import worker_pool
+
+logger = get_logger(__name__)
+
+
+class StreamDecodeError(RuntimeError):
+    """Raised when ffmpeg cannot decode an uploaded video."""
+
+
+class StreamTooLargeError(StreamDecodeError):
+    """Raised when an uploaded video exceeds the size limit."""
+
+
+class StreamDecoder:
+    """
+    Decodes a video received in chunks, while the upload is in flight.
+
+    Chunks are piped into an ffmpeg subprocess writing raw BGR frames of
+    a fixed size, so frames come out as soon as ffmpeg can decode them
+    and nothing is staged on disk. Sampling follows ``FrameSampler``,
+    done by ffmpeg filters; frame indexes are those of the source video
+    for ``every_nth`` and output positions otherwise. The container must
+    be streamable: MP4 needs its index up front ("faststart"), while
+    WebM, Matroska, MPEG-TS and MJPEG work as they are. Uploads longer
+    than ``max_bytes`` are refused, 0 disables the limit.
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        mode: str = EVERY_NTH,
+        stride: int = 10,
+        stride_ms: float = 500.0,
+        ffmpeg_cmd: str = "ffmpeg",
+        max_bytes: int = 0,
+    ) -> None:
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode '{mode}', expected one of {SAMPLING_MODES}")
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.stride = max(1, stride)
+        self.stride_ms = stride_ms
+        self.ffmpeg_cmd = ffmpeg_cmd
+        self.max_bytes = max_bytes
+
+    def command(self) -> List[str]:
+        """
+        ffmpeg command line reading stdin and writing raw frames.
+
+        :return: program and arguments.
+        """
+        args = [self.ffmpeg_cmd, "-hide_banner", "-loglevel", "error"]
+        if self.mode == KEYFRAMES:
+            args += ["-skip_frame", "nokey"]
+        args += ["-i", "pipe:0"]
+        filters = []
+        if self.mode == EVERY_NTH and self.stride > 1:
+            filters.append(f"select=not(mod(n\\,{self.stride}))")
+        elif self.mode == TIME:
+            filters.append(f"fps=1000/{self.stride_ms:g}")
+        filters.append(f"scale={self.width}:{self.height}")
+        args += ["-an", "-vf", ",".join(filters), "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"]
+        return args
+
+    async def frames(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, np.ndarray]]:
+        """
+        Decoded frames of the streamed video.
+
+        Closing the generator early stops ffmpeg and the reading of
+        ``chunks``.
+
+        :param chunks: encoded video, for instance ``request.stream()``.
+        :return: ``(index, frame)`` pairs.
+        :raises StreamDecodeError: when ffmpeg fails on the video.
+        :raises StreamTooLargeError: when ``chunks`` exceed ``max_bytes``.
+        """
+        process = await asyncio.create_subprocess_exec(
+            *self.command(),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        feeder = asyncio.create_task(self._feed(process, chunks))
+        # Read alongside stdout, a full stderr pipe would block ffmpeg
+        stderr = asyncio.create_task(process.stderr.read())
+        frame_size = self.width * self.height * 3
+        step = self.stride if self.mode == EVERY_NTH else 1
+        position = 0
+        try:
+            while True:
+                try:
+                    data = await process.stdout.readexactly(frame_size)
+                except asyncio.IncompleteReadError:
+                    break
+                yield position * step, np.frombuffer(data, np.uint8).reshape(
+                    self.height, self.width, 3
+                )
+                position += 1
+            await feeder
+            errors = await stderr
+            if await process.wait() != 0:
+                raise StreamDecodeError(errors.decode(errors="replace").strip())
+        finally:
+            feeder.cancel()
+            stderr.cancel()
+            if process.returncode is None:
+                process.kill()
+                # wait() alone blocks while unread output is left in the pipes
+                await process.communicate()
+
+    async def _feed(self, process: asyncio.subprocess.Process, chunks: AsyncIterator[bytes]) -> None:
+        received = 0
+        try:
+            async for chunk in chunks:
+                received += len(chunk)
+                if self.max_bytes and received > self.max_bytes:
+                    raise StreamTooLargeError(f"Video upload exceeds {self.max_bytes} bytes")
+                process.stdin.write(chunk)
+                # Only read more of the upload once ffmpeg has taken this chunk
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            return  # ffmpeg exited, its status tells why
+        finally:
+            process.stdin.close()
+
+
+async def detect_stream(
+    processor: ObjectDetectionVideoProcessor,
+    decoder: StreamDecoder,
+    chunks: AsyncIterator[bytes],
+    source: str = "upload",
+) -> List[str]:
+    """
+    Run the video detector on a streamed upload.
+
+    Frames go through the processor's difference gate and are detected
+    in batches on the ML thread pool; reading stops at the first batch
+    with a detection, as in ``process_video``.
+
+    :param processor: detector and output directory.
+    :param decoder: decoder of the uploaded stream.
+    :param chunks: encoded video.
+    :param source: name of the video in logs.
+    :return: paths of the saved frames.
+    """
+    processor.gate.reset()
+    decoded = 0
+    batch = []
+    saved = None
+    frames = decoder.frames(chunks)
+    try:
+        async for frame_count, frame in frames:
+            decoded += 1
+            # Skip frames that barely changed since the last one checked
+            if not processor.gate.changed(frame):
+                continue
+            batch.append((frame_count, frame))
+            if len(batch) < processor.batch_size:
+                continue
+            saved = await worker_pool.run_io(processor.first_detection, source, batch)
+            batch = []
+            if saved is not None:
+                break
+        else:
+            if batch:
+                saved = await worker_pool.run_io(processor.first_detection, source, batch)
+    finally:
+        await frames.aclose()
+    logger.info(f"{source}: {decoded} frames decoded, detection {'found' if saved else 'missed'}")
+    return [saved] if saved is not None else []
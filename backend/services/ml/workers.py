@@ -0,0 +1,161 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from backend.logging import get_logger
+from backend.settings import settings
+
+logger = get_logger(__name__)
+
+
+class PoolSaturatedError(RuntimeError):
+    """Raised when more jobs are queued than the pool accepts."""
+
+
+def _init_process_worker() -> None:
+    """Load the ML models once in every worker process."""
+    from backend.services.ml import crud  # noqa: F401, WPS433
+    from backend.services.ml.registry import model_registry  # noqa: WPS433
+
+    model_registry.preload(settings.ml_worker_preload_models)
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+class WorkerPool:
+    """
+    Executors for the blocking parts of the ML pipelines.
+
+    CPU-bound work (Keras, Tesseract) goes to a process pool whose
+    workers preload ``settings.ml_worker_preload_models`` on start. The
+    process pool is only created by the first CPU-bound job, or by
+    ``warm_up``, as most inference runs in the freshness batcher.
+    I/O-bound work such as Textract calls goes to a thread pool. When no
+    process workers are configured, CPU-bound jobs fall back to the
+    thread pool.
+    At most ``max_queue_depth`` jobs may wait on top of the running ones.
+    """
+
+    def __init__(
+        self,
+        process_workers: int,
+        thread_workers: int,
+        max_queue_depth: int,
+    ) -> None:
+        self.process_workers = process_workers
+        self.thread_workers = thread_workers
+        self.max_queue_depth = max_queue_depth
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of submitted jobs that did not finish yet.
+
+        :return: running plus queued jobs.
+        """
+        return self._pending
+
+    def start(self) -> None:
+        """Create the thread pool if it is not running yet."""
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.thread_workers,
+                thread_name_prefix="ml-io",
+            )
+
+    def _processes(self) -> Optional[ProcessPoolExecutor]:
+        if self._process_pool is None and self.process_workers > 0:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=multiprocessing.get_context(
+                    settings.ml_process_start_method,
+                ),
+                initializer=_init_process_worker,
+            )
+        return self._process_pool
+
+    async def warm_up(self) -> None:
+        """Start the process pool and make every worker load its models."""
+        process_pool = self._processes()
+        if process_pool is None:
+            return
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(
+            *[
+                loop.run_in_executor(process_pool, _worker_ready)
+                for _ in range(self.process_workers)
+            ],
+        )
+        logger.info(f"ML worker processes ready: {sorted(set(pids))}")
+
+    def shutdown(self) -> None:
+        """Stop the executors, cancelling jobs that did not start."""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+
+    async def run_cpu(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a CPU-bound job in the process pool.
+
+        ``fn`` and its arguments must be picklable.
+
+        :param fn: function to execute.
+        :param args: positional arguments.
+        :param kwargs: keyword arguments.
+        :return: result of ``fn``.
+        """
+        self.start()
+        executor = self._processes() or self._thread_pool
+        return await self._submit(executor, fn, *args, **kwargs)
+
+    async def run_io(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a blocking I/O-bound job in the thread pool.
+
+        :param fn: function to execute.
+        :param args: positional arguments.
+        :param kwargs: keyword arguments.
+        :return: result of ``fn``.
+        """
+        self.start()
+        return await self._submit(self._thread_pool, fn, *args, **kwargs)
+
+    async def _submit(
+        self,
+        executor: Optional[Executor],
+        fn: Callable[..., Any],
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        capacity = self.process_workers + self.thread_workers + self.max_queue_depth
+        if self._pending >= capacity:
+            raise PoolSaturatedError(
+                f"{self._pending} ML jobs pending, refusing new work",
+            )
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                executor,
+                partial(fn, *args, **kwargs),
+            )
+        finally:
+            self._pending -= 1
+
+
+worker_pool = WorkerPool(
+    process_workers=settings.ml_process_workers,
+    thread_workers=settings.ml_thread_workers,
+    max_queue_depth=settings.ml_max_queue_depth,
+)
@@ -83,9 +83,115 @@ class Settings(BaseSettings):
     db_base: str = cfg.get("db_base")
     db_echo: bool = False
     cache: ClassVar[TTLCache] = TTLCache(
-        cfg.get("CACHE_MAXSIZE"), ttl=timedelta(hours=cfg.get("CACHE_TIMEOUT_HOUR"))
+        cfg.get("CACHE_MAXSIZE"),
+        ttl=timedelta(hours=cfg.get("CACHE_TIMEOUT_HOUR")).total_seconds(),
     )
     TF_ENABLE_ONEDNN_OPTS: int = cfg.get("TF_ENABLE_ONEDNN_OPTS")
+    # Freshness classifier runtime: keras, onnx or tflite.
+    # The onnx/tflite files are produced by `python -m backend.services.ml.export`.
+    freshness_backend: str = "keras"
+    freshness_model_path: str = "backend/services/ml/finalpilotmodel.h5"
+    # fp32 exports; the *_int8 variants are only written with calibration images
+    freshness_onnx_path: str = "backend/services/ml/finalpilotmodel.onnx"
+    freshness_tflite_path: str = "backend/services/ml/finalpilotmodel.tflite"
+    # Intra-op threads for onnx/tflite, 0 lets the runtime decide
+    freshness_num_threads: int = 0
+    # Load ML models on startup instead of on the first request
+    preload_models: bool = True
+    startup_models: list[str] = ["freshness", "textract"]
+    # Classify all images of a request in a single forward pass
+    freshness_batch_inference: bool = True
+    # Micro-batching of freshness inference across concurrent requests
+    freshness_batcher_enabled: bool = True
+    freshness_max_batch_size: int = 32
+    freshness_max_wait_ms: float = 5.0
+    # Worker pools for the blocking OCR and inference pipelines.
+    # With 0 process workers CPU-bound jobs run in the thread pool.
+    ml_process_workers: int = 2
+    ml_thread_workers: int = 8
+    ml_max_queue_depth: int = 32
+    ml_process_start_method: str = "spawn"
+    # Models loaded by each process worker when it starts
+    ml_worker_preload_models: list[str] = []
+    # Live camera frames kept in memory and passed to /form/fill by reference
+    frame_store_enabled: bool = True
+    frame_store_max_sessions: int = 64
+    frame_store_max_frames: int = 16
+    frame_store_ttl_seconds: float = 600.0
+    # Frames recognized concurrently per websocket in streaming mode
+    live_stream_max_inflight: int = 4
+    # Frames queued per websocket when processing falls behind, dropped by
+    # policy: drop_oldest, latest_wins or every_nth
+    live_queue_size: int = 8
+    live_drop_policy: str = "drop_oldest"
+    live_keep_every_nth: int = 2
+    # Broadcasts drop live feed sockets that take longer to accept a message
+    live_send_timeout_seconds: float = 2.0
+    # Live frames within this many dHash bits of one of the last
+    # live_dedup_window saved frames are skipped as duplicates
+    live_dedup_enabled: bool = True
+    live_dedup_window: int = 16
+    live_dedup_max_distance: int = 6
+    # Frames of uploaded videos sent to the detector: all, every_nth, time
+    # or keyframes, then skipped when they barely differ from the last one
+    video_sampling_mode: str = "every_nth"
+    video_frame_stride: int = 10
+    video_time_stride_ms: float = 500.0
+    video_diff_threshold: float = 2.0
+    # Frames per detector forward pass
+    video_detect_batch_size: int = 8
+    # Detections below this confidence are ignored
+    video_min_score: float = 0.0
+    # Worker processes for multi-video requests, 0 or 1 processes them in turn
+    video_workers: int = 0
+    # YOLOv5 detector tier (n, s or m), loaded from local weights
+    yolo_tier: str = "s"
+    yolo_weights_dir: Path = Path("models/yolo")
+    # Local checkout of ultralytics/yolov5, otherwise the torch hub cache is used
+    yolo_repo_dir: Path | None = None
+    torch_hub_dir: Path = Path("models/torch_hub")
+    # Tiers loaded and timed on startup, logged for picking yolo_tier
+    yolo_startup_report_tiers: list[str] = []
+    # Streamed video uploads, decoded by ffmpeg to frames of this size
+    ffmpeg_cmd: str = "ffmpeg"
+    video_stream_width: int = 640
+    video_stream_height: int = 480
+    # Largest streamed upload accepted, 0 for no limit
+    video_stream_max_bytes: int = 512 * 1024 * 1024
+    video_frames_dir: Path = Path("backend/services/video/frames")
+    # Shared Textract client and the fan-out of multi-image scans
+    textract_max_pool_connections: int = 16
+    textract_connect_timeout: float = 3.0
+    textract_read_timeout: float = 30.0
+    textract_max_attempts: int = 4
+    textract_max_concurrency: int = 8
+    # Durable store of raw Textract responses, survives restarts
+    textract_store_enabled: bool = True
+    textract_store_path: Path = Path("var/textract_store.sqlite3")
+    textract_store_max_mb: int = 512
+    # In-memory OCR results, kept apart from the classifier results in `cache`
+    ocr_cache_maxsize: int = 1024
+    ocr_cache_ttl_seconds: float = 12 * 3600
+    # Responses loaded into the in-memory OCR cache on startup
+    textract_store_warm_entries: int = 200
+    # Brand catalog: poll interval of the brands table and fuzzy-match cut-offs
+    brand_refresh_seconds: float = 60.0
+    # Re-read window of each refresh, longer than any brands write transaction
+    brand_refresh_overlap_seconds: float = 300.0
+    brand_match_threshold: float = 0.5
+    brand_search_threshold: float = 0.75
+    # OCR engine of /fill: textract, tesseract or replay, overridable per request
+    ocr_engine: str = "textract"
+    tesseract_cmd: str = "tesseract"
+    # Parallel PSM passes per process; stop at the first MRP + date hit
+    tesseract_pass_workers: int = 6
+    tesseract_early_exit: bool = True
+    # When set, Textract responses are also written here as <sha256>.json
+    ocr_record_dir: Path | None = None
+    # Offline Textract stand-in replaying recorded responses
+    ocr_replay_dir: Path = Path("var/ocr_recordings")
+    ocr_replay_latency_ms: float = 0.0
+    ocr_replay_jitter_ms: float = 0.0
     CLIENT_ID: str = cfg.get("GOOGLE_CLIENT_ID")
     CLIENT_SECRET: str = cfg.get("GOOGLE_CLIENT_SECRET")
     # This variable is used to define
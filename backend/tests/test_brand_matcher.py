@@ -0,0 +1,159 @@
+import datetime
+import random
+import re
+from typing import Any, NamedTuple
+
+import pytest
+
+from backend.services.ml.brands import (
+    DEFAULT_BRANDS,
+    BrandCatalog,
+    BrandHit,
+    BrandMatcher,
+    TrigramIndex,
+    trigrams,
+)
+
+BRANDS = [
+    "Dabur Amla",
+    "Dabur",
+    "Colgate",
+    "Oral-B",
+    "Johnson & Johnson",
+    "L'Oréal",
+    "HUL (Hindustan Unilever)",
+    "Head & Shoulders",
+    "Lux",
+    "aa",
+]
+
+
+def _legacy_hits(text: str) -> list:
+    return [
+        BrandHit(brand, match.start(), match.end())
+        for brand in BRANDS
+        for match in re.finditer(re.escape(brand), text, re.IGNORECASE)
+    ]
+
+
+def _legacy_word_match(text: str) -> object:
+    for brand in BRANDS:
+        for word in brand.split():
+            if re.search(r"\b" + re.escape(word) + r"\b", text, re.IGNORECASE):
+                return brand
+    return None
+
+
+def test_hits_have_offsets() -> None:
+    """Checks that every brand occurrence is reported with its offset."""
+    matcher = BrandMatcher(BRANDS)
+
+    assert matcher.find_all("MRP 45 dabur amla by DABUR") == [
+        BrandHit("Dabur Amla", 7, 17),
+        BrandHit("Dabur", 7, 12),
+        BrandHit("Dabur", 21, 26),
+    ]
+    assert matcher.first_word_match("made by hul ltd") == "HUL (Hindustan Unilever)"
+    assert matcher.first_word_match("Luxury") is None
+
+
+def test_matches_per_brand_regex_scans() -> None:
+    """Checks the single-pass matcher against the former per-brand scans."""
+    matcher = BrandMatcher(BRANDS)
+    pieces = [word for brand in BRANDS for word in brand.split()] + [
+        "aaa", "MRP", "x", "&", "(", "-", "luxury", "OREAL", "l'oréal",
+    ]
+    rng = random.Random(7)
+    for _ in range(500):
+        text = rng.choice(["", " ", "."]).join(
+            rng.choice(pieces) for _ in range(rng.randint(0, 12))
+        )
+        assert matcher.find_all(text) == _legacy_hits(text), text
+        assert matcher.first_word_match(text) == _legacy_word_match(text), text
+
+
+def test_trigrams_follow_pg_trgm() -> None:
+    """Checks trigram extraction against pg_trgm's show_trgm('Co1gate!')."""
+    assert trigrams("Co1gate!") == {"  c", " co", "co1", "o1g", "1ga", "gat", "ate", "te "}
+
+
+def test_index_updates_in_place() -> None:
+    """Checks that removed brands stop matching."""
+    index = TrigramIndex()
+    index.add("Colgate")
+    index.add("Dabur")
+    index.remove("Colgate")
+
+    assert [match.brand for match in index.similarity("Co1gate")] == []
+    assert len(index) == 1
+
+
+def test_catalog_fuzzy_lookup() -> None:
+    """Checks that OCR noise resolves to the closest brand."""
+    catalog = BrandCatalog(["Colgate", "Nivea", "Dabur"])
+
+    assert catalog.match("Co1gate", threshold=0.4).brand == "Colgate"
+    assert catalog.match("Patanjali", threshold=0.4) is None
+    assert catalog.search("MRP 45 by dabur india ltd", threshold=0.75).brand == "Dabur"
+
+
+def test_brandless_text_has_no_fuzzy_brand() -> None:
+    """Checks that trigrams of unrelated words do not add up to a brand."""
+    catalog = BrandCatalog(DEFAULT_BRANDS)
+    text = "Made in India. Use within time limit. Keep inside the box. MRP Rs 45 incl of all taxes"
+
+    assert catalog.search(text, threshold=0.75) is None
+    assert catalog.search(text.replace("the box", "the Surf Exce1 box"), 0.75).brand == "Surf Excel"
+
+
+class _Row(NamedTuple):
+    id: int
+    name: str
+    is_active: bool
+    updated_at: datetime.datetime
+
+
+class _Result:
+    def __init__(self, rows: list) -> None:
+        self.rows = rows
+
+    def all(self) -> list:
+        return self.rows
+
+
+class _FakeSession:
+    """Serves committed rows of a brands table stamped after the query's cutoff."""
+
+    def __init__(self, rows: list) -> None:
+        self.rows = rows
+
+    async def execute(self, query: Any) -> _Result:
+        cutoffs = [value for value in query.compile().params.values() if isinstance(value, datetime.datetime)]
+        rows = [row for row in self.rows if not cutoffs or row.updated_at > cutoffs[0]]
+        return _Result(sorted(rows, key=lambda row: row.updated_at))
+
+
+@pytest.mark.anyio
+async def test_refresh_catches_late_commits_and_deletes() -> None:
+    """Checks that rows committed out of stamp order and deactivations are applied."""
+    start = datetime.datetime(2026, 1, 1)
+    second = datetime.timedelta(seconds=1)
+    session = _FakeSession([_Row(1, "Colgate", True, start), _Row(2, "Dabur", True, start)])
+    catalog = BrandCatalog(["Seed"], overlap=60)
+
+    assert await catalog.refresh(session) == 2
+    assert catalog.brands == ("Colgate", "Dabur")
+
+    # Stamped at +1s, but committed after the +2s row was already read
+    session.rows.append(_Row(4, "Nivea", True, start + 2 * second))
+    assert await catalog.refresh(session) == 1
+    session.rows.append(_Row(3, "Lux", True, start + second))
+    assert await catalog.refresh(session) == 1
+    assert catalog.brands == ("Colgate", "Dabur", "Lux", "Nivea")
+
+    # A deleted row stays as an inactive one
+    session.rows[0] = _Row(1, "Colgate", False, start + 3 * second)
+    assert await catalog.refresh(session) == 1
+    assert catalog.brands == ("Dabur", "Lux", "Nivea")
+    assert catalog.match("Colgate", threshold=0.5) is None
+    assert await catalog.refresh(session) == 0
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from backend.services.base.connections import ConnectionManager
+
+
+class _FakeSocket:
+    def __init__(self, delay: float = 0, fail: bool = False) -> None:
+        self.delay = delay
+        self.fail = fail
+        self.scope: dict = {"subprotocols": []}
+        self.sent: list = []
+
+    async def accept(self, subprotocol: str | None = None) -> None:
+        """Accepts the handshake."""
+
+    async def send_text(self, message: str) -> None:
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("socket closed")
+        self.sent.append(message)
+
+
+@pytest.mark.anyio
+async def test_broadcast_drops_slow_and_broken_sockets() -> None:
+    """Checks that a broadcast is not held up by slow or closed sockets."""
+    manager = ConnectionManager(send_timeout=0.05)
+    sockets = {
+        "fast": _FakeSocket(),
+        "slow": _FakeSocket(),
+        "broken": _FakeSocket(),
+    }
+    for session_id, websocket in sockets.items():
+        await manager.connect(session_id, websocket)
+    sockets["slow"].delay = 1
+    sockets["broken"].fail = True
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    delivered = await manager.broadcast("hello")
+
+    assert loop.time() - started < 0.5
+    assert delivered == 1
+    assert sockets["fast"].sent == ["fast", "hello"]
+    assert list(manager.active_connections) == ["fast"]
@@ -0,0 +1,35 @@
+import cv2
+import numpy as np
+
+from backend.services.ml.dedup import NearDuplicateFilter, dhash_jpeg
+
+
+def _jpeg(image: np.ndarray) -> bytes:
+    ok, encoded = cv2.imencode(".jpg", image)
+    assert ok
+    return encoded.tobytes()
+
+
+def _shelf(seed: int) -> np.ndarray:
+    # Blocky random picture, stands in for a product in front of the camera
+    blocks = np.random.default_rng(seed).integers(0, 255, (6, 8, 3), dtype=np.uint8)
+    return cv2.resize(blocks, (320, 240), interpolation=cv2.INTER_NEAREST)
+
+
+def test_near_duplicates_are_skipped() -> None:
+    """Checks that only visually new frames are admitted."""
+    dedup = NearDuplicateFilter(window=2, max_distance=6)
+    product = _shelf(1)
+    noisy = np.clip(
+        product.astype(np.int16) + np.random.default_rng(0).integers(-8, 8, product.shape),
+        0,
+        255,
+    ).astype(np.uint8)
+
+    assert dedup.admit(_jpeg(product))
+    assert not dedup.admit(_jpeg(noisy))
+    assert dedup.admit(_jpeg(_shelf(2)))
+    assert dedup.admit(_jpeg(_shelf(3)))
+    # Out of the window of the last two frames, the first product is new again
+    assert dedup.admit(_jpeg(product))
+    assert dhash_jpeg(b"not a jpeg") is None
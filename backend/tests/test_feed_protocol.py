@@ -0,0 +1,53 @@
+import base64
+import json
+import time
+
+import pytest
+
+from backend.services.base.feed_protocol import (
+    BINARY_SUBPROTOCOL,
+    FRAME_HEADER,
+    FrameProtocolError,
+    decode_binary_frame,
+    decode_class_table,
+    decode_text_frame,
+    encode_binary_frame,
+    negotiate_subprotocol,
+)
+
+JPEG = b"\xff\xd8\xff\xe0fake-jpeg\xff\xd9"
+
+
+def test_binary_frame_round_trip() -> None:
+    """Checks that the header fields and the JPEG survive encoding."""
+    timestamp_ms = int(time.time() * 1000)
+    message = encode_binary_frame(2, 41, timestamp_ms, JPEG)
+
+    frame = decode_binary_frame(message, ["apple", "banana", "bottle"])
+
+    assert len(message) == FRAME_HEADER.size + len(JPEG)
+    assert frame.detected_class == "bottle"
+    assert (frame.seq, frame.timestamp_ms) == (41, timestamp_ms)
+    assert bytes(frame.image) == JPEG
+    assert decode_binary_frame(message).detected_class == "2"
+
+
+def test_binary_frame_rejects_bad_messages() -> None:
+    """Checks short messages and unknown versions."""
+    with pytest.raises(FrameProtocolError):
+        decode_binary_frame(b"\x01\x00")
+    with pytest.raises(FrameProtocolError):
+        decode_binary_frame(b"\x09" + encode_binary_frame(0, 0, 0, JPEG)[1:])
+
+
+def test_text_protocol_is_still_understood() -> None:
+    """Checks the JSON messages of clients without the subprotocol."""
+    data_url = "data:image/jpeg;base64," + base64.b64encode(JPEG).decode()
+
+    frame = decode_text_frame(json.dumps({"image": data_url, "class": "bottle"}))
+
+    assert frame == ("bottle", JPEG, None, None)
+    assert negotiate_subprotocol([]) is None
+    assert negotiate_subprotocol(["other", BINARY_SUBPROTOCOL]) == BINARY_SUBPROTOCOL
+    assert decode_class_table(json.dumps({"classes": ["apple"]})) == ["apple"]
+    assert decode_class_table(json.dumps({"image": data_url})) is None
@@ -0,0 +1,50 @@
+import pytest
+
+from backend.services.base.frame_queue import (
+    DROP_OLDEST,
+    EVERY_NTH,
+    LATEST_WINS,
+    FrameQueue,
+)
+
+
+async def _drain(queue: FrameQueue) -> list:
+    queue.close()
+    items = []
+    while (item := await queue.get()) is not None:
+        items.append(item)
+    return items
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "policy, kept",
+    [
+        (DROP_OLDEST, [7, 8, 9]),
+        (LATEST_WINS, [9]),
+        (EVERY_NTH, [3, 6, 9]),
+    ],
+)
+async def test_drop_policies(policy: str, kept: list) -> None:
+    """Checks which frames each policy keeps when nothing is consumed."""
+    queue = FrameQueue(3, policy, nth=3)
+    for frame in range(10):
+        queue.put(frame)
+
+    assert await _drain(queue) == kept
+    assert queue.received == 10
+    assert queue.dropped == 10 - len(kept)
+
+
+@pytest.mark.anyio
+async def test_get_waits_for_frames() -> None:
+    """Checks that a consumer keeps up without drops."""
+    queue = FrameQueue(2)
+    received = []
+    for frame in range(5):
+        queue.put(frame)
+        received.append(await queue.get())
+
+    assert received == [0, 1, 2, 3, 4]
+    assert queue.dropped == 0
+    assert await _drain(queue) == []
@@ -0,0 +1,38 @@
+import cv2
+import numpy as np
+import pytest
+
+from backend.services.ml.frame_store import FrameStore, is_frame_ref
+
+
+def _jpeg(value: int) -> bytes:
+    ok, encoded = cv2.imencode(".jpg", np.full((24, 32, 3), value, np.uint8))
+    assert ok
+    return encoded.tobytes()
+
+
+def test_frames_are_decoded_once_and_bounded_per_session() -> None:
+    """Checks lookups, the per-session bound and session cleanup."""
+    store = FrameStore(max_sessions=4, max_frames=2, ttl=60)
+    refs = [store.put("s1", _jpeg(value), "apple") for value in (10, 120, 240)]
+    other = store.put("s2", _jpeg(50))
+
+    assert all(is_frame_ref(ref) for ref in refs)
+    assert not is_frame_ref("backend/services/video/images/x.jpg")
+    frame = store.get(refs[2])
+    assert frame.image.shape == (24, 32, 3)
+    assert abs(int(frame.image.mean()) - 240) < 5
+    assert frame.detected_class == "apple"
+    with pytest.raises(KeyError):
+        store.get(refs[0])  # evicted, the session keeps its latest 2 frames
+
+    store.drop_session("s1")
+    with pytest.raises(KeyError):
+        store.get(refs[2])
+    assert store.get(other).jpeg == _jpeg(50)
+
+
+def test_undecodable_frames_are_rejected() -> None:
+    """Checks that bytes that are not an image are not stored."""
+    with pytest.raises(ValueError):
+        FrameStore(max_sessions=1, max_frames=1, ttl=60).put("s1", b"not a jpeg")
@@ -0,0 +1,86 @@
+import cv2
+import numpy as np
+import pytest
+from cachetools import TTLCache
+
+from backend.services.ml import crud
+from backend.services.ml.cache import ResultCache
+from backend.services.ml.crud import ImageProcessor
+from backend.services.ml.frame_store import frame_store
+from backend.settings import settings
+
+SESSION = "batching-test"
+
+
+class BrightnessModel:
+    """Class from the red level, confidence from the green level of each image."""
+
+    def __init__(self) -> None:
+        self.calls = []
+
+    def predict_on_batch(self, batch: np.ndarray) -> np.ndarray:
+        self.calls.append(len(batch))
+        red = batch[:, :, :, 0].mean(axis=(1, 2))
+        green = batch[:, :, :, 1].mean(axis=(1, 2))
+        rows = np.full((len(batch), 15), 0.01, np.float32)
+        rows[np.arange(len(batch)), (red * 14).round().astype(int)] = green
+        return rows
+
+
+class ModelBatcher:
+    """Stands in for the micro-batcher, one forward pass per call."""
+
+    def __init__(self, model: BrightnessModel) -> None:
+        self.model = model
+
+    async def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.model.predict_on_batch(batch)
+
+
+class InlinePool:
+    """Runs worker pool jobs in the calling thread."""
+
+    async def run_io(self, fn, *args):
+        return fn(*args)
+
+
+@pytest.fixture
+def frame_refs():
+    """Live frames of distinct classes, the third one the most confident."""
+    colors = [(40, 120, 200), (90, 60, 30), (200, 230, 180), (10, 200, 100)]
+    refs = [
+        frame_store.put(SESSION, cv2.imencode(".png", np.full((8, 8, 3), color, np.uint8))[1].tobytes())
+        for color in colors
+    ]
+    yield refs
+    frame_store.drop_session(SESSION)
+
+
+def _fresh_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(crud, "result_cache", ResultCache(TTLCache(64, ttl=60)))
+
+
+@pytest.mark.anyio
+async def test_batched_and_per_image_paths_agree(
+    frame_refs: list,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Checks that batching never changes the best label or its confidence."""
+    processor = ImageProcessor("tesseract", frame_refs, len(frame_refs), ocr_engine="tesseract")
+    model = BrightnessModel()
+    results = []
+
+    for batch_inference in (False, True):
+        _fresh_cache(monkeypatch)
+        monkeypatch.setattr(settings, "freshness_batch_inference", batch_inference)
+        results.append(processor.predict_best_image(model, frame_refs))
+    _fresh_cache(monkeypatch)
+    results.append(await processor.process_batched(frame_refs, ModelBatcher(model), InlinePool()))
+
+    assert model.calls == [1, 1, 1, 1, 4, 4]
+    per_image = results[0]
+    assert per_image["Predicted Class"] is not None
+    for result in results[1:]:
+        assert result["Predicted Class"] == per_image["Predicted Class"]
+        # Reported as a one-element set
+        assert next(iter(result["Confidence"])) == pytest.approx(next(iter(per_image["Confidence"])))
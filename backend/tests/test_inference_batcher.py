@@ -0,0 +1,62 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from backend.services.ml.batching import InferenceBatcher
+
+
+@pytest.mark.anyio
+async def test_concurrent_requests_share_batches() -> None:
+    """Checks that queued requests are batched and get their own rows back."""
+    batch_sizes = []
+
+    def predict(batch: np.ndarray) -> np.ndarray:
+        batch_sizes.append(len(batch))
+        return batch.sum(axis=1, keepdims=True)
+
+    batcher = InferenceBatcher("test", predict, max_batch_size=8, max_wait_ms=20)
+    await batcher.start()
+    try:
+        requests = [np.full((3, 2), idx, dtype=np.float32) for idx in range(5)]
+        outputs = await asyncio.gather(*[batcher.predict(req) for req in requests])
+    finally:
+        await batcher.stop()
+
+    for idx, output in enumerate(outputs):
+        assert output.shape == (3, 1)
+        assert (output == 2 * idx).all()
+    assert sum(batch_sizes) == 15
+    assert max(batch_sizes) <= 8
+    assert len(batch_sizes) < len(requests)
+
+
+@pytest.mark.anyio
+async def test_stop_fails_in_flight_requests() -> None:
+    """Checks that stop fails requests being collected or predicted."""
+    loop = asyncio.get_running_loop()
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    def predict(batch: np.ndarray) -> np.ndarray:
+        loop.call_soon_threadsafe(started.set)
+        asyncio.run_coroutine_threadsafe(release.wait(), loop).result()
+        return batch
+
+    # Waiting for more rows before flushing
+    batcher = InferenceBatcher("test", predict, max_batch_size=4, max_wait_ms=10_000)
+    await batcher.start()
+    collecting = asyncio.ensure_future(batcher.predict(np.zeros((1, 1))))
+    await asyncio.sleep(0.01)
+    await batcher.stop()
+    with pytest.raises(RuntimeError, match="Batcher stopped"):
+        await asyncio.wait_for(collecting, 1)
+
+    # Running in the executor
+    await batcher.start()
+    running = asyncio.ensure_future(batcher.predict(np.zeros((4, 1))))
+    await asyncio.wait_for(started.wait(), 1)
+    await batcher.stop()
+    release.set()
+    with pytest.raises(RuntimeError, match="Batcher stopped"):
+        await asyncio.wait_for(running, 1)
@@ -0,0 +1,102 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from backend.services.ml import crud, export, runtime
+from backend.settings import settings
+
+
+class FakeBackend(runtime.InferenceBackend):
+    """Predicts from the mean pixel, flipping classes for "flip" models."""
+
+    def __init__(self, path: str, num_threads: int = 0) -> None:
+        self.path = path
+        self.num_threads = num_threads
+
+    def predict_on_batch(self, batch: np.ndarray) -> np.ndarray:
+        dark = batch.mean(axis=(1, 2, 3)) < 0.5
+        if "flip" in Path(self.path).name:
+            dark = ~dark
+        return np.stack([dark, ~dark], axis=1).astype(np.float32)
+
+
+def test_backend_interface_is_abstract() -> None:
+    """Checks that a backend without predict_on_batch cannot be built."""
+    with pytest.raises(TypeError):
+        runtime.InferenceBackend()  # type: ignore
+
+
+@pytest.mark.parametrize(
+    ("name", "attribute"),
+    [
+        (runtime.KERAS, "KerasBackend"),
+        (runtime.ONNX, "OnnxBackend"),
+        (runtime.TFLITE, "TFLiteBackend"),
+    ],
+)
+def test_freshness_backend_selection(
+    name: str,
+    attribute: str,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Checks that each runtime name loads its backend with its model file."""
+    fake = type(attribute, (FakeBackend,), {})
+    monkeypatch.setattr(runtime, attribute, fake)
+    monkeypatch.setattr(settings, "freshness_num_threads", 2)
+
+    backend = crud._load_freshness_model(name)
+
+    assert type(backend).__name__ == attribute
+    assert backend.path == crud._freshness_model_path(name)
+    assert backend.num_threads == (0 if name == runtime.KERAS else 2)
+    assert "_int8" not in backend.path
+
+
+def test_unknown_backend_is_refused() -> None:
+    """Checks that an unknown runtime name fails loudly."""
+    with pytest.raises(ValueError):
+        runtime.load_backend("torchscript", "model.pt")
+
+
+def test_compare_measures_agreement_with_keras(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    """Checks that every variant is scored against the Keras predictions."""
+    model = tmp_path / "model.h5"
+    for path in (model, tmp_path / "model.onnx", tmp_path / "model.tflite"):
+        path.write_bytes(b"model")
+    batch = np.concatenate([np.zeros((3, 2, 2, 3)), np.ones((1, 2, 2, 3))]).astype(np.float32)
+    monkeypatch.setattr(export, "list_images", lambda folder, limit: ["image"] * len(batch))
+    monkeypatch.setattr(export.ImageProcessor, "load_batch", staticmethod(lambda images: batch))
+    monkeypatch.setattr(export, "load_backend", lambda name, path, threads: FakeBackend(path))
+    args = argparse.Namespace(
+        model=str(model),
+        out_dir="",
+        images="holdout",
+        limit=0,
+        batch_size=2,
+        repeats=1,
+        threads=0,
+        json="",
+    )
+
+    report = {row["variant"]: row["top1_agreement"] for row in export.compare(args)}
+    assert report == {runtime.KERAS: 1.0, "onnx": 1.0, "tflite": 1.0}
+
+    # A variant that disagrees with Keras on every image
+    monkeypatch.setattr(
+        export,
+        "artifact_paths",
+        lambda model_path, out_dir: {"onnx": tmp_path / "flip.onnx"},
+    )
+    (tmp_path / "flip.onnx").write_bytes(b"model")
+    report = {row["variant"]: row["top1_agreement"] for row in export.compare(args)}
+    assert report == {runtime.KERAS: 1.0, "onnx": 0.0}
+
+    model.unlink()
+    with pytest.raises(SystemExit):
+        export.compare(args)
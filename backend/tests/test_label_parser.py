@@ -0,0 +1,79 @@
+import random
+import re
+from datetime import datetime
+
+from backend.services.ml.label_parser import (
+    DATE,
+    MRP,
+    key_term_positions,
+    parse_label,
+    scan_label,
+)
+
+
+def _legacy_extract_details(text: str) -> tuple:
+    mrp_match = re.search(r"(?:Rs|MRP|₹)[\s.:₹]*([\d]+(?:\.\d+)?)(?:[/-])?", text, re.IGNORECASE)
+    mrp = mrp_match.group(1) if mrp_match else None
+    unique_dates = sorted(
+        set(
+            re.findall(r"(\d{2}\.\d{2}\.\d{2})", text)
+            + re.findall(r"(\b\d{2}/\d{2}\b)", text)
+            + re.findall(r"(\b\d{2}/\d{4}\b)", text)
+        )
+    )[:2]
+    dates = []
+    for date_str in unique_dates:
+        if "/" in date_str:
+            month, year = date_str.split("/")
+            date_str = f"01.{month}.{year[-2:]}"
+        dates.append(date_str)
+    if len(dates) == 2:
+        dates.sort(key=lambda date: datetime.strptime(date, "%d.%m.%y"))
+        return mrp, dates[0], dates[1]
+    return mrp, dates[0] if dates else None, None
+
+
+def _legacy_term_positions(text: str) -> list:
+    positions = []
+    for term in ["MRP", "Mfd", "Exp.", "Manufactured", "Marketed By"]:
+        term_match = re.search(term, text, re.IGNORECASE)
+        if term_match:
+            positions.append(term_match.start())
+    return positions
+
+
+def test_candidates_have_positions() -> None:
+    """Checks that overlapping MRP and date candidates are all reported."""
+    text = "MRP 12.05.24 Exp 05/2026"
+    found = [(item.kind, item.value, item.start) for item in scan_label(text) if item.kind != "term"]
+
+    assert found == [(MRP, "12.05", 4), (DATE, "12.05.24", 4), (DATE, "01.05.26", 17)]
+    assert parse_label(text)[:3] == ("12.05", "12.05.24", "01.05.26")
+
+
+def test_impossible_dates_are_skipped() -> None:
+    """Checks that dates such as 45/99 no longer break parsing."""
+    assert parse_label("Mfd 45/99 Exp 03/25")[:3] == (None, "01.03.25", None)
+
+
+def test_matches_former_regex_helpers() -> None:
+    """Checks the single-pass parser against the former helpers."""
+    pieces = [
+        "MRP", "Rs.", "₹", "mrp:", "45", "45.50", "12.05.24", "01.01.25", "03/25",
+        "11/2026", "12/05/2024", "Mfd", "EXP.", "Expiry", "Manufactured", "Marketed By",
+        "Hairs", "x", "/", ".", "-",
+    ]
+    rng = random.Random(3)
+    for _ in range(2000):
+        text = rng.choice(["", " ", "\n"]).join(
+            rng.choice(pieces) for _ in range(rng.randint(0, 10))
+        )
+        assert key_term_positions(scan_label(text)) == _legacy_term_positions(text), text
+        try:
+            expected = _legacy_extract_details(text)
+            for date in expected[1:]:
+                if date:
+                    datetime.strptime(date, "%d.%m.%y")
+        except ValueError:
+            continue  # the former helpers failed on impossible dates
+        assert parse_label(text)[:3] == expected, text
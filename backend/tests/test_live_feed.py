@@ -0,0 +1,158 @@
+import asyncio
+import base64
+import json
+import logging
+from typing import Any, Dict, List
+
+import cv2
+import numpy as np
+import pytest
+
+from backend.services.base.cam import LiveFeed, freshness_runner
+from backend.services.ml.frame_store import is_frame_ref
+from backend.services.ml.workers import worker_pool
+from backend.settings import settings
+
+
+def test_frame_refs_stay_in_process() -> None:
+    """Checks that stored frames are classified on threads, files in processes."""
+    assert freshness_runner(["frame:session/1"]) == worker_pool.run_io
+    assert freshness_runner([]) == worker_pool.run_cpu
+
+
+class FakeWebSocket:
+    """Replays client messages and records what the server sends."""
+
+    def __init__(self, messages: List[str]) -> None:
+        self.messages = [{"type": "websocket.receive", "text": text} for text in messages]
+        self.sent: List[Any] = []
+
+    async def receive(self) -> Dict[str, Any]:
+        if self.messages:
+            return self.messages.pop(0)
+        return {"type": "websocket.disconnect"}
+
+    async def send_json(self, data: Any) -> None:
+        # Serialized like the real socket, the server reuses its lists
+        self.sent.append(json.loads(json.dumps(data)))
+
+    async def send_text(self, data: str) -> None:
+        self.sent.append(data)
+
+
+def frame_message(image: bytes, detected_class: str = "apple") -> str:
+    encoded = base64.b64encode(image).decode()
+    return json.dumps({"image": f"data:image/jpeg;base64,{encoded}", "class": detected_class})
+
+
+def jpeg(value: int) -> bytes:
+    return cv2.imencode(".jpg", np.full((16, 16, 3), value, dtype=np.uint8))[1].tobytes()
+
+
+@pytest.mark.anyio
+async def test_undecodable_frame_is_skipped(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Checks that a corrupt frame is dropped without ending the session."""
+    monkeypatch.setattr(settings, "live_dedup_enabled", False)
+    messages = [frame_message(b"not an image")]
+    messages += [frame_message(jpeg(value)) for value in (0, 128, 255)]
+    websocket = FakeWebSocket(messages)
+
+    await LiveFeed().send_personal_message("", websocket)
+
+    assert len(websocket.sent) == 1
+    assert all(is_frame_ref(ref) for ref in websocket.sent[0]["img"])
+    assert len(websocket.sent[0]["img"]) == 3
+
+
+def pushed_results(sent: List[Any]) -> List[Dict[str, Any]]:
+    return [message for message in sent if isinstance(message, dict) and message.get("type") == "result"]
+
+
+class StreamingWebSocket(FakeWebSocket):
+    """Stays open until the expected number of results was pushed."""
+
+    def __init__(self, messages: List[str], results: int) -> None:
+        super().__init__(messages)
+        self.results = results
+        self.all_sent = asyncio.Event()
+
+    async def receive(self) -> Dict[str, Any]:
+        if not self.messages:
+            await asyncio.wait_for(self.all_sent.wait(), 5)
+        return await super().receive()
+
+    async def send_json(self, data: Any) -> None:
+        await super().send_json(data)
+        if len(pushed_results(self.sent)) >= self.results:
+            self.all_sent.set()
+
+
+@pytest.mark.anyio
+async def test_stream_mode_pushes_results(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Checks that every saved frame gets a result, within the in-flight limit."""
+    monkeypatch.setattr(settings, "live_dedup_enabled", False)
+    monkeypatch.setattr(settings, "live_stream_max_inflight", 2)
+    classes = ["apple"] * 3 + ["banana"] * 2
+    websocket = StreamingWebSocket(
+        [frame_message(jpeg(index * 50), name) for index, name in enumerate(classes)],
+        results=len(classes),
+    )
+    feed = LiveFeed(stream=True)
+    running = 0
+    peak = 0
+
+    async def recognize(image_ref: str, detected_class: str) -> Dict[str, Any]:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {"label": f"fresh{detected_class}", "confidence": 90.0}
+
+    monkeypatch.setattr(feed, "recognize", recognize)
+
+    await feed.send_personal_message("", websocket)
+
+    results = pushed_results(websocket.sent)
+    assert sorted(result["class"] for result in results) == classes
+    assert all(is_frame_ref(result["frame"]) for result in results)
+    assert results[0]["label"] == "freshapple"
+    assert not any("error" in result for result in results)
+    assert 1 < peak <= 2
+
+
+@pytest.mark.anyio
+async def test_stream_mode_reports_recognition_errors(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Checks that a frame whose recognition fails still gets a result message."""
+    monkeypatch.setattr(settings, "live_dedup_enabled", False)
+    websocket = StreamingWebSocket([frame_message(jpeg(0))], results=1)
+    feed = LiveFeed(stream=True)
+
+    async def recognize(image_ref: str, detected_class: str) -> Dict[str, Any]:
+        raise RuntimeError("Batcher stopped")
+
+    monkeypatch.setattr(feed, "recognize", recognize)
+
+    await feed.send_personal_message("", websocket)
+
+    [result] = pushed_results(websocket.sent)
+    assert result["error"] == "Batcher stopped"
+    assert result["class"] == "apple"
+
+
+class BrokenWebSocket(FakeWebSocket):
+    """Fails on the first read."""
+
+    async def receive(self) -> Dict[str, Any]:
+        raise RuntimeError("socket reset")
+
+
+@pytest.mark.anyio
+async def test_receiver_failure_is_logged(caplog: pytest.LogCaptureFixture) -> None:
+    """Checks that an error of the receiving task ends the session with a log."""
+    feed = LiveFeed()
+
+    with caplog.at_level(logging.WARNING):
+        await asyncio.wait_for(feed.send_personal_message("", BrokenWebSocket([])), 5)
+
+    assert "receiving frames failed: RuntimeError('socket reset')" in caplog.text
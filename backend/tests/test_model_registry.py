@@ -0,0 +1,31 @@
+import pytest
+
+from backend.services.ml.registry import ModelRegistry
+
+
+def test_model_is_loaded_once() -> None:
+    """Checks that every caller gets the same instance from a single load."""
+    calls = []
+
+    def loader() -> object:
+        calls.append(1)
+        return object()
+
+    registry = ModelRegistry()
+    registry.register("dummy", loader)
+
+    first = registry.get("dummy")
+    second = registry.get("dummy")
+
+    assert first is second
+    assert len(calls) == 1
+    assert registry.is_loaded("dummy")
+    assert [entry["name"] for entry in registry.report()] == ["dummy"]
+
+
+def test_unknown_model_raises() -> None:
+    """Checks that looking up an unregistered model fails loudly."""
+    registry = ModelRegistry()
+
+    with pytest.raises(KeyError):
+        registry.get("missing")
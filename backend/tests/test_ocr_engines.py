@@ -0,0 +1,127 @@
+import json
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytesseract
+import pytest
+from cachetools import TTLCache
+
+from backend.services.ml import ocr
+from backend.services.ml.cache import OCR, ResultCache, content_hash, result_cache
+from backend.services.ml.ocr import OcrEngine, ReplayEngine, TesseractEngine
+from backend.services.ml.ocr_store import TextractResponseStore
+from backend.settings import settings
+
+
+def _textract_response(text: str) -> dict:
+    return {"Blocks": [{"BlockType": "LINE", "Text": text}]}
+
+
+def _png() -> bytes:
+    return cv2.imencode(".png", np.zeros((8, 8, 3), np.uint8))[1].tobytes()
+
+
+def test_replay_engine_serves_recordings(tmp_path: Path) -> None:
+    """Checks that recorded Textract responses are replayed by image hash."""
+    document = b"scan of a label"
+    recording = {"Blocks": [{"BlockType": "LINE", "Text": "MRP 45"}, {"BlockType": "PAGE"}]}
+    (tmp_path / f"{content_hash(document)}.json").write_text(json.dumps(recording))
+    engine = ReplayEngine(tmp_path, latency_ms=1, jitter_ms=2)
+
+    assert engine.read_text(document) == "MRP 45"
+    assert engine.read_text(b"never recorded") == ""
+
+
+def test_replay_latency_is_deterministic(tmp_path: Path) -> None:
+    """Checks that the injected jitter only depends on the image."""
+    engine = ReplayEngine(tmp_path, latency_ms=10, jitter_ms=20)
+    digest = content_hash(b"scan")
+
+    assert engine.delay(digest) == engine.delay(digest)
+    assert 0.01 <= engine.delay(digest) <= 0.03
+
+
+def _fake_passes(monkeypatch: pytest.MonkeyPatch, outputs: dict) -> None:
+    def image_to_string(image: object, config: str) -> str:
+        delay, text = outputs[config]
+        time.sleep(delay)
+        return text
+
+    monkeypatch.setattr(pytesseract, "image_to_string", image_to_string)
+
+
+def test_tesseract_exits_on_first_parseable_pass(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Checks that the first pass with an MRP and a date wins."""
+    _fake_passes(
+        monkeypatch,
+        {
+            "--psm 6": (0.3, "a much longer text without any of the fields"),
+            "--psm 3": (0, "MRP 45 EXP 12/2025"),
+            "--psm 4": (0.3, "MRP"),
+        },
+    )
+    engine = TesseractEngine("tesseract", max_workers=3, early_exit=True)
+
+    assert engine.extract_text(_png(), "digest") == "MRP 45 EXP 12/2025"
+
+
+def test_tesseract_keeps_longest_text_without_early_exit(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Checks that all passes run and the longest text is kept."""
+    _fake_passes(
+        monkeypatch,
+        {
+            "--psm 6": (0, "MRP 45 EXP 12/2025"),
+            "--psm 3": (0, "MRP 45 EXP 12/2025 and more"),
+            "--psm 4": (0, "MRP"),
+        },
+    )
+    engine = TesseractEngine("tesseract", max_workers=3, early_exit=False)
+
+    assert engine.extract_text(_png(), "digest") == "MRP 45 EXP 12/2025 and more"
+
+
+def test_engine_must_implement_extract_text() -> None:
+    """Checks that an engine without extract_text cannot be built."""
+
+    class Incomplete(OcrEngine):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_warm_up_fills_the_ocr_cache_only(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Checks that warming stays out of the classifier cache and within its own size."""
+    store = TextractResponseStore(tmp_path / "store.sqlite3", max_bytes=1024 * 1024)
+    for digest in ("a", "b", "c"):
+        store.put(digest, ocr.TEXTRACT_FEATURES, _textract_response(digest))
+    ocr_cache = ResultCache(TTLCache(2, ttl=60))
+    monkeypatch.setattr(ocr, "textract_store", store)
+    monkeypatch.setattr(ocr, "ocr_result_cache", ocr_cache)
+
+    assert ocr.warm_ocr_cache(200) == 2
+    assert ocr_cache.get(OCR, "c", ocr.TEXTRACT_VERSION) == "c"
+    assert result_cache.get(OCR, "c", ocr.TEXTRACT_VERSION) is None
+    store.close()
+
+
+def test_textract_client_config(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Checks that the shared Textract client gets its pool, timeouts and retries."""
+    monkeypatch.setattr(settings, "textract_max_pool_connections", 24)
+    monkeypatch.setattr(settings, "textract_connect_timeout", 2.5)
+    monkeypatch.setattr(settings, "textract_read_timeout", 20.0)
+    monkeypatch.setattr(settings, "textract_max_attempts", 5)
+
+    config = ocr._build_textract_client().meta.config
+
+    assert config.max_pool_connections == 24
+    assert config.connect_timeout == 2.5
+    assert config.read_timeout == 20.0
+    assert config.retries == {"mode": "adaptive", "total_max_attempts": 5}
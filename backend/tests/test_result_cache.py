@@ -0,0 +1,74 @@
+import cv2
+import numpy as np
+import pytest
+from cachetools import TTLCache
+
+from backend.services.ml.cache import CLASSIFIER, OCR, ResultCache, content_hash, result_cache
+from backend.services.ml.crud import ImageProcessor, freshness_model_version
+from backend.services.ml.frame_store import frame_store
+from backend.services.ml.runtime import KERAS, ONNX
+from backend.settings import settings
+
+
+def test_hit_and_miss() -> None:
+    """Checks that a stored result is served and an unknown one is not."""
+    cache = ResultCache(TTLCache(8, ttl=60))
+    digest = content_hash(b"image")
+
+    assert cache.get(CLASSIFIER, digest, "v1") is None
+    cache.set(CLASSIFIER, digest, "v1", [0.2, 0.8])
+
+    assert cache.get(CLASSIFIER, digest, "v1") == [0.2, 0.8]
+
+
+def test_keys_separate_kind_version_and_content() -> None:
+    """Checks that results never leak across kinds, versions or images."""
+    cache = ResultCache(TTLCache(8, ttl=60))
+    digest = content_hash(b"image")
+    cache.set(CLASSIFIER, digest, "v1", "fresh")
+
+    assert cache.get(OCR, digest, "v1") is None
+    assert cache.get(CLASSIFIER, digest, "v2") is None
+    assert cache.get(CLASSIFIER, content_hash(b"other image"), "v1") is None
+
+
+class FakeBatcher:
+    """Answers every image with the same probabilities and counts rows."""
+
+    def __init__(self) -> None:
+        self.rows = 0
+
+    async def predict(self, batch: np.ndarray) -> np.ndarray:
+        self.rows += len(batch)
+        probabilities = np.zeros((len(batch), 15), np.float32)
+        probabilities[:, 1] = 0.9
+        return probabilities
+
+
+class InlinePool:
+    """Runs worker pool jobs in the calling thread."""
+
+    async def run_io(self, fn, *args):
+        return fn(*args)
+
+
+@pytest.mark.anyio
+async def test_batched_rows_use_the_batcher_version(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Checks that batched results are cached under the runtime the batcher serves."""
+    monkeypatch.setattr(settings, "freshness_backend", KERAS)
+    jpeg = cv2.imencode(".jpg", np.full((8, 8, 3), 77, np.uint8))[1].tobytes()
+    ref = frame_store.put("cache-test", jpeg)
+    processor = ImageProcessor("tesseract", [ref], 1, backend=ONNX, ocr_engine="tesseract")
+    batcher = FakeBatcher()
+
+    try:
+        first = await processor.process_batched([ref], batcher, InlinePool())
+        second = await processor.process_batched([ref], batcher, InlinePool())
+    finally:
+        frame_store.drop_session("cache-test")
+
+    assert first == second
+    assert batcher.rows == 1
+    digest = content_hash(jpeg)
+    assert result_cache.get(CLASSIFIER, digest, freshness_model_version(KERAS)) is not None
+    assert result_cache.get(CLASSIFIER, digest, freshness_model_version(ONNX)) is None
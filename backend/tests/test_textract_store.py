@@ -0,0 +1,76 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from backend.services.ml.ocr_store import TextractResponseStore
+
+
+def _response(text: str) -> dict:
+    return {
+        "Blocks": [{"BlockType": "LINE", "Text": text}],
+        "ResponseMetadata": {"HTTPStatusCode": 200},
+    }
+
+
+def test_responses_survive_reopen(tmp_path: Path) -> None:
+    """Checks that stored responses are read back after a restart."""
+    store = TextractResponseStore(tmp_path / "store.sqlite3", max_bytes=1024 * 1024)
+    store.put("abc", ["LAYOUT"], _response("MRP 45"))
+    store.close()
+
+    reopened = TextractResponseStore(tmp_path / "store.sqlite3", max_bytes=1024 * 1024)
+    response = reopened.get("abc", ["LAYOUT"])
+
+    assert response == {"Blocks": [{"BlockType": "LINE", "Text": "MRP 45"}]}
+    assert reopened.get("abc", ["FORMS"]) is None
+    assert [stored.digest for stored in reopened.recent(10)] == ["abc"]
+    reopened.close()
+
+
+def test_least_recently_used_is_evicted(tmp_path: Path) -> None:
+    """Checks that the store stays under its size bound."""
+    store = TextractResponseStore(tmp_path / "store.sqlite3", max_bytes=120)
+    store.put("old", ["LAYOUT"], _response("first"))
+    store.put("new", ["LAYOUT"], _response("second"))
+    store.get("old", ["LAYOUT"])
+    store.put("newest", ["LAYOUT"], _response("third"))
+
+    kept = {stored.digest for stored in store.recent(10)}
+    assert kept == {"old", "newest"}
+    store.close()
+
+
+def test_eviction_counts_other_writers(tmp_path: Path) -> None:
+    """Checks that the size bound holds across processes sharing the file."""
+    first = TextractResponseStore(tmp_path / "store.sqlite3", max_bytes=120)
+    second = TextractResponseStore(tmp_path / "store.sqlite3", max_bytes=120)
+    first.put("a", ["LAYOUT"], _response("first"))
+    second.put("b", ["LAYOUT"], _response("second"))
+    first.put("c", ["LAYOUT"], _response("third"))
+
+    assert {stored.digest for stored in second.recent(10)} == {"b", "c"}
+    first.close()
+    second.close()
+
+
+def test_failed_put_releases_the_transaction(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Checks that a put failing mid-transaction does not block later writes."""
+    store = TextractResponseStore(tmp_path / "store.sqlite3", max_bytes=1024 * 1024)
+
+    def failing_evict(conn: sqlite3.Connection) -> None:
+        raise sqlite3.OperationalError("database or disk is full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(store, "_evict", failing_evict)
+        with pytest.raises(sqlite3.OperationalError):
+            store.put("lost", ["LAYOUT"], _response("first"))
+
+    store.put("kept", ["LAYOUT"], _response("second"))
+
+    assert store.get("lost", ["LAYOUT"]) is None
+    assert [stored.digest for stored in store.recent(10)] == ["kept"]
+    store.close()
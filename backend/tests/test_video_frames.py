@@ -0,0 +1,271 @@
+import asyncio
+import shutil
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+from backend.services.ml.frame import (
+    ALL,
+    EVERY_NTH,
+    TIME,
+    Detections,
+    FrameDifferenceGate,
+    FrameSampler,
+    ObjectDetectionVideoProcessor,
+    detector_name,
+    shutdown_video_pool,
+    video_pool,
+)
+from backend.services.ml.registry import model_registry
+from backend.services.ml.video_stream import StreamDecoder, StreamTooLargeError, detect_stream
+from backend.settings import settings
+
+
+@pytest.fixture
+def video(tmp_path: Path) -> str:
+    """Ten fps clip of 30 frames, the picture changes every 10 frames."""
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for index in range(30):
+        writer.write(np.full((48, 64, 3), (index // 10) * 100, np.uint8))
+    writer.release()
+    return path
+
+
+def test_sampling_modes(video: str) -> None:
+    """Checks the frame indexes produced by each sampling mode."""
+    def indexes(sampler: FrameSampler) -> list:
+        return [index for index, _ in sampler.frames(video)]
+
+    assert indexes(FrameSampler(ALL)) == list(range(30))
+    assert indexes(FrameSampler(EVERY_NTH, stride=7)) == [0, 7, 14, 21, 28]
+    assert indexes(FrameSampler(TIME, stride_ms=1000)) == [0, 10, 20]
+
+
+def test_difference_gate_skips_static_frames(video: str) -> None:
+    """Checks that only frames where the picture changed get through."""
+    gate = FrameDifferenceGate(threshold=2.0)
+    passed = [index for index, frame in FrameSampler(ALL).frames(video) if gate.changed(frame)]
+
+    assert passed == [0, 10, 20]
+
+
+
+def test_difference_gate_follows_slow_drift() -> None:
+    """Checks that small steps add up against the last frame let through."""
+    gate = FrameDifferenceGate(threshold=2.0)
+    ramp = [np.full((48, 64, 3), value, np.uint8) for value in range(12)]
+
+    passed = [value for value, frame in enumerate(ramp) if gate.changed(frame)]
+
+    assert passed == [0, 3, 6, 9]
+
+class _FakeResults:
+    def __init__(self, xyxy: list) -> None:
+        self.xyxy = xyxy
+
+
+class _FakeYolo:
+    """Detects class 1 in bright frames, records the batch sizes."""
+
+    names = {0: "person", 1: "bottle"}
+
+    def __init__(self) -> None:
+        self.batches: list = []
+
+    def __call__(self, frames: list) -> _FakeResults:
+        self.batches.append(len(frames))
+        return _FakeResults(
+            [
+                np.array([[0, 0, 4, 4, 0.9, 1], [1, 1, 5, 5, 0.8, 1]])
+                if frame.mean() > 150
+                else np.zeros((0, 6))
+                for frame in frames
+            ],
+        )
+
+
+def test_batched_detection_stops_at_first_hit(
+    video: str,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Checks that frames are detected in batches up to the first hit."""
+    model = _FakeYolo()
+    model_registry.register(detector_name("fake"), lambda: model)
+    monkeypatch.setattr(settings, "video_detect_batch_size", 4)
+    processor = ObjectDetectionVideoProcessor(
+        str(tmp_path / "frames"),
+        tier="fake",
+        sampler=FrameSampler(ALL),
+        gate=FrameDifferenceGate(threshold=0),
+    )
+
+    saved = processor.process_video(video)
+
+    assert model.batches == [4, 4, 4, 4, 4, 4]
+    assert len(saved) == 1
+    assert "frame_with_objects_20_bottle_" in saved[0]
+
+
+def test_batched_detections_match_per_frame(video: str, tmp_path: Path) -> None:
+    """Checks that batching frames changes neither the detections nor the saved frame."""
+    model_registry.register(detector_name("fake"), _FakeYolo)
+    frames = [frame for _, frame in FrameSampler(ALL).frames(video)]
+    saved = {}
+    for batch_size in (1, 4):
+        processor = ObjectDetectionVideoProcessor(
+            str(tmp_path / "frames"),
+            tier="fake",
+            sampler=FrameSampler(ALL),
+            gate=FrameDifferenceGate(threshold=0),
+        )
+        processor.batch_size = batch_size
+        saved[batch_size] = [Path(path).name.rsplit("_", 1)[0] for path in processor.process_video(video)]
+
+    batched = processor.detect_batch(frames)
+    per_frame = [processor.detect_batch([frame])[0] for frame in frames]
+
+    assert len(batched) == len(per_frame) == 30
+    for together, alone in zip(batched, per_frame):
+        for batch_array, frame_array in zip(together, alone):
+            np.testing.assert_array_equal(batch_array, frame_array)
+    assert saved[1] == saved[4] == ["frame_with_objects_20_bottle"]
+
+
+def test_parallel_videos_keep_input_order(
+    video: str,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Checks that videos processed by a worker pool come back in order."""
+    model_registry.register(detector_name("fake"), _FakeYolo)
+    # Forked workers inherit the fake detector registered above
+    monkeypatch.setattr(settings, "ml_process_start_method", "fork")
+    # Bright from the first frame, so the detection is on frame 0
+    second = str(tmp_path / "bright.avi")
+    writer = cv2.VideoWriter(second, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for _ in range(30):
+        writer.write(np.full((48, 64, 3), 250, np.uint8))
+    writer.release()
+    processor = ObjectDetectionVideoProcessor(
+        str(tmp_path / "frames"),
+        tier="fake",
+        sampler=FrameSampler(ALL),
+        gate=FrameDifferenceGate(threshold=0),
+    )
+
+    try:
+        saved = processor.process_videos([video, second, video], workers=2)
+        pool = video_pool(2, "fake")
+        # Later calls reuse the workers and their loaded detector, even
+        # with fewer videos than workers
+        again = processor.process_videos([second, video], workers=2)
+        assert video_pool(2, "fake") is pool
+        single = processor.process_videos([second], workers=2)
+        assert video_pool(2, "fake") is pool
+    finally:
+        shutdown_video_pool()
+
+    assert [Path(path).name.split("_")[3] for path in saved] == ["20", "0", "20"]
+    assert [Path(path).name.split("_")[3] for path in again] == ["0", "20"]
+    assert [Path(path).name.split("_")[3] for path in single] == ["0"]
+
+
+@pytest.mark.anyio
+@pytest.mark.skipif(shutil.which(settings.ffmpeg_cmd) is None, reason="needs ffmpeg")
+async def test_streamed_upload_stops_at_first_hit(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Checks that a streamed video is detected before it is fully read."""
+    path = str(tmp_path / "long.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for index in range(600):
+        writer.write(np.full((48, 64, 3), 250 if index >= 20 else 0, np.uint8))
+    writer.release()
+    data = Path(path).read_bytes()
+    chunk_size = 4096
+    sent = []
+
+    async def chunks():
+        for offset in range(0, len(data), chunk_size):
+            sent.append(offset)
+            yield data[offset : offset + chunk_size]
+
+    model_registry.register(detector_name("fake"), _FakeYolo)
+    monkeypatch.setattr(settings, "video_detect_batch_size", 4)
+    processor = ObjectDetectionVideoProcessor(
+        str(tmp_path / "frames"),
+        tier="fake",
+        gate=FrameDifferenceGate(threshold=0),
+    )
+    decoder = StreamDecoder(64, 48, ALL, ffmpeg_cmd=settings.ffmpeg_cmd)
+
+    saved = await detect_stream(processor, decoder, chunks())
+
+    assert len(saved) == 1
+    assert "frame_with_objects_20_bottle_" in saved[0]
+    assert len(sent) * chunk_size < len(data)
+
+
+@pytest.fixture
+def noisy_ffmpeg(tmp_path: Path) -> str:
+    """Stand-in for ffmpeg logging 1 MiB to stderr before two 4x2 frames."""
+    path = tmp_path / "ffmpeg"
+    path.write_text(
+        f"#!{sys.executable}\n"
+        "import sys\n"
+        "sys.stdin.buffer.read()\n"
+        "sys.stderr.write('w' * (1 << 20))\n"
+        "sys.stdout.buffer.write(bytes(2 * 4 * 2 * 3))\n",
+    )
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.mark.anyio
+async def test_noisy_decoder_does_not_block(noisy_ffmpeg: str) -> None:
+    """Checks that a full stderr pipe does not stall the frames."""
+
+    async def chunks():
+        yield b"video"
+
+    decoder = StreamDecoder(4, 2, ALL, ffmpeg_cmd=noisy_ffmpeg)
+
+    async def decode():
+        return [index async for index, _ in decoder.frames(chunks())]
+
+    assert await asyncio.wait_for(decode(), 10) == [0, 1]
+
+
+@pytest.mark.anyio
+async def test_oversized_upload_is_refused(noisy_ffmpeg: str) -> None:
+    """Checks that reading stops with an error past the size limit."""
+    sent = []
+
+    async def chunks():
+        for _ in range(10):
+            sent.append(1)
+            yield bytes(64)
+
+    decoder = StreamDecoder(4, 2, ALL, ffmpeg_cmd=noisy_ffmpeg, max_bytes=100)
+
+    with pytest.raises(StreamTooLargeError):
+        async for _ in decoder.frames(chunks()):
+            pass
+    assert len(sent) == 2
+
+
+def test_detections_filter() -> None:
+    """Checks score and class filtering on the detection arrays."""
+    detections = Detections.from_xyxy(
+        np.array([[0, 0, 1, 1, 0.2, 3], [0, 0, 1, 1, 0.9, 1], [0, 0, 1, 1, 0.7, 3]]),
+    )
+
+    assert len(detections.filter(min_score=0.5)) == 2
+    assert detections.filter(class_ids=[3]).names(["a", "b", "c", "d"]) == ["d"]
+    assert detections.names(["a", "b", "c", "d"]) == ["d", "b"]
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+
+import pytest
+
+from backend.services.ml.workers import PoolSaturatedError, WorkerPool
+
+
+def _thread_name() -> str:
+    return threading.current_thread().name
+
+
+@pytest.mark.anyio
+async def test_saturated_pool_refuses_jobs() -> None:
+    """Checks that jobs beyond the workers and queue depth are refused."""
+    release = threading.Event()
+    pool = WorkerPool(process_workers=0, thread_workers=1, max_queue_depth=1)
+    pool.start()
+    try:
+        # One running job and one queued job fill the pool
+        jobs = [asyncio.ensure_future(pool.run_io(release.wait, 1)) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert pool.pending == 2
+
+        with pytest.raises(PoolSaturatedError):
+            await pool.run_io(release.wait, 1)
+
+        release.set()
+        await asyncio.gather(*jobs)
+        assert pool.pending == 0
+        assert await pool.run_io(_thread_name)
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.anyio
+async def test_process_pool_is_created_on_demand() -> None:
+    """Checks that starting the pool does not spawn process workers."""
+    pool = WorkerPool(process_workers=2, thread_workers=1, max_queue_depth=1)
+    pool.start()
+    try:
+        assert pool._process_pool is None
+        assert (await pool.run_io(_thread_name)).startswith("ml-io")
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.anyio
+async def test_cpu_jobs_fall_back_to_threads() -> None:
+    """Checks that CPU-bound jobs run on the thread pool without process workers."""
+    pool = WorkerPool(process_workers=0, thread_workers=1, max_queue_depth=1)
+    try:
+        assert (await pool.run_cpu(_thread_name)).startswith("ml-io")
+        assert pool._process_pool is None
+    finally:
+        pool.shutdown()